@@ -39,7 +39,7 @@ Options:
 
 import paho.mqtt.client as mqtt
 
-from sarra.sr_util import nowflt
+from sarra.sr_timestamp import nowflt
 
 
 class EXP_2MQTT(object): 
@@ -100,7 +100,7 @@ class EXP_2MQTT(object):
    def on_message(self,parent):
 
       import os.path,json
-      from sarra.sr_util import timev2tov3str
+      from sarra.sr_timestamp import timev2tov3str
       import paho.mqtt.client as mqtt
       from codecs import decode,encode
 
@@ -116,7 +116,7 @@ class EXP_2MQTT(object):
           msg.headers[ "baseUrl" ] = msg.baseurl
           msg.headers[ "relPath" ] = msg.relpath
       
-          sum_algo_map = { "d":"md5", "s":"sha512", "n":"md5name", "0":"zero" }
+          sum_algo_map = { "b":"blake2b", "d":"md5", "s":"sha512", "n":"md5name", "x":"xxh128", "0":"zero" }
           sm = sum_algo_map[ msg.headers["sum"][0] ]
           sv = encode( decode( msg.headers["sum"][2:], 'hex'), 'base64' ).decode('utf-8').strip()
           msg.headers[ "integrity" ] = { "method": sm, "value": sv }
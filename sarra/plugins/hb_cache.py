@@ -5,7 +5,7 @@
   by invoking parent.cache.save() it will only write out the values that are still relevant.
 
 """
-from sarra.sr_util import nowflt
+from sarra.sr_timestamp import nowflt
 
 
 class Hb_Cache(object):
@@ -37,7 +37,7 @@ class Hb_Cache(object):
         else :
 
            parent.cache.save()
-           self.logger.info("hb_cache saved (%d)" % len(parent.cache.cache_dict))
+           self.logger.info("hb_cache saved (%d)" % parent.cache.count)
 
         return True
 
@@ -0,0 +1,28 @@
+#!/usr/bin/python3
+
+"""
+  default on_heartbeat handler when post_confirm_window is set.
+  waits until the broker has confirmed every message published so far,
+  so that messages do not stay unconfirmed for long when the flow slows down.
+
+"""
+
+class Hb_Post_Flush(object):
+
+    def __init__(self,parent):
+        pass
+
+    def perform(self,parent):
+        self.logger = parent.logger
+
+        if not hasattr(parent,"publisher") : return True
+
+        pending = len(parent.publisher.unconfirmed)
+        parent.publisher.flush()
+        self.logger.info("hb_post_flush %d messages were awaiting confirmation" % pending)
+
+        return True
+
+hb_post_flush = Hb_Post_Flush(self)
+
+self.on_heartbeat = hb_post_flush.perform
@@ -0,0 +1,34 @@
+#!/usr/bin/python3
+
+"""
+  default on_heartbeat handler when report_batch or report_aggregate is set.
+  waits until the broker has confirmed every report published so far,
+  and publishes the summary of the reports (report_aggregate) when it is due,
+  so that reports do not stay pending for long when the flow slows down.
+
+"""
+
+class Hb_Report_Flush(object):
+
+    def __init__(self,parent):
+        pass
+
+    def perform(self,parent):
+        self.logger = parent.logger
+
+        if hasattr(parent,"reporter") :
+           parent.reporter.flush()
+           self.logger.info("hb_report_flush %d summaries published" % parent.reporter.summaries)
+           return True
+
+        if not hasattr(parent,"report_publisher") : return True
+
+        pending = len(parent.report_publisher.unconfirmed)
+        parent.report_publisher.flush()
+        self.logger.info("hb_report_flush %d reports were awaiting confirmation" % pending)
+
+        return True
+
+hb_report_flush = Hb_Report_Flush(self)
+
+self.on_heartbeat = hb_report_flush.perform
@@ -0,0 +1,33 @@
+#!/usr/bin/python3
+
+"""
+  default on_heartbeat handler when topic_prefilter is set.
+  logs how many messages were rejected on their topic alone, without being
+  decoded, out of the messages consumed since the last heartbeat.
+
+"""
+
+class Hb_Topic_Prefilter(object):
+
+    def __init__(self,parent):
+        pass
+
+    def perform(self,parent):
+        self.logger = parent.logger
+
+        if not hasattr(parent,'consumer') : return True
+
+        topic_filter = getattr(parent.consumer,'topic_filter',None)
+        if topic_filter is None : return True
+
+        self.logger.info("hb_topic_prefilter rejected %d of %d messages on their topic, %d topics" % \
+            ( topic_filter.rejected, topic_filter.count, len(topic_filter.decisions) ) )
+
+        topic_filter.rejected = 0
+        topic_filter.count    = 0
+
+        return True
+
+hb_topic_prefilter = Hb_Topic_Prefilter(self)
+
+self.on_heartbeat = hb_topic_prefilter.perform
@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+
+"""
+  default on_heartbeat handler when transport_pool is greater than 1.
+  logs, for each destination, how many transfers reused a pooled session (hit),
+  needed a new connection (miss), and how many sessions were closed because they
+  were idle or least recently used (evict) since the last heartbeat.
+
+"""
+
+class Hb_Transport(object):
+
+    def __init__(self,parent):
+        pass
+
+    def perform(self,parent):
+        self.logger = parent.logger
+
+        for link in [ 'ftp_link', 'http_link', 'sftp_link' ] :
+            if not hasattr(parent,link) : continue
+
+            transport = getattr(parent,link)
+            for key in sorted(transport.stats.keys(), key=str) :
+                counts = transport.stats[key]
+                self.logger.info("hb_transport %s hit %d miss %d evict %d" % \
+                    ( transport.pool_str(key), counts['hit'], counts['miss'], counts['evict'] ) )
+
+            transport.stats = {}
+            self.logger.info("hb_transport %s %d sessions pooled" % (transport.scheme,len(transport.pool)))
+
+        return True
+
+hb_transport = Hb_Transport(self)
+
+self.on_heartbeat = hb_transport.perform
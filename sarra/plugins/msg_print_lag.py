@@ -17,7 +17,7 @@
 
 import os,stat,time
 
-from sarra.sr_util import timestr2flt, nowflt
+from sarra.sr_timestamp import timestr2flt, nowflt
 
 
 class Transformer(object):
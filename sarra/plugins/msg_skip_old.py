@@ -26,7 +26,7 @@
 
 import os,stat,time
 
-from sarra.sr_util import timestr2flt, nowflt
+from sarra.sr_timestamp import timestr2flt, nowflt
 
 
 class Transformer(object):
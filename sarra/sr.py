@@ -22,14 +22,17 @@
 from functools import partial
 
 import appdirs
+import concurrent.futures
 import copy
 import getpass
+import importlib
 import logging
 import os
 import os.path
 import pathlib
 import platform
 import psutil
+import random
 import re
 import shutil
 import signal
@@ -39,9 +42,11 @@ import time
 
 try:
     from sr_cfg2 import *
+    from sr_snapshot import *
 
 except:
     from sarra.sr_cfg2 import *
+    from sarra.sr_snapshot import *
 
 
 
@@ -62,9 +67,16 @@ class sr_GlobalState:
 
        naming: routines that start with *read* don't modify anything on disk.
                routines that start with clean do...
+
+       what is read is kept in a snapshot (sr_snapshot.json in the cache directory):
+       only the configurations, state directories and retry files changed since are
+       read again.  more than scan_threshold state directories are read in parallel.
           
     """
 
+    scan_threshold = 64
+    scan_threads = 8
+
     def _find_component_path(self, c):
         """
             return the string to be used to run a component in Popen.
@@ -91,6 +103,10 @@ class sr_GlobalState:
 
         os.makedirs(os.path.dirname(lfn), exist_ok=True)
 
+        if self._start_fork(c, cfg):
+            self._fork_instance(component_path, c, cfg, i, lfn)
+            return
+
         if c[0] != 'c':  # python components
             if cfg is None:
                 cmd = [sys.executable, component_path, '--no', "%d" % i, 'start']
@@ -107,6 +123,64 @@ class sr_GlobalState:
         except Exception as ex:
             print( "failed to launch: %s >%s >2&1 (reason: %s) " % ( ' '.join(cmd), lfn, ex ) )
 
+    def _start_fork(self, c, cfg):
+        """ return True if the instances of the configuration are to be forks of this process (start_fork)
+            rather than new python processes.  linux only: the forks are named after their component.
+        """
+        if c[0] == 'c' or cfg is None or not hasattr(os, 'fork') or not os.path.exists('/proc/self/comm'):
+            return False
+        if not 'options' in self.configs[c][cfg]:
+            return False
+        v = self.configs[c][cfg]['options'].get('start_fork', 'off')
+        return v.lower() in ['', 'true', 'yes', 'on', '1']
+
+    def _fork_instance(self, component_path, c, cfg: str, i, lfn):
+        """
+          start up a instance as a fork of this process: the component module is imported once,
+          and each fork runs its main() as: component --no i start cfg
+        """
+        try:
+            module = importlib.import_module('sr_' + c)
+        except ImportError:
+            module = importlib.import_module('sarra.sr_' + c)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        try:
+            pid = os.fork()
+        except Exception as ex:
+            print( "failed to fork: sr_%s %s %02d (reason: %s) " % ( c, cfg, i, ex ) )
+            return
+
+        if pid > 0:
+            return
+
+        status = 0
+        try:
+            os.setsid()
+            fd = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(fd, 0)
+            os.close(fd)
+            with open(lfn, "a") as lf:
+                os.dup2(lf.fileno(), 1)
+                os.dup2(lf.fileno(), 2)
+
+            # the process name is the one _filter_sr_proc looks for (the command line is still sr's)
+            with open('/proc/self/comm', 'w') as f:
+                f.write('sr_' + c)
+
+            random.seed()
+            sys.argv = [component_path, '--no', "%d" % i, 'start', cfg]
+            module.main()
+        except SystemExit as ex:
+            status = ex.code if isinstance(ex.code, int) else int(ex.code is not None)
+        except Exception as ex:
+            print( "forked instance failed: sr_%s %s %02d (reason: %s) " % ( c, cfg, i, ex ), flush=True )
+            status = 1
+        finally:
+            os._exit(status)
+
     def save_procs(self,File="procs.json"):
         """
            dump image of process table to a file, one process per line, JSON UTF-8 encoded.
@@ -122,6 +196,10 @@ class sr_GlobalState:
                 f.write(pj +'\n')
             
     def _filter_sr_proc(self,p):
+        # exited (zombie) or gone while reading the process table
+        if not p['cmdline']:
+            return
+
         # process name 'python3' is not helpful, so overwrite...
         if 'python' in p['name']:
             if len(p['cmdline']) < 2:
@@ -165,21 +243,83 @@ class sr_GlobalState:
         for proc in psutil.process_iter( ['pid','cmdline','name', 'username' ] ):
             self._filter_sr_proc(proc.info)
 
+    def _env_refs(self, paths):
+        """ return the environment variables substituted (${VAR}) in the files, with their values.
+        """
+        refs = {}
+        for path in paths:
+            try:
+                with open(path, 'r') as f:
+                    for v in re.findall(r'\$\{(\w+)\}', f.read()):
+                        refs[v] = os.getenv(v)
+            except OSError:
+                pass
+        return refs
+
+    def _options_view(self, o):
+        """ return what sr uses of the options of a configuration: brokers (host only), exchanges...
+        """
+        view = {}
+        for b in ['broker', 'post_broker']:
+            if hasattr(o, b) and getattr(o, b) is not None:
+                view[b] = getattr(o, b).netloc.split('@')[-1]
+        for a in ['exchange', 'queue', 'post_exchange', 'start_fork']:
+            if hasattr(o, a):
+                view[a] = str(getattr(o, a))
+        return view
+
+    def _read_config(self, c, cfg, cbase, defaults):
+        """ return the entry of a configuration (read from cfg, in the component directory).
+        """
+        if self.default_cfg is None:
+            cwd = os.getcwd()
+            os.chdir(self.user_config_dir)
+            self.default_cfg = sr_cfg2(self.logger,self.user_config_dir)
+            for f in ['default.conf', 'admin.conf']:
+                if os.path.exists( f ):
+                    self.default_cfg.parse_file( f )
+            os.chdir(cwd)
+
+        cfgbody = copy.deepcopy( self.default_cfg )
+        cfgbody.override( { 'program_name' : c, 'config': cbase,  'directory':'${PWD}' } )
+        cfgbody.parse_file( cfg )
+
+        # ensure there is a known value of instances to run.
+        numi = 0
+        if c in ['post', 'cpost']:
+            if hasattr(cfgbody,'sleep') and cfgbody.sleep not in ['-', '0']:
+                numi = 1
+        elif hasattr(cfgbody, 'instances' ):
+            numi = int(cfgbody.instances)
+        else:
+            numi = 1
+
+        paths = [ os.path.abspath(cfg) ] + cfgbody.includes
+        return { 'defaults': defaults, 'stats': [ [ p, stat(p) ] for p in paths ],
+                 'env': self._env_refs(paths), 'instances': numi, 'options': self._options_view(cfgbody) }
+
     def _read_configs(self):
-        # read in configurations.
+        # read in configurations: those changed since the snapshot.
         self.configs = {}
         if not os.path.isdir(self.user_config_dir):
            return
         os.chdir(self.user_config_dir)
-        self.default_cfg = sr_cfg2(self.logger,self.user_config_dir)
-        if os.path.exists( "default.conf" ):
-            self.default_cfg.parse_file("default.conf")
-        if os.path.exists( "admin.conf" ):
-            self.default_cfg.parse_file("admin.conf")
 
-        self.admin_cfg = copy.deepcopy( self.default_cfg )
-        if os.path.exists( "admin.conf" ):
-            self.admin_cfg.parse_file("admin.conf")
+        # a change in the settings for all configurations reads them all again.
+
+        self.default_cfg = None
+        files = [ 'default.conf', 'admin.conf', 'credentials.conf' ]
+        defaults = [ [ f, stat(f) ] for f in files ] + [ self._env_refs(files[0:2]) ]
+
+        entry = self.snapshot.lookup('defaults', 'admin')
+        if entry is None or entry['defaults'] != defaults:
+            admin_cfg = sr_cfg2(self.logger,self.user_config_dir)
+            for f in ['default.conf', 'admin.conf']:
+                if os.path.exists( f ):
+                    admin_cfg.parse_file( f )
+            entry = { 'defaults': defaults, 'admin': getattr(admin_cfg, 'admin', None) }
+            self.snapshot.store('defaults', 'admin', entry)
+        self.admin = entry['admin']
 
         for c in self.components:
             if os.path.isdir(c):
@@ -206,18 +346,16 @@ class sr_GlobalState:
                     self.configs[c][cbase]['status'] = state
 
                     if state != 'unknown':
-                        cfgbody = copy.deepcopy( self.default_cfg )
-                        cfgbody.override( { 'program_name' : c, 'config': cbase,  'directory':'${PWD}' } )
-                        cfgbody.parse_file( cfg )
-                        self.configs[c][cbase]['options'] = cfgbody
-                        # ensure there is a known value of instances to run.
-                        if c in ['post', 'cpost']:
-                            if hasattr(cfgbody,'sleep') and cfgbody.sleep not in ['-', '0']:
-                                numi = 1
-                        elif hasattr(cfgbody, 'instances' ):
-                            numi = int(cfgbody.instances)
-                        else:
-                            numi = 1
+                        name = c + os.sep + cfg
+                        entry = self.snapshot.lookup('configs', name)
+                        if entry is None or entry['defaults'] != defaults or \
+                           any( stat(p) != st for p, st in entry['stats'] ) or \
+                           any( os.getenv(v) != x for v, x in entry['env'].items() ):
+                            entry = self._read_config(c, cfg, cbase, defaults)
+                            mtime = max( [ st[0] for p, st in entry['stats'] if st ] + [ 0 ] ) / 1e9
+                            self.snapshot.store('configs', name, entry, mtime)
+                        self.configs[c][cbase]['options'] = entry['options']
+                        numi = entry['instances']
 
                     self.configs[c][cbase]['instances'] = numi
 
@@ -298,73 +436,145 @@ class sr_GlobalState:
                 os.chdir('..')
         os.chdir('..')
 
+    def _read_state_dir(self, path):
+        """ return what the files of a state directory hold: pids, queue name, instances, retry counts.
+        """
+        entry = { 'mtime': os.stat(path).st_mtime_ns, 'pids': [], 'bad_pids': [], 'queue_name': None,
+                  'instances': None, 'retry_counts': {}, 'retry_states': [] }
+
+        for pathname in os.listdir(path):
+            if pathname[-12:] == '.retry.state':
+                entry['retry_states'].append(pathname)
+                continue
+
+            p = pathlib.Path(path, pathname)
+            if not ( p.suffix in ['.pid', '.qname', '.state'] or pathname[-12:] == '.retry.count' ):
+                continue
+            try:
+                t = p.read_text().strip()
+            except OSError:
+                continue
+
+            if pathname[-4:] == '.pid':
+                try:
+                    i = int(pathname[-6:-4])
+                except ValueError:
+                    continue
+                if t.isdigit():
+                    entry['pids'].append( [ i, int(t) ] )
+                else:
+                    entry['bad_pids'].append( i )
+            elif len(t) == 0:
+                continue
+            elif pathname[-6:] == '.qname':
+                entry['queue_name'] = t
+            elif pathname[-12:] == '.retry.count':
+                if t.isdigit():
+                    entry['retry_counts'][pathname[0:-6]] = int(t)
+            elif t.isdigit():
+                entry['instances'] = int(t)
+
+        return entry
+
+    def _retry_lines(self, path):
+        """ return the number of lines of a retry file, counted again only if it changed since the snapshot.
+        """
+        st = stat(path)
+        entry = self.snapshot.lookup('retry', path)
+        if entry is not None and entry['stat'] == st:
+            return entry['lines']
+
+        lines = 0
+        buffer = 2**16
+        try:
+            with open(path) as f:
+                lines = sum(x.count('\n') for x in iter(partial(f.read,buffer), ''))
+        except Exception as ex:
+            #print( 'info reading statefile %p gone before it was read: %s' % (p, ex) )
+            return 0
+
+        if st is not None:
+            self.snapshot.store('retry', path, { 'stat': st, 'lines': lines }, st[0] / 1e9)
+        return lines
+
     def _read_states(self):
-        # read in state files
+        # read in state files: the directories changed since the snapshot, in parallel if many.
         self.states = {}
         if not os.path.isdir(self.user_cache_dir):
            return
-        os.chdir(self.user_cache_dir)
 
+        dirs = []
+        entries = {}
+        stale = []
         for c in self.components:
-            if os.path.isdir(c):
-                os.chdir(c)
-                self.states[c] = {}
-                for cfg in os.listdir():
-                    if os.path.isdir(cfg):
-                        os.chdir(cfg)
-                        self.states[c][cfg] = {}
-                        self.states[c][cfg]['instance_pids'] = {}
-                        self.states[c][cfg]['queue_name'] = None
-                        if c == 'audit' :
-                            self.states[c][cfg]['instances_expected'] = 1
-                        elif c in self.configs: 
-                            if cfg not in self.configs[c] :
-                                self.states[c][cfg]['status'] = 'removed'
-                                self.states[c][cfg]['instances_expected'] = 0
-                            elif self.configs[c][cfg]['instances'] == 0:
-                                self.states[c][cfg]['instances_expected'] = 0
-                        if c[0] == 'c':
-                            self.states[c][cfg]['instances_expected'] = 1
-                        else:
-                            self.states[c][cfg]['instances_expected'] = 0
-                        self.states[c][cfg]['has_state'] = False
-                        self.states[c][cfg]['retry_queue'] = 0
+            cdir = self.user_cache_dir + os.sep + c
+            if not os.path.isdir(cdir):
+                continue
+            self.states[c] = {}
+            for cfg in os.listdir(cdir):
+                path = cdir + os.sep + cfg
+                if not os.path.isdir(path):
+                    continue
+                dirs.append( (c, cfg, path) )
+                entry = self.snapshot.lookup('states', c + os.sep + cfg)
+                st = stat(path)
+                if entry is None or st is None or entry['mtime'] != st[0]:
+                    stale.append( (c, cfg, path) )
+                else:
+                    entries[(c, cfg)] = entry
 
-                        for pathname in os.listdir():
-                            p = pathlib.Path(pathname)
-                            if p.suffix in ['.pid', '.qname', '.state']:
-                                if sys.version_info[0] > 3 or sys.version_info[1] > 4:
-                                    t = p.read_text().strip()
-                                else:
-                                    with p.open() as f:
-                                        t = f.read().strip()
-                                # print( 'read f:%s len: %d contents:%s' % ( f, len(t), t[0:10] ) )
-                                if len(t) == 0:
-                                    continue
-
-                                # print( 'read f[-4:] = +%s+ ' % ( f[-4:] ) )
-                                if pathname[-4:] == '.pid':
-                                    i = int(pathname[-6:-4])
-                                    if t.isdigit():
-                                        # print( "%s/%s instance: %s, pid: %s" %
-                                        #     ( c, cfg, i, t ) )
-                                        self.states[c][cfg]['instance_pids'][i] = int(t)
-                                elif pathname[-6:] == '.qname':
-                                    self.states[c][cfg]['queue_name'] = t
-                                elif pathname[-6:] == '.state' and (pathname[-12:-6] != '.retry'):
-                                    if t.isdigit():
-                                        self.states[c][cfg]['instances_expected'] = int(t)
-                                elif pathname[-12:] == '.retry.state':
-                                     buffer=2**16
-                                     try:
-                                         with open(p) as f:
-                                             self.states[c][cfg]['retry_queue'] += sum(x.count('\n') for x in iter(partial(f.read,buffer), ''))
-                                     except Exception as ex:
-                                             #print( 'info reading statefile %p gone before it was read: %s' % (p, ex) )
-                                             pass
+        def read(stale_dir):
+            try:
+                return self._read_state_dir(stale_dir[2])
+            except OSError:
+                return None
 
-                        os.chdir('..')
-                os.chdir('..')
+        if len(stale) > self.scan_threshold:
+            with concurrent.futures.ThreadPoolExecutor(self.scan_threads) as pool:
+                read_entries = list(pool.map(read, stale))
+        else:
+            read_entries = list(map(read, stale))
+
+        for (c, cfg, path), entry in zip(stale, read_entries):
+            if entry is not None:
+                self.snapshot.store('states', c + os.sep + cfg, entry, entry['mtime'] / 1e9)
+                entries[(c, cfg)] = entry
+
+        for c, cfg, path in dirs:
+            if (c, cfg) not in entries:
+                continue
+            entry = entries[(c, cfg)]
+            self.states[c][cfg] = {}
+            self.states[c][cfg]['instance_pids'] = {}
+            self.states[c][cfg]['queue_name'] = None
+            if c == 'audit' :
+                self.states[c][cfg]['instances_expected'] = 1
+            elif c in self.configs: 
+                if cfg not in self.configs[c] :
+                    self.states[c][cfg]['status'] = 'removed'
+                    self.states[c][cfg]['instances_expected'] = 0
+                elif self.configs[c][cfg]['instances'] == 0:
+                    self.states[c][cfg]['instances_expected'] = 0
+            if c[0] == 'c':
+                self.states[c][cfg]['instances_expected'] = 1
+            else:
+                self.states[c][cfg]['instances_expected'] = 0
+            self.states[c][cfg]['has_state'] = False
+            self.states[c][cfg]['retry_queue'] = 0
+
+            for i, pid in entry['pids']:
+                self.states[c][cfg]['instance_pids'][i] = pid
+            self.states[c][cfg]['bad_pids'] = entry['bad_pids']
+            self.states[c][cfg]['queue_name'] = entry['queue_name']
+            if entry['instances'] is not None:
+                self.states[c][cfg]['instances_expected'] = entry['instances']
+
+            # retry counts kept by the instances (sr_retry), lines of retry files of those without.
+
+            self.states[c][cfg]['retry_queue'] = sum(entry['retry_counts'].values())
+            for pathname in entry['retry_states']:
+                if pathname[0:-6] not in entry['retry_counts']:
+                    self.states[c][cfg]['retry_queue'] += self._retry_lines(path + os.sep + pathname)
 
     def _find_missing_instances(self):
         """ find processes which are no longer running, based on pidfiles in state, and procs.
@@ -374,30 +584,13 @@ class sr_GlobalState:
         if not os.path.isdir(self.user_cache_dir):
            return
         os.chdir(self.user_cache_dir)
-        for c in self.components:
-            if os.path.isdir(c):
-                os.chdir(c)
-                for cfg in os.listdir():
-                    if os.path.isdir(cfg):
-                        os.chdir(cfg)
-                        for filename in os.listdir():
-                            if filename[-4:] == '.pid':
-                                i = int(filename[-6:-4])
-                                p = pathlib.Path(filename)
-                                if sys.version_info[0] > 3 or sys.version_info[1] > 4:
-                                    t = p.read_text().strip()
-                                else:
-                                    with p.open() as f:
-                                        t = f.read().strip()
-                                if t.isdigit():
-                                    pid = int(t)
-                                    if pid not in self.procs:
-                                        missing.append([c, cfg, i])
-                                else:
-                                    missing.append([c, cfg, i])
-
-                        os.chdir('..')
-                os.chdir('..')
+        for c in self.states:
+            for cfg in self.states[c]:
+                for i in self.states[c][cfg]['instance_pids']:
+                    if self.states[c][cfg]['instance_pids'][i] not in self.procs:
+                        missing.append([c, cfg, i])
+                for i in self.states[c][cfg]['bad_pids']:
+                    missing.append([c, cfg, i])
 
         self.missing = missing
 
@@ -445,11 +638,18 @@ class sr_GlobalState:
 
             os.chdir('log')
 
+            # the names of the logs, listed again only if the directory changed.
+            mtime = os.stat('.').st_mtime_ns
+            entry = self.snapshot.lookup('logs', 'log')
+            if entry is None or entry['mtime'] != mtime:
+                entry = { 'mtime': mtime, 'names': os.listdir() }
+                self.snapshot.store('logs', 'log', entry, mtime / 1e9)
+
             # FIXME: known issue... specify a log rotation interval < 1 d, it puts an _ between date and TIME.
             # ISO says this should be a T, but whatever... sr_shovel_t_dd1_f00_03.log.2019-12-27_12-43-01
             # the additional _ breaks this logic, can't be bothered to fix it yet... to unusual a case to worry about.
             # just patched to not crash for now.
-            for lf in os.listdir():
+            for lf in entry['names']:
                 lff = lf.split('_')
                 # print('looking at: %s' %lf )
                 if len(lff) > 3:
@@ -481,8 +681,8 @@ class sr_GlobalState:
             self.brokers[host]['post_exchanges'] = {}
             self.brokers[host]['exchanges'] = {}
             self.brokers[host]['queues'] = {}
-            if hasattr(self.admin_cfg,'admin') and host in self.admin_cfg.admin:
-                self.brokers[host]['admin'] = self.admin_cfg.admin 
+            if self.admin is not None and host in self.admin:
+                self.brokers[host]['admin'] = self.admin
 
         return host
 
@@ -509,36 +709,36 @@ class sr_GlobalState:
                 o = self.configs[c][cfg]['options']
                 name = c + os.sep + cfg
                 
-                if hasattr(o,'broker') and o.broker is not None:
-                    host = self._init_broker_host( o.broker.netloc )
+                if 'broker' in o:
+                    host = self._init_broker_host( o['broker'] )
 
-                    if hasattr(o,'exchange'):
+                    if 'exchange' in o:
 
-                        if hasattr(o,'queue'):
-                           q = o.queue
+                        if 'queue' in o:
+                           q = o['queue']
                         else:
                            try:
                               q = self.states[c][cfg]['queue_name']
                            except:
                               q = 'unknown'
 
-                        if o.exchange in self.brokers[host]['exchanges']:
-                            self.brokers[host]['exchanges'][o.exchange].append( q )
+                        if o['exchange'] in self.brokers[host]['exchanges']:
+                            self.brokers[host]['exchanges'][o['exchange']].append( q )
                         else:
-                            self.brokers[host]['exchanges'][o.exchange] = [ q ]
+                            self.brokers[host]['exchanges'][o['exchange']] = [ q ]
                         if q in self.brokers[host]['queues']:
                             self.brokers[host]['queues'][q].append( name )
                         else:
                             self.brokers[host]['queues'][q] = [ name ]
 
-                if hasattr(o,'post_broker') and o.post_broker is not None:
-                    host = self._init_broker_host( o.post_broker.netloc )
+                if 'post_broker' in o:
+                    host = self._init_broker_host( o['post_broker'] )
 
-                    if hasattr(o,'post_exchange'):
-                        if o.post_exchange in self.brokers[host]['post_exchanges']:
-                            self.brokers[host]['post_exchanges'][o.post_exchange].append( name )
+                    if 'post_exchange' in o:
+                        if o['post_exchange'] in self.brokers[host]['post_exchanges']:
+                            self.brokers[host]['post_exchanges'][o['post_exchange']].append( name )
                         else:
-                            self.brokers[host]['post_exchanges'][o.post_exchange]= [ name ]
+                            self.brokers[host]['post_exchanges'][o['post_exchange']]= [ name ]
                                       
         self.exchange_summary= {}
         for h in self.brokers:
@@ -648,6 +848,7 @@ class sr_GlobalState:
             self._read_procs()
 
         #print('procs, ', end='', flush=True)
+        self.snapshot = sr_snapshot(self.user_cache_dir + os.sep + 'sr_snapshot.json')
         self._read_configs()
         #print('got configs from %s' % self.user_config_dir, flush=True)
         self._read_states()
@@ -656,6 +857,8 @@ class sr_GlobalState:
         #print('logs, ', end='', flush=True)
         self._resolve()
         self._find_missing_instances()
+        if os.path.isdir(self.user_cache_dir):
+            self.snapshot.save()
         #print('analysis - Done. ', flush=True)
 
     def _start_missing(self):
@@ -926,6 +1129,12 @@ class sr_GlobalState:
         print("%-10s %-10s %-6s %3d" % ('audit', 'running', audst, self.auditors ))
         configs_running = 0
         missing_state_files=0
+
+        # missing instances of each configuration
+        missing = {}
+        for mc, mcfg, i in self.missing:
+            missing[(mc, mcfg)] = missing.get((mc, mcfg), 0) + 1
+
         for c in self.configs:
 
             status = {}
@@ -942,7 +1151,7 @@ class sr_GlobalState:
                     continue
 
                 if self.configs[c][cfg]['status'] != 'stopped' :
-                    m = sum( map( lambda x: c in x and cfg in x, self.missing ) ) #perhaps expensive, but I am lazy FIXME
+                    m = missing.get((c, cfg), 0)
                     sfx += '-i%d/%d' % ( \
                         len(self.states[c][cfg]['instance_pids']) - m, \
                         self.states[c][cfg]['instances_expected'])
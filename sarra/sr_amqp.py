@@ -33,6 +33,8 @@
 #
 
 import amqp
+import collections
+import socket
 
 from sarra.sr_util import *
 
@@ -268,6 +270,13 @@ class Consumer:
         if self.hc.use_pika:
             self.for_pika_msg = raw_message(self.logger)
 
+        # push mode (basic_consume): the broker delivers up to prefetch messages into a local buffer.
+        # builds counts channel (re)builds, delivery tags are only valid on the channel they came from.
+        self.buffer = collections.deque()
+        self.builds = 0
+        self.consumer_tag = None
+        self.drain_time = 0.01
+
     def add_prefetch(self, prefetch):
         # FIXME confusing name: should be call set_prefetch (this looks like a setter here)
         #  add_* would 'add' some value to a list, btw why would we need a setter
@@ -276,21 +285,41 @@ class Consumer:
     def build(self):
         self.logger.debug("building consumer")
         self.channel = self.hc.new_channel()
+
+        # messages pushed on a previous channel cannot be acked anymore, the broker will redeliver them.
+        self.buffer.clear()
+        self.builds += 1
+        self.consumer_tag = None
+
         if self.prefetch != 0:
             # FIXME if we dont care and only apply here why we put it in variable
             prefetch_size = 0  # dont care
             a_global = False  # only apply here
             self.channel.basic_qos(prefetch_size, self.prefetch, a_global)
 
-    def ack(self, msg):
+    def ack(self, msg, multiple=False):
         self.logger.debug("--------------> ACK")
-        self.logger.debug("--------------> %s" % msg.delivery_tag)
+        self.logger.debug("--------------> %s multiple=%s" % (msg.delivery_tag, multiple))
         # TODO 1. figure out if there is a risk of delivery_tag being 0 as we ack only single messages
         #  (default mutiple=False) and zero is reserved to ack multiple messages
         # TODO 2. basic_ack may raise many type of Exception that are not handled at this level which will then be
         #  reraise from here. Ensure that it is the expected behaviour and that we document those right here. Then
         #  every caller of this method will be advised of what to handle.
-        self.channel.basic_ack(msg.delivery_tag)
+        if multiple:
+            self.channel.basic_ack(msg.delivery_tag, multiple=True)
+        else:
+            self.channel.basic_ack(msg.delivery_tag)
+
+    def ack_batch(self, msg):
+        """Acknowledge msg and every message delivered before it on the channel (basic_ack multiple=True)
+
+        msg is the last message of a batch returned by consume_batch. If the channel was rebuilt since the
+        batch was delivered, the delivery tags are meaningless: nothing is acked and the broker redelivers.
+        """
+        if msg.builds != self.builds:
+            self.logger.debug("batch delivered on a previous channel, not acked (will be redelivered)")
+            return
+        self.ack(msg, multiple=True)
 
     def consume(self, queuename):
 
@@ -323,6 +352,73 @@ class Consumer:
             self.hc.reconnect()
             self.logger.debug("consume resume ok")
 
+    def consume_batch(self, queuename, timeout=1):
+        """Return a list of messages pushed by the broker (basic_consume), possibly empty.
+
+        Waits up to timeout seconds for a first delivery, then takes what else is already on the wire
+        until prefetch messages are buffered. The messages are not acked: once they are all processed,
+        the caller acks the last one with ack_batch.
+        """
+        limit = self.prefetch if self.prefetch > 0 else 100
+
+        while True:
+            try:
+                if self.consumer_tag is None:
+                    self.start_consuming(queuename)
+
+                if not self.buffer:
+                    self.wait_deliveries(timeout)
+
+                while 0 < len(self.buffer) < limit:
+                    count = len(self.buffer)
+                    self.wait_deliveries(self.drain_time)
+                    if len(self.buffer) == count:
+                        break
+
+                batch = []
+                while self.buffer and len(batch) < limit:
+                    batch.append(self.buffer.popleft())
+                return batch
+
+            except Exception as err:
+                self.logger.warning("sr_amqp/consume_batch: could not consume in queue %s: %s" % (queuename, err))
+                self.logger.debug('Exception details: ', exc_info=True)
+
+            self.hc.reconnect()
+            self.logger.debug("consume_batch resume ok")
+
+    def start_consuming(self, queuename):
+        self.logger.debug("basic_consume on queue %s (prefetch %d)" % (queuename, self.prefetch))
+        if self.hc.use_pika:
+            if int(pika.__version__.split('.')[0]) < 1:
+                self.consumer_tag = self.channel.basic_consume(self.__on_pika_delivery__, queue=queuename,
+                                                               no_ack=False)
+            else:
+                self.consumer_tag = self.channel.basic_consume(queuename, self.__on_pika_delivery__,
+                                                               auto_ack=False)
+        else:
+            self.consumer_tag = self.channel.basic_consume(queue=queuename, no_ack=False,
+                                                           callback=self.__on_delivery__)
+
+    def wait_deliveries(self, timeout):
+        if self.hc.use_pika:
+            self.hc.connection.process_data_events(time_limit=timeout)
+            return
+        try:
+            self.hc.connection.drain_events(timeout=timeout)
+        except socket.timeout:
+            pass
+
+    def __on_delivery__(self, msg):
+        msg.isRetry = False
+        msg.builds = self.builds
+        self.buffer.append(msg)
+
+    def __on_pika_delivery__(self, channel, method_frame, properties, body):
+        msg = raw_message(self.logger)
+        msg.pika_to_amqplib(method_frame, properties, body)
+        self.__on_delivery__(msg)
+
 
 # ==========
 # Publisher
@@ -340,12 +436,39 @@ class Publisher:
         self.restore_queue = None
         self.channel = None
 
+        # confirm_window > 0 : up to that many messages published but not yet confirmed by the broker
+        # (publisher confirms with amqp, one tx_commit per window with amqplib). They are kept in
+        # unconfirmed (sequence number -> (post number, publish arguments)) to be published again
+        # after a reconnection: the sequence number changes then, the post number does not.
+        self.confirm_window = 0
+        self.unconfirmed = collections.OrderedDict()
+        self.nacked = []
+        self.next_seq = 1
+        self.posted = 0
+
+        # acks of the messages consumed (after_confirms), held until the broker confirmed
+        # every post made before them: (post number, ack) in order.
+        self.acks = collections.deque()
+
+        # flush gives up after that many attempts (one connection attempt in between each),
+        # rather than hold shutdown forever when the broker is gone.
+        self.flush_attempts = 5
+
+    def set_confirm_window(self, window):
+        self.confirm_window = window
+
     def build(self):
         self.channel = self.hc.new_channel()
         if self.hc.use_pika:
             self.channel.confirm_delivery()
+        elif self.confirm_window > 0 and self.hc.use_amqp:
+            self.channel.confirm_select()
+            self.channel.events['basic_ack'].add(self.__on_ack__)
+            self.channel.events['basic_nack'].add(self.__on_nack__)
         else:
             self.channel.tx_select()
+        self.next_seq = 1
+        self.replay()
 
     def is_alive(self):
         # FIXME: is_alive is dead code, it caused problems and so was removed.
@@ -366,49 +489,93 @@ class Publisher:
         alarm_cancel()
         return True
 
+    def is_windowed(self):
+        return self.confirm_window > 0 and not self.hc.use_pika
+
+    def flush(self):
+        """Wait until every message published so far is confirmed (amqp) or committed (amqplib).
+
+        Called on heartbeat and before closing the connection. Messages still unconfirmed when
+        the connection fails are published again once reconnected. After flush_attempts, gives up
+        and returns False: those messages are lost if the connection is closed.
+        """
+        if not self.is_windowed() or self.channel is None:
+            return True
+
+        ebo = 2
+        for attempt in range(self.flush_attempts):
+            try:
+                self.settle(0)
+                return True
+            except Exception as err:
+                if attempt == self.flush_attempts - 1:
+                    self.logger.error("sr_amqp/flush: %s" % err)
+                    break
+                if ebo < 65:
+                    ebo = ebo * 2
+                self.logger.error("sr_amqp/flush: %s, sleeping %d seconds ... and reconnecting" % (err, ebo))
+                self.logger.debug('Exception details: ', exc_info=True)
+                time.sleep(ebo)
+
+            # a single connection attempt: the broker may be gone for good
+            loop = self.hc.loop
+            self.hc.loop = False
+            try:
+                self.hc.reconnect()
+            finally:
+                self.hc.loop = loop
+
+        self.logger.error("sr_amqp/flush: giving up after %d attempts, %d messages not confirmed, %d not acked" %
+                          (self.flush_attempts, len(self.unconfirmed) + len(self.nacked), len(self.acks)))
+        return False
+
+    def after_confirms(self, ack):
+        """Call ack once every message published so far is confirmed (at once when nothing is pending).
+
+        Messages consumed are acked this way, so the broker keeps them until what was posted for them
+        is safe: should the process die before, they are delivered again (at-least-once).
+        """
+        self.acks.append((self.posted, ack))
+        self.release_acks()
+
+    def release_acks(self):
+        """Call the acks that every confirmation they wait for has arrived."""
+        if not self.acks:
+            return
+
+        pending = [posted for posted, args in self.unconfirmed.values()] + [posted for posted, args in self.nacked]
+        oldest = min(pending) if pending else self.posted + 1
+
+        while self.acks and self.acks[0][0] < oldest:
+            posted, ack = self.acks.popleft()
+            try:
+                ack()
+            except Exception as err:
+                self.logger.error("sr_amqp/release_acks: %s" % err)
+                self.logger.debug('Exception details: ', exc_info=True)
+
     def publish(self, exchange_name, exchange_key, message, mheaders, mexp=0):
 
       ebo=2
-      connected=True
+      queued=False
       while True:
-        if 'v03.' in exchange_key:
-            ct='application/json'
-        else:
-            ct='text/plain'
         try:
-            if self.hc.use_amqp:
-                self.logger.debug("publish AMQP is used")
-                if mexp:
-                    expms = '%s' % mexp
-                    msg = amqp.Message(message, content_type=ct, application_headers=mheaders,
-                                       expiration=expms)
-                else:
-                    msg = amqp.Message(message, content_type=ct, application_headers=mheaders)
-                self.channel.basic_publish(msg, exchange_name, exchange_key)
-                self.channel.tx_commit()
-            elif self.hc.use_amqplib:
-                self.logger.debug("publish AMQPLIB is used")
-                if mexp:
-                    expms = '%s' % mexp
-                    msg = amqplib_0_8.Message(message, content_type=ct, application_headers=mheaders,
-                                              expiration=expms)
-                else:
-                    msg = amqplib_0_8.Message(message, content_type=ct, application_headers=mheaders)
-                self.channel.basic_publish(msg, exchange_name, exchange_key)
-                self.channel.tx_commit()
-            elif self.hc.use_pika:
-                self.logger.debug("publish PIKA is used")
-                if mexp:
-                    expms = '%s' % mexp
-                    properties = pika.BasicProperties(content_type=ct, delivery_mode=1, headers=mheaders,
-                                                      expiration=expms)
-                else:
-                    properties = pika.BasicProperties(content_type=ct, delivery_mode=1, headers=mheaders)
-                self.channel.basic_publish(exchange_name, exchange_key, message, properties, True)
-            else:
-                self.logger.debug("Couldn't choose an AMQP client library, setting it back to default amqp")
-                self.hc.use_amqp = True
-                raise ConnectionError("No AMQP client library is set")
+            if not queued:
+                self.basic_publish(exchange_name, exchange_key, message, mheaders, mexp)
+                if self.is_windowed():
+                    # caller reuses its headers dict for the next message, keep a copy for replay.
+                    if mheaders is not None:
+                        mheaders = mheaders.copy()
+                    self.posted += 1
+                    self.unconfirmed[self.next_seq] = (self.posted, (exchange_name, exchange_key, message, mheaders, mexp))
+                    self.next_seq += 1
+                    queued = True
+                elif not self.hc.use_pika:
+                    self.channel.tx_commit()
+
+            # once queued, a reconnection replays the message: it must not be published again here.
+            if queued:
+                self.settle(self.confirm_window - 1)
             return True
         except Exception as err:
                 if  ebo <  65: 
@@ -416,11 +583,114 @@ class Publisher:
                 self.logger.error("sr_amqp/publish: Sleeping %d seconds ... and reconnecting" % ebo)
                 self.logger.debug('Exception details: ', exc_info=True)
                 time.sleep(ebo)
-                connected=False
 
-        if not connected:
-            self.hc.reconnect()
+        self.hc.reconnect()
+
+    def basic_publish(self, exchange_name, exchange_key, message, mheaders, mexp=0):
+        if 'v03.' in exchange_key:
+            ct='application/json'
+        else:
+            ct='text/plain'
+
+        if self.hc.use_amqp:
+            self.logger.debug("publish AMQP is used")
+            if mexp:
+                expms = '%s' % mexp
+                msg = amqp.Message(message, content_type=ct, application_headers=mheaders,
+                                   expiration=expms)
+            else:
+                msg = amqp.Message(message, content_type=ct, application_headers=mheaders)
+            self.channel.basic_publish(msg, exchange_name, exchange_key)
+        elif self.hc.use_amqplib:
+            self.logger.debug("publish AMQPLIB is used")
+            if mexp:
+                expms = '%s' % mexp
+                msg = amqplib_0_8.Message(message, content_type=ct, application_headers=mheaders,
+                                          expiration=expms)
+            else:
+                msg = amqplib_0_8.Message(message, content_type=ct, application_headers=mheaders)
+            self.channel.basic_publish(msg, exchange_name, exchange_key)
+        elif self.hc.use_pika:
+            self.logger.debug("publish PIKA is used")
+            if mexp:
+                expms = '%s' % mexp
+                properties = pika.BasicProperties(content_type=ct, delivery_mode=1, headers=mheaders,
+                                                  expiration=expms)
+            else:
+                properties = pika.BasicProperties(content_type=ct, delivery_mode=1, headers=mheaders)
+            self.channel.basic_publish(exchange_name, exchange_key, message, properties, True)
+        else:
+            self.logger.debug("Couldn't choose an AMQP client library, setting it back to default amqp")
+            self.hc.use_amqp = True
+            raise ConnectionError("No AMQP client library is set")
+
+    def replay(self):
+        """Publish again, on a new channel, the messages the broker did not confirm (at-least-once)."""
+        pending = list(self.unconfirmed.values()) + self.nacked
+        if not pending:
+            return
+
+        self.logger.warning("publishing again %d unconfirmed messages" % len(pending))
+
+        # renumber everything first: should the channel fail half way, they all get replayed again.
+        self.unconfirmed.clear()
+        self.nacked = []
+        for entry in pending:
+            self.unconfirmed[self.next_seq] = entry
+            self.next_seq += 1
+
+        for posted, args in pending:
+            self.basic_publish(*args)
+
+    def settle(self, maximum):
+        """Wait for confirmations (amqp) or commit (amqplib) until at most maximum messages are unconfirmed."""
+        if len(self.unconfirmed) <= maximum and not self.nacked:
+            self.release_acks()
+            return
+
+        if not self.hc.use_amqp:
+            self.channel.tx_commit()
+            self.unconfirmed.clear()
+            self.release_acks()
+            return
+
+        deadline = time.time() + self.iotime
+        while len(self.unconfirmed) > maximum or self.nacked:
+            if self.nacked:
+                self.logger.warning("broker refused %d messages, publishing them again" % len(self.nacked))
+                nacked = self.nacked
+                self.nacked = []
+                for entry in nacked:
+                    self.unconfirmed[self.next_seq] = entry
+                    self.next_seq += 1
+                    self.basic_publish(*entry[1])
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError("%d messages unconfirmed after %d seconds" % (len(self.unconfirmed), self.iotime))
+            try:
+                self.hc.connection.drain_events(timeout=remaining)
+            except socket.timeout:
+                pass
+
+        self.release_acks()
+
+    def __confirmed__(self, delivery_tag, multiple):
+        if not multiple:
+            return [self.unconfirmed.pop(delivery_tag)] if delivery_tag in self.unconfirmed else []
+        done = []
+        while self.unconfirmed:
+            seq = next(iter(self.unconfirmed))
+            if seq > delivery_tag:
+                break
+            done.append(self.unconfirmed.pop(seq))
+        return done
+
+    def __on_ack__(self, delivery_tag, multiple):
+        self.__confirmed__(delivery_tag, multiple)
 
+    def __on_nack__(self, delivery_tag, multiple):
+        self.nacked.extend(self.__confirmed__(delivery_tag, multiple))
 
     def restore_clear(self):
         if self.restore_queue and self.restore_exchange:
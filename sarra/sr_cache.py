@@ -31,7 +31,7 @@
 #
 #
 
-import os
+import collections, os, re, sqlite3, sys
 
 import urllib.parse
 
@@ -46,7 +46,45 @@ import urllib.parse
 # cache_dict : {}  
 #              cache_dict[sum] = {path1*part1: time1, path2*part2: time2, ...}
 #
-from sarra.sr_util import nowflt
+# cache_backend indexed (sr_cache_indexed) keeps the same lines, but spread over segments :
+#              recent_files_001.cache            (segment being appended to)
+#              recent_files_001.cache.000012     (sealed segments)
+#
+# cache_backend shared (sr_cache_shared) : one sqlite database for all instances
+#              recent_files_shared.sqlite
+#
+from sarra.sr_timestamp import nowflt
+
+
+def new_cache(parent):
+    """ return the duplicate suppression cache selected by the cache_backend option
+    """
+    if parent.cache_backend == 'indexed':
+        return sr_cache_indexed(parent)
+    if parent.cache_backend == 'shared':
+        return sr_cache_shared(parent)
+    return sr_cache(parent)
+
+
+def compact_key(key):
+    """ 'd,5d41402abc4b2a76b9719d911017c592' -> b'd' + 16 bytes of digest, other keys interned
+    """
+    if len(key) > 2 and key[1] == ',':
+        try:
+            return key[0].encode() + bytes.fromhex(key[2:])
+        except ValueError:
+            pass
+    return sys.intern(key)
+
+
+def same_block(ptoken, opart):
+    """ True when opart is another announcement of the block in ptoken (split part string),
+        only the block count and remainder differ (file announced again with a new size).
+    """
+    if opart is None or opart[0] not in "pi" : return False
+    otoken = opart.split(',')
+    if otoken == ptoken : return False
+    return otoken[0:2] == ptoken[0:2] and otoken[4:] == ptoken[4:]
 
 
 class sr_cache():
@@ -76,7 +114,7 @@ class sr_cache():
 
         # set time and value
         now   = nowflt()
-        relpath = self.__get_relpath(path)
+        relpath = self.__get_relpath__(path)
         qpath = urllib.parse.quote(relpath)
         value = '%s*%s' % (relpath, part)
 
@@ -147,7 +185,7 @@ class sr_cache():
     def check_msg(self, msg):
         self.logger.debug("sr_cache check_msg")
 
-        relpath = self.__get_relpath(msg.relpath)
+        relpath = self.__get_relpath__(msg.relpath)
         sumstr  = msg.headers['sum']
         partstr = relpath
 
@@ -156,7 +194,7 @@ class sr_cache():
 
         return self.check(sumstr,relpath,partstr)
 
-    def __get_relpath(self, path):
+    def __get_relpath__(self, path):
         if self.cache_basis == 'name':
             result = path.split('/')[-1]
         elif self.cache_basis == 'path':
@@ -346,3 +384,493 @@ class sr_cache():
            self.last_expire = now
            self.clean()
 
+
+
+class sr_cache_indexed(sr_cache):
+    """ duplicate suppression cache for large caching windows (cache_backend indexed)
+
+    Same interface as sr_cache, but :
+
+      - keys are compacted (hex checksums kept as bytes) and path/part strings interned,
+      - an expiry index in time order makes clean() visit only the entries that expired,
+      - save() does not rewrite the file: it seals the current segment and opens a new one.
+        A segment is removed once all its entries expired, and compacted only when fewer
+        than half of its lines are still alive.  The deletions (delete_path) it records are
+        kept as long as an older segment, that may hold the deleted entries, is on disk.
+
+    The segment format is the one of sr_cache, so an existing cache file is simply loaded
+    as the current segment.
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.entries   = {}                    # ckey -> { (path,part) : (time,segno) }
+        self.expiry    = collections.deque()   # (time, ckey, (path,part)) oldest first
+        self.segments  = {}                    # segno -> [ lines written, entries alive ]
+        self.deletions = {}                    # segno -> deletion lines written
+        self.segno     = 0                     # segment being appended to
+
+    def __segment_path__(self, segno):
+        return '%s.%06d' % (self.cache_file, segno)
+
+    def __sealed_segments__(self):
+        if self.cache_file is None: return []
+
+        cdir, cname = os.path.split(self.cache_file)
+        pattern = re.compile(re.escape(cname) + r'\.(\d{6})$')
+        segnos = []
+        for f in os.listdir(cdir or '.'):
+            m = pattern.match(f)
+            if m: segnos.append(int(m.group(1)))
+        return sorted(segnos)
+
+    def __set_entry__(self, ckey, kdict, value, now, segno):
+        old = kdict.get(value)
+        if old is not None:
+            self.segments[old[1]][1] -= 1
+        else:
+            self.count += 1
+        kdict[value] = (now, segno)
+        self.segments[segno][1] += 1
+
+    def __write__(self, key, now, path, part):
+        self.fp.write("%s %f %s %s\n" % (key, now, urllib.parse.quote(path), part))
+        self.segments[self.segno][0] += 1
+
+    def check(self, key, path, part):
+        self.logger.debug("sr_cache_indexed check basis=%s" % self.cache_basis)
+
+        self.cache_hit = None
+
+        now   = nowflt()
+        path  = sys.intern(self.__get_relpath__(path))
+        if type(part) is str: part = sys.intern(part)
+        value = (path, part)
+        ckey  = compact_key(key)
+
+        self.__write__(key, now, path, part)
+
+        kdict = self.entries.get(ckey)
+        if kdict is None:
+           kdict = {}
+           self.entries[ckey] = kdict
+           present = False
+        else:
+           present = value in kdict
+
+        self.__set_entry__(ckey, kdict, value, now, self.segno)
+        self.expiry.append((now, ckey, value))
+
+        if present:
+           self.cache_hit = '%s*%s' % value
+           return False
+
+        if part is None or part[0] not in "pi":
+           return True
+
+        ptoken = part.split(',')
+        if len(ptoken) < 5:
+           return True
+
+        # same block of the same file, announced with a different block count/remainder: old part
+
+        for opath, opart in kdict:
+            if opath == path and same_block(ptoken, opart):
+               self.cache_hit = '%s*%s' % (opath, opart)
+               return False
+
+        return True
+
+    def clean(self, persist=False, delpath=None):
+        self.logger.debug("sr_cache_indexed clean")
+
+        # only expired entries are visited
+
+        now = nowflt()
+        while self.expiry and now - self.expiry[0][0] > self.expire:
+            t, ckey, value = self.expiry.popleft()
+            kdict = self.entries.get(ckey)
+            if kdict is None : continue
+            current = kdict.get(value)
+
+            # refreshed (or deleted) since, a newer index item covers it
+            if current is None or current[0] != t : continue
+
+            del kdict[value]
+            self.segments[current[1]][1] -= 1
+            self.count -= 1
+            if not kdict : del self.entries[ckey]
+
+        if delpath is not None:
+           self.__delete_path__(delpath)
+
+        if persist:
+           self.compact()
+
+    def __delete_path__(self, delpath):
+        for ckey in list(self.entries.keys()):
+            kdict = self.entries[ckey]
+            for value in [ v for v in kdict if v[0] == delpath ]:
+                current = kdict.pop(value)
+                self.segments[current[1]][1] -= 1
+                self.count -= 1
+            if not kdict : del self.entries[ckey]
+
+    def close(self, unlink=False):
+        self.logger.debug("sr_cache_indexed close")
+        try:
+            self.fp.flush()
+            self.fp.close()
+        except Exception as err:
+            self.logger.warning('did not close: cache_file={}, err={}'.format(self.cache_file, err))
+            self.logger.debug('Exception details:', exc_info=True)
+        self.fp = None
+
+        if unlink:
+            for segno in self.__sealed_segments__():
+                os.unlink(self.__segment_path__(segno))
+            try:
+                os.unlink(self.cache_file)
+            except Exception as err:
+                self.logger.warning("did not unlink: cache_file={}: err={}".format(self.cache_file, err))
+                self.logger.debug('Exception details:', exc_info=True)
+
+        self.entries   = {}
+        self.expiry    = collections.deque()
+        self.segments  = {}
+        self.deletions = {}
+        self.count     = 0
+
+    def compact(self):
+        """ remove dead segments, rewrite the ones mostly dead. The current segment is left alone.
+        """
+        # oldest first : a segment removed may free the deletions of the newer ones
+
+        for segno in sorted(self.segments.keys()):
+            if segno == self.segno : continue
+            written, alive = self.segments[segno]
+            segpath = self.__segment_path__(segno)
+
+            # its deletions are needed while an older segment may hold the deleted entries
+            deleted = self.deletions.get(segno, 0) if min(self.segments) < segno else 0
+
+            if alive <= 0 and deleted == 0:
+               self.logger.debug("sr_cache_indexed removing segment %s" % segpath)
+               try:
+                   os.unlink(segpath)
+               except FileNotFoundError:
+                   pass
+               del self.segments[segno]
+               self.deletions.pop(segno, None)
+
+            elif (alive + deleted) * 2 < written:
+               self.logger.debug("sr_cache_indexed compacting segment %s (%d/%d)" % (segpath, alive, written))
+               self.__rewrite_segment__(segno, deleted > 0)
+
+    def __rewrite_segment__(self, segno, keep_deletions=False):
+        segpath = self.__segment_path__(segno)
+        tmppath = segpath + '.tmp'
+        written = 0
+
+        with open(segpath, 'r') as src, open(tmppath, 'w') as dst:
+            for line in src:
+                words = line.split()
+                if len(words) < 4 : continue
+                if words[0] == '-' :
+                   if keep_deletions :
+                      dst.write(line)
+                      written += 1
+                   continue
+                path  = urllib.parse.unquote(words[2])
+                kdict = self.entries.get(compact_key(words[0]))
+                if kdict is None : continue
+                current = kdict.get((path, None if words[3] == 'None' else words[3]))
+                if current is None or current[1] != segno : continue
+                # a key refreshed within the same segment: keep only its last line
+                if abs(current[0] - float(words[1])) > 0.000001 : continue
+                dst.write(line)
+                written += 1
+
+        os.rename(tmppath, segpath)
+        self.segments[segno][0] = written
+        if not keep_deletions : self.deletions.pop(segno, None)
+
+    def delete_path(self, delpath):
+        self.logger.debug("sr_cache_indexed delete_path")
+
+        # remember the deletion in the segment (for load), rather than rewriting the cache
+        self.fp.write("- %f %s -\n" % (nowflt(), urllib.parse.quote(delpath)))
+        self.segments[self.segno][0] += 1
+        self.deletions[self.segno] = self.deletions.get(self.segno, 0) + 1
+
+        self.__delete_path__(delpath)
+
+    def free(self):
+        self.logger.debug("sr_cache_indexed free")
+        self.close(unlink=True)
+        self.segno    = 0
+        self.segments = { self.segno : [0, 0] }
+        self.fp       = open(self.cache_file,'w')
+
+    def load(self):
+        self.logger.debug("sr_cache_indexed load")
+        self.entries   = {}
+        self.segments  = {}
+        self.deletions = {}
+        self.count     = 0
+
+        now    = nowflt()
+        sealed = self.__sealed_segments__()
+        loaded = []
+
+        for segno in sealed:
+            self.__load_segment__(self.__segment_path__(segno), segno, now, loaded)
+
+        self.segno = sealed[-1] + 1 if sealed else 0
+        if not os.path.isfile(self.cache_file) :
+           self.fp = open(self.cache_file,'w')
+           self.fp.close()
+        self.__load_segment__(self.cache_file, self.segno, now, loaded)
+
+        # expiry index: time order, stale items (refreshed or deleted keys) are skipped by clean
+
+        loaded.sort(key=lambda item: item[0])
+        self.expiry = collections.deque(loaded)
+
+        self.fp = open(self.cache_file,'a')
+
+        self.logger.debug("sr_cache_indexed loaded %d entries from %d segments" % (self.count, len(self.segments)))
+
+    def __load_segment__(self, segpath, segno, now, loaded):
+        self.segments[segno] = [0, 0]
+        lineno = 0
+        with open(segpath, 'r') as fp:
+            for line in fp:
+                lineno += 1
+                self.segments[segno][0] += 1
+                try:
+                    words = line.split()
+                    key   = words[0]
+                    ctime = float(words[1])
+                    path  = sys.intern(urllib.parse.unquote(words[2]))
+                    part  = None if words[3] == 'None' else sys.intern(words[3])
+                except Exception as err:
+                    err_msg_fmt = "load corrupted: lineno={}, cache_file={}, err={}"
+                    self.logger.error(err_msg_fmt.format(lineno, segpath, err))
+                    self.logger.debug('Exception details:', exc_info=True)
+                    continue
+
+                if key == '-':
+                   self.deletions[segno] = self.deletions.get(segno, 0) + 1
+                   self.__delete_path__(path)
+                   continue
+
+                if now - ctime > self.expire : continue
+
+                ckey  = compact_key(key)
+                kdict = self.entries.setdefault(ckey, {})
+                value = (path, part)
+                self.__set_entry__(ckey, kdict, value, ctime, segno)
+                loaded.append((ctime, ckey, value))
+
+    def save(self):
+        self.logger.debug("sr_cache_indexed save")
+
+        self.clean()
+
+        # seal the current segment, unless nothing was written to it
+
+        if self.segments.get(self.segno, [0, 0])[0] > 0:
+           try:
+               self.fp.close()
+               os.rename(self.cache_file, self.__segment_path__(self.segno))
+               self.segno += 1
+               self.segments[self.segno] = [0, 0]
+               self.fp = open(self.cache_file, 'w')
+           except Exception as err:
+               self.logger.warning("did not seal: cache_file={}, err={}".format(self.cache_file, err))
+               self.logger.debug('Exception details:', exc_info=True)
+               if self.fp is None or self.fp.closed: self.fp = open(self.cache_file, 'a')
+
+        self.compact()
+
+
+class sr_cache_shared(sr_cache):
+    """ duplicate suppression cache shared by all instances of a configuration (cache_backend shared)
+
+    Entries live in an SQLite database (WAL journal) in the configuration's cache directory,
+    so N instances consuming from the same queue suppress each other's duplicates: no need
+    for exchange_split. check() is one IMMEDIATE transaction: the lookup and the insert are
+    atomic with respect to the other instances.
+
+    A small in-process LRU answers for entries this instance saw recently. Their time refresh
+    is written to the database at the next save().
+    """
+
+    lru_max = 100000
+
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.db      = None
+        self.lru     = collections.OrderedDict()   # (ckey,path,part) -> time
+        self.refresh = {}                          # (ckey,path,part) -> time, not yet in db
+
+    def check(self, key, path, part):
+        self.logger.debug("sr_cache_shared check basis=%s" % self.cache_basis)
+
+        self.cache_hit = None
+
+        now   = nowflt()
+        path  = self.__get_relpath__(path)
+        spart = str(part)
+        ckey  = compact_key(key)
+        lkey  = (ckey, path, spart)
+
+        t = self.lru.get(lkey)
+        if t is not None and now - t <= self.expire:
+           self.lru.move_to_end(lkey)
+           self.lru[lkey]     = now
+           self.refresh[lkey] = now
+           self.cache_hit     = '%s*%s' % (path, spart)
+           return False
+
+        # atomic check and insert, against the other instances
+
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            rows = self.db.execute('SELECT part, time FROM cache WHERE key=? AND path=?', (ckey, path)).fetchall()
+            self.db.execute('INSERT OR REPLACE INTO cache VALUES (?,?,?,?)', (ckey, path, spart, now))
+        except:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+        self.lru[lkey] = now
+        self.refresh.pop(lkey, None)
+        if len(self.lru) > self.lru_max: self.lru.popitem(last=False)
+
+        # rows not yet cleaned, but expired, do not count
+
+        parts = [ p for p, t in rows if now - t <= self.expire ]
+
+        if spart in parts:
+           self.cache_hit = '%s*%s' % (path, spart)
+           return False
+
+        self.count += 1
+
+        if part is None or part[0] not in "pi":
+           return True
+
+        ptoken = part.split(',')
+        if len(ptoken) < 5:
+           return True
+
+        for opart in parts:
+            if same_block(ptoken, opart):
+               self.cache_hit = '%s*%s' % (path, opart)
+               return False
+
+        return True
+
+    def clean(self, persist=False, delpath=None):
+        self.logger.debug("sr_cache_shared clean")
+
+        self.__flush_refresh__()
+
+        # the time index makes this visit only expired rows
+
+        now = nowflt()
+        self.db.execute('DELETE FROM cache WHERE time < ?', (now - self.expire,))
+        if delpath is not None:
+           self.db.execute('DELETE FROM cache WHERE path=?', (delpath,))
+
+        for lkey in [ k for k, t in self.lru.items() if now - t > self.expire or k[1] == delpath ]:
+            del self.lru[lkey]
+
+        self.count = self.db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def __flush_refresh__(self):
+        if not self.refresh : return
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            # re-insert as well: another instance may have expired the row in the meantime
+            # (not an upsert : ON CONFLICT needs sqlite >= 3.24)
+            self.db.executemany('INSERT OR IGNORE INTO cache VALUES (?,?,?,?)',
+                                [ (k[0], k[1], k[2], t) for k, t in self.refresh.items() ])
+            self.db.executemany('UPDATE cache SET time=max(time,?) WHERE key=? AND path=? AND part=?',
+                                [ (t, k[0], k[1], k[2]) for k, t in self.refresh.items() ])
+        except:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+        self.refresh = {}
+
+    def close(self, unlink=False):
+        self.logger.debug("sr_cache_shared close")
+        try:
+            self.__flush_refresh__()
+            self.db.close()
+        except Exception as err:
+            self.logger.warning('did not close: cache_file={}, err={}'.format(self.cache_file, err))
+            self.logger.debug('Exception details:', exc_info=True)
+        self.db = None
+
+        if unlink and self.cache_file:
+            for f in [ self.cache_file, self.cache_file + '-wal', self.cache_file + '-shm' ]:
+                try:
+                    if os.path.exists(f): os.unlink(f)
+                except Exception as err:
+                    self.logger.warning("did not unlink: cache_file={}: err={}".format(f, err))
+                    self.logger.debug('Exception details:', exc_info=True)
+
+        self.lru     = collections.OrderedDict()
+        self.refresh = {}
+        self.count   = 0
+
+    def delete_path(self, delpath):
+        self.logger.debug("sr_cache_shared delete_path")
+        self.clean(delpath=delpath)
+
+    def free(self):
+        self.logger.debug("sr_cache_shared free")
+        self.db.execute('DELETE FROM cache')
+        self.lru     = collections.OrderedDict()
+        self.refresh = {}
+        self.count   = 0
+
+    def load(self):
+        self.logger.debug("sr_cache_shared load")
+
+        # isolation_level None : transactions are explicit (BEGIN IMMEDIATE in check)
+        self.db = sqlite3.connect(self.cache_file, timeout=60, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS cache ( key BLOB, path TEXT, part TEXT, time REAL, '
+                        'PRIMARY KEY (key, path, part) ) WITHOUT ROWID')
+        self.db.execute('CREATE INDEX IF NOT EXISTS cache_time ON cache (time)')
+
+        self.lru     = collections.OrderedDict()
+        self.refresh = {}
+        self.count   = self.db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def open(self, cache_file = None):
+
+        self.cache_file = cache_file
+
+        # one file for all instances
+
+        if cache_file is None :
+           self.cache_file = self.parent.user_cache_dir + os.sep + 'recent_files_shared.sqlite'
+
+        self.load()
+
+    def save(self):
+        self.logger.debug("sr_cache_shared save")
+        try:
+            self.clean()
+        except Exception as err:
+            self.logger.warning("did not clean: cache_file={}, err={}".format(self.cache_file, err))
+            self.logger.debug('Exception details:', exc_info=True)
@@ -67,6 +67,7 @@ class sr_cfg2:
        self.filename = None
        self.flatten = '/'
        self.hostname = socket.getfqdn()
+       self.includes = []
        self.masks =  []
        self.mirror = False
        self.strip = 0
@@ -249,6 +250,7 @@ class sr_cfg2:
            elif line[0] in [ 'declare' ]:
                self._parse_declare( line[1:] )
            elif line[0] in [ 'include' ]:
+               self.includes.append( os.path.abspath( line[1] ) )
                try:
                    self.parse_file( line[1] )
                except:
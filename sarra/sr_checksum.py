@@ -16,10 +16,12 @@ checksums are used by:
 
 The API of a checksum class (in calling sequence order):
    __init__      -- initialize the value of a checksum for a part.
+   available     -- False when the algorithm cannot work here (python module missing), it is not registered.
    get_value     -- return the current calculated checksum value.
    registered_as -- return the letter or string under which this checksum is named in post message
    set_path      -- identify the checksumming algorithm to be used by update.
    update        -- given this chunk of the file, update the checksum for the part
+                    (a bytes-like object: bytes, or a memoryview of a memory mapped file)
 
 The API allows for checksums to be calculated while transfer is in progress 
 rather than after the fact as a second pass through the data.  
@@ -37,6 +39,9 @@ class sr_checksum(object):
       def __init__(self):
           self.value = None
 
+      def available(self):
+          return True
+
       def get_value(self):
           return self.value
 
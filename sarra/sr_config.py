@@ -30,8 +30,8 @@
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
 #
 
-import glob, inspect, logging
-import netifaces, random
+import glob, hashlib, inspect, logging
+import marshal, netifaces, random
 import os, os.path
 import re, shutil
 import socket, subprocess, sys
@@ -48,11 +48,13 @@ from logging import handlers
 try :
    from sr_checksum          import *
    from sr_credentials       import *
+   from sr_matcher           import *
    from sr_util              import *
    from sr_xattr             import *
 except :
    from sarra.sr_checksum    import *
    from sarra.sr_credentials import *
+   from sarra.sr_matcher     import *
    from sarra.sr_util        import *
    from sarra.sr_xattr       import *
 
@@ -168,6 +170,8 @@ class sr_config:
         self.user_log_dir     = appdirs.user_log_dir   (self.appname,self.appauthor)
         self.user_old_log_dir     = self.user_log_dir.replace(os.sep+'log',os.sep+'var'+os.sep+'log')
         self.user_plugins_dir = self.user_config_dir + '/plugins'
+        self.plugin_cache_dir = appdirs.user_cache_dir(self.appname,self.appauthor) + os.sep + 'pycache' + \
+                                os.sep + sys.implementation.cache_tag
         self.http_dir         = self.user_config_dir + '/Downloads'
 
         # umask change for directory creation and chmod
@@ -232,7 +236,7 @@ class sr_config:
 
         self.hostname  = socket.getfqdn()
         self.tls_rigour = 'normal'
-        self.tlsctx    = ssl.create_default_context()
+        self.tlsctx    = None
         self.randid    = "%04x" % random.randint(0,65536)
 
         # logging is interactive at start
@@ -317,6 +321,18 @@ class sr_config:
         #self.supports_extended_attributes = supports_extended_attributes
 
 
+    # tlsctx : the default tls context (tls_rigour normal) is made when first used (https)...
+    #          loading the certificates of the system is most of the configuration time.
+
+    @property
+    def tlsctx(self):
+        if self._tlsctx is None : self._tlsctx = ssl.create_default_context()
+        return self._tlsctx
+
+    @tlsctx.setter
+    def tlsctx(self, ctx):
+        self._tlsctx = ctx
+
     def xcl( self, x ):
         if sys.hexversion > 0x03030000 :
             return x.__qualname__.split('.')[0] + ' '
@@ -331,22 +347,24 @@ class sr_config:
            ( self.inflight, self.events, self.use_pika, self.topic_prefix, self.dry_run) )
         self.logger.info( "\tinline=%s events=%s use_amqplib=%s topic_prefix=%s" % \
            ( self.inline, self.events, self.use_amqplib, self.topic_prefix) )
-        self.logger.info( "\tsuppress_duplicates=%s basis=%s retry_mode=%s retry_ttl=%sms tls_rigour=%s" % \
-           ( self.caching, self.cache_basis, self.retry_mode, self.retry_ttl, self.tls_rigour ) )
-        self.logger.info( "\texpire=%sms reset=%s message_ttl=%s prefetch=%s accept_unmatch=%s delete=%s poll_without_vip=%s" % \
-           ( self.expire, self.reset, self.message_ttl, self.prefetch, self.accept_unmatch, self.delete, self.poll_without_vip ) )
+        self.logger.info( "\tsuppress_duplicates=%s basis=%s backend=%s retry_mode=%s retry_ttl=%sms retry_backend=%s retry_backoff=%s-%ss tls_rigour=%s" % \
+           ( self.caching, self.cache_basis, self.cache_backend, self.retry_mode, self.retry_ttl, self.retry_backend,
+             self.retry_backoff, self.retry_backoff_max, self.tls_rigour ) )
+        self.logger.info( "\texpire=%sms reset=%s message_ttl=%s prefetch=%s batch_consume=%s accept_unmatch=%s topic_prefilter=%s delete=%s poll_without_vip=%s" % \
+           ( self.expire, self.reset, self.message_ttl, self.prefetch, self.batch_consume, self.accept_unmatch, self.topic_prefilter, self.delete, self.poll_without_vip ) )
         self.logger.info( "\theartbeat=%s sanity_log_dead=%s default_mode=%03o default_mode_dir=%03o default_mode_log=%03o discard=%s durable=%s" % \
            ( self.heartbeat, self.sanity_log_dead, self.chmod, self.chmod_dir, self.chmod_log, self.discard, self.durable ) )
-        self.logger.info( "\tdeclare_queue=%s declare_exchange=%s bind_queue=%s" % ( self.declare_queue, self.declare_exchange, self.bind_queue ) )
-        self.logger.info( "\tpost_on_start=%s preserve_mode=%s preserve_time=%s realpath_post=%s base_dir=%s follow_symlinks=%s" % \
-           ( self.post_on_start, self.preserve_mode, self.preserve_time, self.realpath_post, self.base_dir, self.follow_symlinks ) )
+        self.logger.info( "\tdeclare_queue=%s declare_exchange=%s bind_queue=%s download_workers=%d transport_pool=%d transport_idle=%ss" % \
+           ( self.declare_queue, self.declare_exchange, self.bind_queue, self.download_workers, self.transport_pool, self.transport_idle ) )
+        self.logger.info( "\tpost_on_start=%s preserve_mode=%s preserve_time=%s realpath_post=%s base_dir=%s follow_symlinks=%s ls_backend=%s ls_high_water=%s poll_workers=%d" % \
+           ( self.post_on_start, self.preserve_mode, self.preserve_time, self.realpath_post, self.base_dir, self.follow_symlinks, self.ls_backend, self.ls_high_water, self.poll_workers ) )
         self.logger.info( "\tmirror=%s flatten=%s realpath_post=%s strip=%s base_dir=%s report_back=%s log_reject=%s" % \
            ( self.mirror, self.flatten, self.realpath_post, self.strip, self.base_dir, self.reportback, self.log_reject ) )
 
         if self.post_broker :
-            self.logger.info( "\tpost_base_dir=%s post_base_url=%s post_topic_prefix=%s post_version=%s sum=%s blocksize=%s " % \
+            self.logger.info( "\tpost_base_dir=%s post_base_url=%s post_topic_prefix=%s post_version=%s sum=%s blocksize=%s checksum_threads=%d walk_threads=%d " % \
                ( self.post_base_dir, self.post_base_url, self.post_topic_prefix, 
-                 self.post_version, self.sumflg, self.blocksize ) )
+                 self.post_version, self.sumflg, self.blocksize, self.checksum_threads, self.walk_threads ) )
 
         self.logger.info('\tPlugins configured:')
 
@@ -661,6 +679,9 @@ class sr_config:
 
         self.retry_mode           = True
         self.retry_ttl            = None
+        self.retry_backend        = 'files'
+        self.retry_backoff        = 30
+        self.retry_backoff_max    = 3600
 
         self.remote_config_url    = None
 
@@ -679,6 +700,9 @@ class sr_config:
 
         self.kbytes_ps            = 0
 
+        self.transport_pool       = 1
+        self.transport_idle       = self.duration_from_str('5m',setting_units='s')
+
         self.add_sumalgo_list     = []
         self.sumalgos             = {}
         self.sumalgo              = None
@@ -716,11 +740,16 @@ class sr_config:
         self.reset                = False
         self.message_ttl          = None
         self.prefetch             = 25
+        self.batch_consume        = False
+        self.topic_prefilter      = False
+        self.download_workers     = 0
+        self.worker_pool          = None
         self.max_queue_size       = 25000
         self.set_passwords        = True
 
         self.accept_unmatch       = None     # default changes depending on program
         self.masks                = []       # All the masks (accept and reject)
+        self.matcher              = None     # masks compiled (sr_matcher), built on first use
         self.currentPattern       = None     # defaults to all
         self.currentDir           = os.getcwd()   # mask directory (if needed)
         self.currentFileOption    = None     # should implement metpx like stuff
@@ -737,6 +766,7 @@ class sr_config:
         self.cache                = None
         self.caching              = False
         self.cache_basis         = 'path'
+        self.cache_backend        = 'dict'
         self.cache_stat           = False
 
         # save/restore
@@ -792,6 +822,7 @@ class sr_config:
         self.flatten              = '/'
         self.follow_symlinks      = False
         self.force_polling        = False
+        self.watch_backend        = 'observer'
 
         self.gateway_for          = []
         self.mirror               = False
@@ -803,6 +834,7 @@ class sr_config:
         self.post_exchange        = None
         self.post_exchange_suffix = None
         self.post_exchange_split  = 0
+        self.post_confirm_window  = 0
         self.post_on_start        = True
         self.preserve_mode        = True
         self.preserve_time        = True
@@ -813,6 +845,8 @@ class sr_config:
         self.realpath_filter      = False
         self.reconnect            = False
         self.reportback           = True
+        self.report_aggregate     = 0
+        self.report_batch         = 0
         self.restore              = False
         self.restore_queue        = None
 
@@ -829,6 +863,9 @@ class sr_config:
         self.users_flag           = False
 
         self.blocksize            = 0
+        self.checksum_threads     = 0
+        self.sum_pool             = None
+        self.walk_threads         = 0
 
         self.destfn_script        = None
 
@@ -841,6 +878,9 @@ class sr_config:
         self.do_poll              = None
         self.do_polls             = {}
         self.ls_file_index        = -1
+        self.ls_backend           = 'files'
+        self.ls_high_water        = False
+        self.poll_workers         = 0
 
         self.do_put               = None
         self.do_puts              = {}
@@ -855,9 +895,11 @@ class sr_config:
         self.inplace              = False
 
         self.inflight             = 'unspecified'
+        self.inflight_close_write = False
 
         self.notify_only          = False
 
+        self.start_fork          = False
         self.windows_run         = 'exe'
 
         # 2 object not to reset in child
@@ -967,8 +1009,7 @@ class sr_config:
 
         self.logger.debug('installing: %s plugin %s' % ( opname, path ) )
         try:
-            with open(script) as f:
-                exec(compile(f.read(), script, 'exec'))
+            exec(self.plugin_code(script))
         except:
             self.logger.error("sr_config/execfile 2 failed for option '%s' and plugin '%s'" % (opname, path))
             self.logger.debug('Exception details: ', exc_info=True)
@@ -993,6 +1034,41 @@ class sr_config:
 
         return True
 
+    # plugin_code : the code of a plugin script, compiled once...  kept in plugin_cache_dir
+    #               (marshal) under the hash of its path and source :  a script changed is
+    #               compiled again, the cache of another python version is elsewhere.
+
+    plugin_codes = {}
+
+    def plugin_code(self, script):
+
+        with open(script,'rb') as f :
+             source = f.read()
+
+        key  = hashlib.sha1( script.encode() + b'\0' + source ).hexdigest()
+        code = sr_config.plugin_codes.get(key)
+        if code is not None : return code
+
+        path = self.plugin_cache_dir + os.sep + key
+        try :
+              with open(path,'rb') as f :
+                   code = marshal.loads(f.read())
+        except: code = None
+
+        if code is None :
+           code = compile(source, script, 'exec')
+           try :
+                 os.makedirs(self.plugin_cache_dir, 0o775, True)
+                 tmp = '%s.%d' % (path, os.getpid())
+                 with open(tmp,'wb') as f :
+                      f.write(marshal.dumps(code))
+                 os.replace(tmp, path)
+           except OSError as err :
+                 self.logger.debug("plugin %s compiled, not cached: %s" % (script, err))
+
+        sr_config.plugin_codes[key] = code
+        return code
+
     def find_file_in_dir(self,d,name,recursive=False):
 
         if not os.path.isdir(d) : return None
@@ -1140,24 +1216,39 @@ class sr_config:
  
     def isMatchingPattern(self, chaine, accept_unmatch = False): 
 
-        for mask in self.masks:
-            self.logger.debug( "isMatchingPattern: mask: %s" % str(mask) )
-            pattern, maskDir, maskFileOption, mask_regexp, accepting, mirror, strip, pstrip, flatten = mask
-            self.currentPattern    = pattern
-            self.currentDir        = maskDir
-            self.currentFileOption = maskFileOption
-            self.currentRegexp     = mask_regexp
-            self.mirror = mirror
-            self.strip = strip
-            self.pstrip = pstrip
-            self.flatten = flatten
-            if mask_regexp.match(chaine) :
-               if not accepting : 
-                  if self.log_reject:
-                      self.logger.info( "reject: mask=%s strip=%s pattern=%s" % (str(mask), strip, chaine) )
-                  return False
-               self.logger.debug( "isMatchingPattern: mask=%s strip=%s" % (str(mask), strip) )
-               return True
+        if not self.masks : 
+           if self.log_reject and not accept_unmatch:
+              self.logger.info( "reject: unmatched pattern=%s" % (chaine) )
+           return accept_unmatch
+
+        # masks are compiled once... rebuilt if they changed (plugins may append to them)
+
+        if self.matcher is None or self.matcher.masks is not self.masks or self.matcher.count != len(self.masks) :
+           self.matcher = sr_matcher(self.masks)
+
+        i = self.matcher.match(chaine)
+
+        # unmatched : the fields are left to the last mask, as when they were all tried
+
+        mask = self.masks[-1] if i is None else self.masks[i]
+
+        pattern, maskDir, maskFileOption, mask_regexp, accepting, mirror, strip, pstrip, flatten = mask
+        self.currentPattern    = pattern
+        self.currentDir        = maskDir
+        self.currentFileOption = maskFileOption
+        self.currentRegexp     = mask_regexp
+        self.mirror = mirror
+        self.strip = strip
+        self.pstrip = pstrip
+        self.flatten = flatten
+
+        if i is not None :
+           if not accepting : 
+              if self.log_reject:
+                  self.logger.info( "reject: mask=%s strip=%s pattern=%s" % (str(mask), strip, chaine) )
+              return False
+           self.logger.debug( "isMatchingPattern: mask=%s strip=%s" % (str(mask), strip) )
+           return True
 
         if self.log_reject and not accept_unmatch:
              self.logger.info( "reject: unmatched pattern=%s" % (chaine) )
@@ -1202,6 +1293,11 @@ class sr_config:
                    self.logger.error("sum file %s add_sumalgo is not inherited from class sr_checksum" % p)
                    continue
 
+                # optional algorithm, its python module is not installed
+                if not self.add_sumalgo.available():
+                   self.logger.debug("sum file %s add_sumalgo not available (python module missing), skipped" % p)
+                   continue
+
                 # get its registering name
                 try   : register_name = self.add_sumalgo.registered_as()
                 except: register_name = None
@@ -1625,6 +1721,14 @@ class sr_config:
                      self.batch = int(words[1])
                      n = 2
 
+                elif words0 in ['batch_consume','bc']: # See: sr_subscribe.1
+                     if (words1 is None) or words[0][0:1] == '-' : 
+                        self.batch_consume = True
+                        n = 1
+                     else :
+                        self.batch_consume = self.isTrue(words[1])
+                        n = 2
+
                 elif words0 in ['base_dir','bd']: # See: sr_config.7  for sr_post.1,sarra,sender,watch
                      if sys.platform == 'win32' and words1.find( '\\' ) :
                          self.logger.warning( "%s %s" % ( words0, words1 ) )
@@ -1690,6 +1794,15 @@ class sr_config:
                      #if self.caching: ####@
                      #   self.cache = sr_cache(self) ####@
 
+                elif words0 == 'cache_backend' : # See: sr_subscribe.1
+                        known_backends = [ 'dict', 'indexed', 'shared' ]
+                        if words1 in known_backends:
+                            self.cache_backend = words1
+                        else:
+                            self.logger.error("unknown cache_backend: %s, should be one of: %s (default: %s)" % \
+                                ( words1, known_backends, self.cache_backend ) )
+                        n = 2
+
                 elif words0 in [ 'suppress_duplicates_basis', 'sdb', 'cache_basis', 'cb' ] : # See: sr_post.1 sr_watch.1
                         known_bases = [ 'data', 'name', 'path' ]
                         if words1 in known_bases:
@@ -1708,6 +1821,10 @@ class sr_config:
                         self.cache_stat = self.isTrue(words[1])
                         n = 2
 
+                elif words0 in ['checksum_threads','cth']: # See: sr_post.1 sr_watch.1
+                     self.checksum_threads = int(words1)
+                     n = 2
+
                 elif words0 in [ 'chmod', 'default_mode', 'dm']:    # See: sr_config.7.rst
                      self.chmod = int(words[1],8)
                      n = 2
@@ -1850,6 +1967,10 @@ class sr_config:
                      ok = self.execfile("do_send",words1)
                      n = 2
 
+                elif words0 in ['download_workers','dw']: # See: sr_subscribe.1
+                     self.download_workers = int(words1)
+                     n = 2
+
                 elif words0 == 'dry_run'   : # See sr_config.7 ++
                      if (words1 is None) or words[0][0:1] == '-' : 
                         self.dry_run = True
@@ -2059,6 +2180,14 @@ class sr_config:
                          self.inflight = words[1] 
                      n = 2
 
+                elif words0 == 'inflight_close_write': # See: sr_watch.1
+                     if (words1 is None) or words[0][0:1] == '-' : 
+                        self.inflight_close_write = True
+                        n = 1
+                     else :
+                        self.inflight_close_write = self.isTrue(words[1])
+                        n = 2
+
                 elif words0 in [ 'log_reject' ]: # See: sr_sarra.8
                      if (words1 is None) or words[0][0:1] == '-' : 
                         self.log_reject = True
@@ -2067,6 +2196,23 @@ class sr_config:
                         self.log_reject = self.isTrue(words[1])
                         n = 2
 
+                elif words0 == 'ls_backend' : # See: sr_poll.1
+                        known_backends = [ 'files', 'indexed' ]
+                        if words1 in known_backends:
+                            self.ls_backend = words1
+                        else:
+                            self.logger.error("unknown ls_backend: %s, should be one of: %s (default: %s)" % \
+                                ( words1, known_backends, self.ls_backend ) )
+                        n = 2
+
+                elif words0 == 'ls_high_water' : # See: sr_poll.1
+                     if (words1 is None) or words[0][0:1] == '-' : 
+                        self.ls_high_water = True
+                        n = 1
+                     else :
+                        self.ls_high_water = self.isTrue(words[1])
+                        n = 2
+
                 elif words0 == 'ls_file_index': # FIX ME to document... position of file in ls
                                                 #        use when space in filename is expected
                      self.ls_file_index = int(words[1])
@@ -2104,6 +2250,15 @@ class sr_config:
                         self.report_daemons = self.isTrue(words[1])
                         n = 2
 
+                elif words0 == 'report_aggregate' : # See: sr_subscribe.1
+                     self.report_aggregate = self.duration_from_str(words1,'s')
+                     if self.report_aggregate < 0 : self.report_aggregate = 0
+                     n = 2
+
+                elif words0 == 'report_batch' : # See: sr_subscribe.1
+                     self.report_batch = int(words1)
+                     n = 2
+
                 elif words0 in ['report_exchange', 'lx', 'le'] : # See: sr_config.7 ++ everywhere fixme?
                      self.report_exchange = words1
                      n = 2
@@ -2386,10 +2541,18 @@ class sr_config:
                          self.post_version = 'v02'
                      n = 2
 
+                elif words0 in ['post_confirm_window','pcw']: # See: sr_config.7
+                     self.post_confirm_window = int(words1)
+                     n = 2
+
                 elif words0 in ['post_exchange_split','pes', 'pxs']: # sr_config.7, sr_shovel.1
                      self.post_exchange_split = int(words1)
                      n = 2
 
+                elif words0 in ['poll_workers','pw']: # See: sr_poll.1
+                     self.poll_workers = int(words1)
+                     n = 2
+
                 elif words0 in ['poll_without_vip','pwv'] : # See: sr_config.7
                      if (words1 is None) or words[0][0:1] == '-' : 
                         self.poll_without_vip = True
@@ -2491,6 +2654,19 @@ class sr_config:
                         self.retry_mode = self.isTrue(words[1])
                         n = 2
 
+                elif words0 == 'retry_backend' : # See: sr_subscribe.1
+                        known_backends = [ 'files', 'indexed' ]
+                        if words1 in known_backends:
+                            self.retry_backend = words1
+                        else:
+                            self.logger.error("unknown retry_backend: %s, should be one of: %s (default: %s)" % \
+                                ( words1, known_backends, self.retry_backend ) )
+                        n = 2
+
+                elif words0 in [ 'retry_backoff', 'retry_backoff_max' ] : # See: sr_subscribe.1
+                        setattr(self, words0, self.duration_from_str(words1,'s'))
+                        n = 2
+
                 elif words0 in ['retry_ttl']:  # FIXME to be documented
                      if words1.lower() == 'none' :
                            self.retry_ttl = None
@@ -2564,6 +2740,14 @@ class sr_config:
                         self.source_from_exchange = self.isTrue(words[1])
                         n = 2
 
+                elif words0 == 'start_fork': # See: sr_subscribe.1
+                     if (words1 is None) or words[0][0:1] == '-' : 
+                        self.start_fork = True
+                        n = 1
+                     else :
+                        self.start_fork = self.isTrue(words[1])
+                        n = 2
+
                 elif words0 == 'statehost':  # MG FIXME to be documented somewhere ???
                      self.statehost = True
                      self.hostform = 'short'
@@ -2656,6 +2840,17 @@ class sr_config:
                          
                      n = 2
 
+                elif words0 in ['topic_prefilter','tpf']: # See: sr_subscribe.1
+                     if (words1 is None) or words[0][0:1] == '-' : 
+                        self.topic_prefilter = True
+                        n = 1
+                     else :
+                        self.topic_prefilter = self.isTrue(words[1])
+                        n = 2
+                     if self.topic_prefilter and not hasattr(self,'heartbeat_topic_prefilter_installed') :
+                        self.execfile("on_heartbeat",'hb_topic_prefilter')
+                        self.heartbeat_topic_prefilter_installed = True
+
                 elif words0 in ['topic_prefix','tp'] : # See: sr_config.7 
                      self.topic_prefix = words1
                      if 'v03.' in words1:
@@ -2663,6 +2858,17 @@ class sr_config:
                      else:
                          self.version = 'v02'
 
+                elif words0 in ['transport_idle','tpi']: # See: sr_subscribe.1
+                     self.transport_idle = self.duration_from_str(words1,'s')
+                     n = 2
+
+                elif words0 in ['transport_pool','tpp']: # See: sr_subscribe.1
+                     self.transport_pool = int(words1)
+                     if self.transport_pool > 1 and not hasattr(self,'heartbeat_transport_installed') :
+                        self.execfile("on_heartbeat",'hb_transport')
+                        self.heartbeat_transport_installed = True
+                     n = 2
+
                 elif words0 in ['post_base_url','pbu','url','u','post_url']: # See: sr_config.7 
                      if words0 in ['url','u'] : self.logger.warning("option url deprecated please use post_base_url")
                      if words1.lower() == 'none' : self.post_base_url = None
@@ -2703,6 +2909,19 @@ class sr_config:
                      self.vip = words[1]
                      n = 2
 
+                elif words0 in ['walk_threads','wth']: # See: sr_post.1 sr_watch.1
+                     self.walk_threads = int(words1)
+                     n = 2
+
+                elif words0 == 'watch_backend' : # See: sr_watch.1
+                        known_backends = [ 'observer', 'inotify' ]
+                        if words1 in known_backends:
+                            self.watch_backend = words1
+                        else:
+                            self.logger.error("unknown watch_backend: %s, should be one of: %s (default: %s)" % \
+                                ( words1, known_backends, self.watch_backend ) )
+                        n = 2
+
                 elif words0 in [ 'windows_run', 'wr'  ] : # See: sr_post.1 sr_watch.1
                         known_runs = [ 'exe', 'pyw', 'py' ]
                         if words1 in known_runs:
@@ -29,17 +29,19 @@
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
 #
 
-import os,json,sys,random,time
+import collections,os,json,sys,random,time
 
 try :    
          from sr_amqp           import *
          from sr_config         import *
+         from sr_matcher        import *
          from sr_message        import *
          from sr_retry          import *
          from sr_util           import *
 except : 
          from sarra.sr_amqp     import *
          from sarra.sr_config   import *
+         from sarra.sr_matcher  import *
          from sarra.sr_message  import *
          from sarra.sr_retry    import *
          from sarra.sr_util     import *
@@ -55,7 +57,7 @@ class sr_consumer:
         self.broker         = parent.broker
 
         self.hc              = None
-        self.retry           = sr_retry(parent)
+        self.retry           = new_retry(parent)
         self.raw_msg         = None
         self.last_msg_failed = False
 
@@ -68,6 +70,23 @@ class sr_consumer:
         self.exchange_split = parent.exchange_split
         self.save = False
 
+        # topic_prefilter : messages that accept/reject would reject by their topic are not decoded
+
+        self.topic_filter   = None
+        if parent.topic_prefilter and self.use_pattern :
+           self.topic_filter = sr_topic_filter(parent)
+           self.topic_filter.report()
+
+        # batch_consume : broker pushes up to prefetch messages, acked all at once when processed
+
+        self.batch_consume  = parent.batch_consume
+        self.batch          = collections.deque()
+        self.batch_last     = None
+
+        # download_workers : acks are left to the worker pool, which issues them in order
+
+        self.ack_deferred   = False
+
         self.iotime = 30
         if self.parent.timeout : self.iotime = int(self.parent.timeout)
 
@@ -76,12 +95,53 @@ class sr_consumer:
         self.sleep_max = 10
         self.sleep_min = 0.01
         self.sleep_now = self.sleep_min
+        self.sleeper   = time.sleep
 
         self.build_connection(loop=loop)
         self.build_consumer()
         self.build_queue()
         self.get_message()
 
+    def ack(self,raw_msg):
+
+        # post_confirm_window : the ack waits until the broker confirmed what was posted
+        # before it, so a message is never acked while its posts could still be lost.
+
+        publisher = self.__publisher__()
+        if publisher is None :
+           self.__ack__(raw_msg)
+           return
+
+        builds = self.consumer.builds
+        publisher.after_confirms( lambda : self.__ack__(raw_msg,builds) )
+
+        # no more than a window of acks held
+        if len(publisher.acks) >= publisher.confirm_window : publisher.flush()
+
+    def __ack__(self,raw_msg,builds=None):
+
+        # delivery tags are only valid on the channel they came from : the broker redelivers
+
+        if builds is not None and builds != self.consumer.builds : return
+
+        # in batch_consume, acking a message acks all the ones before it on the channel
+
+        if self.batch_consume : self.consumer.ack_batch(raw_msg)
+        else                  : self.consumer.ack(raw_msg)
+
+    def __publisher__(self):
+        publisher = getattr(self.parent,'publisher',None)
+        if publisher is None or not publisher.is_windowed() : return None
+        return publisher
+
+    def __settle_acks__(self):
+
+        # the acks held for posts not confirmed yet : the broker may not send more
+        # messages (prefetch) until they are acked, or the queue is idle
+
+        publisher = self.__publisher__()
+        if publisher is not None and publisher.acks : publisher.flush()
+
     def build_connection(self,loop=True):
         self.logger.debug("sr_consumer build_broker")
 
@@ -135,17 +195,23 @@ class sr_consumer:
 
     def consume(self):
 
-        # acknowledge last message... we are done with it since asking for a new one
-        if self.raw_msg is not None and not self.raw_msg.isRetry:
-            self.consumer.ack(self.raw_msg)
+        if self.batch_consume :
+           self.get_message()
+           self.raw_msg = self.consume_from_batch()
 
-        # consume a new one
-        self.get_message()
-        self.raw_msg = self.consumer.consume(self.queue_name)
+        else :
+           # acknowledge last message... we are done with it since asking for a new one
+           if self.raw_msg is not None and not self.raw_msg.isRetry and not self.ack_deferred:
+               self.ack(self.raw_msg)
+
+           # consume a new one
+           self.get_message()
+           self.raw_msg = self.consumer.consume(self.queue_name)
 
         # if no message from queue, perhaps we have message to retry
 
         if self.raw_msg is None:
+            self.__settle_acks__()
             self.raw_msg = self.retry.get()
 
         # when no message sleep for 1 sec. (value taken from old metpx)
@@ -156,13 +222,15 @@ class sr_consumer:
         should_sleep = False
 
         if self.raw_msg is None:
-            should_sleep = True
-        elif self.raw_msg.isRetry and self.last_msg_failed:
+            # in batch_consume, consume_batch already waited for the broker to push something
+            should_sleep = not self.batch_consume
+        elif self.raw_msg.isRetry and self.last_msg_failed and not self.retry.scheduled:
+            # retries scheduled (next attempt, per destination) are only returned when due
             should_sleep = True
 
         if should_sleep:
             try:
-               time.sleep(self.sleep_now)
+               self.sleeper(self.sleep_now)
             except:
                self.logger.info("woke from sleep by alarm.. %s " % self.msg.notice)
 
@@ -173,11 +241,23 @@ class sr_consumer:
         if self.raw_msg is None:
             return False, self.msg
 
+        # rejected on its topic : acked as any rejected message, without decoding it
+        # dont bother with retry... were good to be kept
+
+        if self.topic_filter and not self.raw_msg.isRetry and \
+           self.topic_filter.rejects(self.raw_msg.delivery_info['routing_key']) :
+           if not should_sleep : self.sleep_now = self.sleep_min 
+           self.parent.message_count += 1
+           self.logger.debug("Rejected by accept/reject options on topic %s", self.raw_msg.delivery_info['routing_key'])
+           return False,self.msg
+
         # make use it as a sr_message
         # dont bother with retry... 
+        # only what accept/reject needs for now : the rest once it is accepted
         try:
-            self.msg.from_amqplib(self.raw_msg)
+            self.msg.decode_routing(self.raw_msg)
             self.logger.debug("notice %s " % self.msg.notice)
+            if self.topic_filter : self.topic_filter.check(self.msg.baseurl)
             if self.msg.urlstr:
                 self.logger.debug("urlstr %s " % self.msg.urlstr)
         except:
@@ -198,7 +278,7 @@ class sr_consumer:
         if self.use_pattern :
 
            # Adjust url to account for sundew extension if present, and files do not already include the names.
-           if urllib.parse.urlparse(self.msg.urlstr).path.count(":") < 1 and 'sundew_extension' in self.msg.headers.keys() :
+           if 'sundew_extension' in self.msg.headers.keys() and urllib.parse.urlparse(self.msg.urlstr).path.count(":") < 1 :
               urlstr=self.msg.urlstr + ':' + self.msg.headers[ 'sundew_extension' ]
            else:
               urlstr=self.msg.urlstr
@@ -212,10 +292,35 @@ class sr_consumer:
         elif not self.accept_unmatch :
               return False,self.msg
 
+        try:
+            self.msg.decode_headers()
+        except:
+            self.logger.error("sr_consumer/consume malformed message %s" % vars(self.raw_msg))
+            self.logger.debug('Exception details: ', exc_info=True)
+            return None, None
+
         # note that it is a retry or not in sr_message
 
         return True,self.msg
 
+    def consume_from_batch(self):
+
+        # current batch is done : one ack (multiple=True) for all its messages, then get the next one
+
+        if not self.batch :
+           if self.batch_last is not None :
+              if not self.ack_deferred : self.ack(self.batch_last)
+              self.batch_last = None
+           self.__settle_acks__()
+
+           self.batch.extend(self.consumer.consume_batch(self.queue_name))
+           if not self.batch : return None
+
+           self.logger.debug("sr_consumer batch of %d messages" % len(self.batch))
+           self.batch_last = self.batch[-1]
+
+        return self.batch.popleft()
+
     def get_message(self):
         if not hasattr(self.parent, 'msg'):
            self.parent.msg = sr_message(self.parent)
@@ -268,7 +373,12 @@ class sr_consumer:
     def msg_worked(self):
         self.last_msg_failed = False
 
-        if self.raw_msg == None or not self.raw_msg.isRetry : return
+        if self.raw_msg == None : return
+
+        # a destination that works again
+        if not self.raw_msg.isRetry :
+           self.retry.host_worked(self.raw_msg)
+           return
 
         self.retry.add_msg_to_state_file(self.raw_msg,done=True)
 
@@ -277,7 +387,10 @@ class sr_consumer:
     def publish_back(self):
         self.logger.debug("sr_consumer publish_back")
 
+        # report_batch : reports committed (confirmed) by batches
+
         self.publisher = Publisher(self.hc)
+        self.publisher.set_confirm_window(self.parent.report_batch)
         self.publisher.build()
 
         return self.publisher
@@ -186,13 +186,15 @@ def file_insert_part(parent,msg,part_file):
              if bufsize > msg.length : bufsize = msg.length
              if chk : chk.set_path(os.path.basename(msg.target_file))
 
-             i  = 0
-             while i < msg.length:
-                   buf = fp.read(bufsize)
-                   if not buf: break
-                   ft.write(buf)
-                   if chk : chk.update(buf)
-                   i  += len(buf)
+             i  = zero_copy(fp, ft, msg.length, chk, bufsize)
+             if i == None :
+                i  = 0
+                while i < msg.length:
+                      buf = fp.read(bufsize)
+                      if not buf: break
+                      ft.write(buf)
+                      if chk : chk.update(buf)
+                      i  += len(buf)
 
              if ft.tell() >= msg.filesize:
                  ft.truncate()
@@ -455,7 +457,7 @@ def compute_sumstr(parent, path, fsiz, i = 0):
 
   else:
 
-     if not sumflg[0] in ['0','d','n','s','z' ]: sumflg = 'd'
+     if not sumflg[0] in ['0','b','d','n','s','x','z' ]: sumflg = 'd'
 
      parent.set_sumalgo(sumflg)
      sumalgo = parent.sumalgo
@@ -463,7 +465,7 @@ def compute_sumstr(parent, path, fsiz, i = 0):
 
      # compute checksum
 
-     if sumflg in ['d','s'] :
+     if sumflg in ['b','d','s','x'] :
 
         fp = open(path,'rb')
         fp.seek(i)
@@ -503,22 +505,28 @@ def file_write_length(req,msg,bufsize,filesize,parent):
     fp = open(msg.new_file,'r+b')
     if msg.local_offset != 0 : fp.seek(msg.local_offset,0)
 
-    nc = int(msg.length/bufsize)
-    r  =     msg.length%bufsize
+    # local to local : kernel copy when possible
 
-    # read/write bufsize "nc" times
-    i  = 0
-    while i < nc :
-          chunk = req.read(bufsize)
+    copied = None
+    if msg.length > 0 : copied = zero_copy(req, fp, msg.length, chk, bufsize)
+
+    if copied == None :
+       nc = int(msg.length/bufsize)
+       r  =     msg.length%bufsize
+
+       # read/write bufsize "nc" times
+       i  = 0
+       while i < nc :
+             chunk = req.read(bufsize)
+             fp.write(chunk)
+             if chk : chk.update(chunk)
+             i = i + 1
+
+       # remaining
+       if r > 0 :
+          chunk = req.read(r)
           fp.write(chunk)
           if chk : chk.update(chunk)
-          i = i + 1
-
-    # remaining
-    if r > 0 :
-       chunk = req.read(r)
-       fp.write(chunk)
-       if chk : chk.update(chunk)
 
     if fp.tell() >= msg.filesize:
        fp.truncate()
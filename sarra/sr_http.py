@@ -32,7 +32,7 @@
 #
 #
 
-import os, urllib.request, urllib.error, ssl, sys
+import base64, http.client, os, socket, ssl, sys, urllib.parse, urllib.request, urllib.error
 
 try :
          from sr_util            import *
@@ -53,6 +53,10 @@ except :
 # getcwd()
 #
 # credentials()
+#
+# requests go through one persistent (keep-alive) http.client connection
+# per server, reopened (resuming the TLS session for https) when the server
+# closes it.
 
 class sr_http(sr_proto):
 
@@ -60,6 +64,8 @@ class sr_http(sr_proto):
         parent.logger.debug("sr_http __init__")
         sr_proto.__init__(self,parent)
         self.tlsctx = parent.tlsctx
+        # poll_workers : the sessions of the pool share this lock (sr_pollpool)
+        self.plugin_lock = None
         self.init()
 
     # cd
@@ -68,7 +74,7 @@ class sr_http(sr_proto):
         self.cwd  = os.path.dirname(path)
         self.path = path
 
-    # for compatibility... always new connection with http
+    # the connection stays open (or reopens itself) as long as the destination is the same
     def check_is_connected(self):
         self.logger.debug("sr_http check_is_connected")
 
@@ -81,6 +87,11 @@ class sr_http(sr_proto):
     # close
     def close(self):
         self.logger.debug("sr_http close")
+
+        if self.conn :
+           try    : self.conn.close()
+           except : pass
+
         self.init()
 
     # connect...
@@ -128,13 +139,20 @@ class sr_http(sr_proto):
 
         url = self.destination + '/' + self.path + '/' + remote_file
 
-        ok  = self.__open__(url, remote_offset, length )
+        # inplace parts (the first one included) are asked for as a byte range
+
+        ranged = remote_offset != 0
+        if length > 0 and hasattr(self.parent,'msg') and self.parent.msg and self.parent.msg.partflg == 'i' :
+           ranged = True
+
+        ok  = self.__open__(url, remote_offset, length, ranged )
 
         if not ok : return False
 
         # read from self.http write to local_file
 
-        rw_length = self.read_writelocal(remote_file, self.http, local_file, local_offset, length)
+        try    : rw_length = self.read_writelocal(remote_file, self.http, local_file, local_offset, length)
+        finally: self.__done__()
 
         return True
 
@@ -147,6 +165,10 @@ class sr_http(sr_proto):
         self.details     = None
         self.seek        = True
 
+        self.conn        = None
+        self.conn_key    = None
+        self.conn_proxy  = False
+
         self.urlstr      = ''
         self.path        = ''
         self.cwd         = ''
@@ -180,30 +202,82 @@ class sr_http(sr_proto):
                         if dbuf : dbuf += chunk
                         else    : dbuf  = chunk
 
+                 self.__done__()
+
                  self.data = dbuf.decode('utf-8')
 
                  # invoke parent defined on_html_page ... if any
 
-                 for plugin in self.parent.on_html_page_list:
-                     if not plugin(self):
-                        self.logger.warning("something wrong")
-                        return self.entries
+                 if self.plugin_lock : self.plugin_lock.acquire()
+                 try :
+                       for plugin in self.parent.on_html_page_list:
+                           if not plugin(self):
+                              self.logger.warning("something wrong")
+                              return self.entries
+                 finally :
+                       if self.plugin_lock : self.plugin_lock.release()
 
         except:
                 self.logger.warning("sr_http/ls: unable to open %s" % self.urlstr)
                 self.logger.debug('Exception details: ', exc_info=True)
+                self.__done__()
 
         return self.entries
 
+    # connection to the server (or to its proxy) of url
+
+    def __connection__(self, url):
+
+        host, port = url.hostname, url.port
+
+        kwargs = {}
+        if self.timeout != None : kwargs['timeout'] = self.timeout
+
+        # proxies from the environment (http_proxy, https_proxy, no_proxy) as urllib does
+
+        proxy = urllib.request.getproxies().get(url.scheme)
+        if proxy and urllib.request.proxy_bypass(host) : proxy = None
+
+        self.conn_proxy = False
+
+        if proxy :
+           purl = urllib.parse.urlparse(proxy)
+           self.logger.debug("sr_http using proxy %s for %s" % (purl.netloc,url.netloc))
+           if url.scheme == 'https' :
+              conn = sr_https_connection(purl.hostname, purl.port, context=self.tlsctx, **kwargs)
+              conn.set_tunnel(host, port)
+           else :
+              conn = http.client.HTTPConnection(purl.hostname, purl.port, **kwargs)
+              self.conn_proxy = True
+           return conn
+
+        if url.scheme == 'https' :
+           return sr_https_connection(host, port, context=self.tlsctx, **kwargs)
+
+        return http.client.HTTPConnection(host, port, **kwargs)
+
+    # response fully read : the connection can be reused, otherwise it is closed
+
+    def __done__(self):
+
+        if self.http and not self.http.isclosed() :
+           self.http.close()
+           if self.conn : self.conn.close()
+
+        self.http = None
+
     # open
-    def __open__(self, path, remote_offset=0, length=0):
+    def __open__(self, path, remote_offset=0, length=0, ranged=None):
         self.logger.debug( "sr_http open")
 
+        self.__done__()
+
         self.http      = None
         self.connected = False
-        self.req       = None
         self.urlstr    = path
 
+        if ranged == None : ranged = remote_offset != 0
+
         # have noticed that some site does not allow // in path
         if path.startswith('http://')  and '//' in path[7:] :
            self.urlstr = 'http://' + path[7:].replace('//','/')
@@ -214,6 +288,8 @@ class sr_http(sr_proto):
         alarm_set(self.iotime)
 
         try:
+                headers = {}
+
                 # when credentials are needed.
                 if self.user != None :                          
 
@@ -224,45 +300,41 @@ class sr_http(sr_proto):
                       cred        = self.user + ':' + self.password +'@'
                       self.urlstr = self.urlstr.replace(cred,'')
 
-                   # continue with authentication
-                   password_mgr = urllib.request.HTTPPasswordMgrWithDefaultRealm()
-                   password_mgr.add_password(None, self.urlstr,self.user,self.password)
-                   auth_handler = urllib.request.HTTPBasicAuthHandler(password_mgr)
-            
-                   #hctx = ssl.create_default_context()
-                   #hctx.check_hostname = False
-                   #hctx.verify_mode = ssl.CERT_NONE
-                   ssl_handler = urllib.request.HTTPSHandler(0,self.tlsctx)
-
-                   # create "opener" (OpenerDirector instance)
-                   opener = urllib.request.build_opener(auth_handler,ssl_handler)
-
-                   # use the opener to fetch a URL
-                   opener.open(self.urlstr)
-
-                   # Install the opener.
-                   urllib.request.install_opener(opener)
-
-                # Now all calls to get the request use our opener.
-                self.req = urllib.request.Request(self.urlstr)
+                   # basic authentication
+                   cred = self.user + ':'
+                   if self.password != None : cred += self.password
+                   headers['Authorization'] = 'Basic ' + base64.b64encode(cred.encode('utf-8')).decode('ascii')
 
                 # set range in byte if needed
-                if remote_offset != 0 :
+                if ranged :
                    str_range = 'bytes=%d-%d'%(remote_offset,remote_offset + length-1)
-                   self.req.headers['Range'] = str_range
-
-                # https without user : create/use an ssl context
-                ctx = None
-                if self.user == None and self.urlstr.startswith('https'):
-                   ctx = self.tlsctx
-                   #ctx.check_hostname = False
-                   #ctx.verify_mode = ssl.CERT_NONE
-
-                # open... we are connected
-                if self.timeout == None :
-                   self.http = urllib.request.urlopen(self.req, context=ctx)
-                else :
-                   self.http = urllib.request.urlopen(self.req, timeout=self.timeout, context=ctx)
+                   headers['Range'] = str_range
+
+                # follow redirections : credentials are only sent to the original server
+
+                urlstr = self.urlstr
+                origin = self.__origin__(urlstr)
+                for i in range(5) :
+                    self.http = self.__request__(urlstr, headers)
+                    if not self.http.status in [ 301, 302, 303, 307, 308 ] : break
+                    location = self.http.getheader('Location')
+                    if not location : break
+                    self.http.read()
+                    self.__done__()
+                    urlstr = urllib.parse.urljoin(urlstr, location)
+                    self.logger.debug("sr_http redirected to %s" % urlstr)
+                    if 'Authorization' in headers and self.__origin__(urlstr) != origin :
+                       headers = dict(headers)
+                       del headers['Authorization']
+
+                if self.http.status >= 300 :
+                   response  = self.http
+                   self.__done__()
+                   raise urllib.error.HTTPError(urlstr, response.status, response.reason, response.headers, None)
+
+                # a range was asked for : be sure of what is received
+
+                if ranged : self.__check_range__(remote_offset)
 
                 self.connected = True
 
@@ -275,20 +347,114 @@ class sr_http(sr_proto):
                self.logger.error('Server couldn\'t fulfill the request. Error code: %s, %s' % (e.code, e.reason))
                alarm_cancel()
                raise
-        except urllib.error.URLError as e:
+        except (http.client.HTTPException, OSError) as e:
                self.logger.error('Download failed 5 %s ' % self.urlstr)
-               self.logger.error('Failed to reach server. Reason: %s' % e.reason)
+               self.logger.error('Failed to reach server. Reason: %s' % e)
+               self.__done__()
                alarm_cancel()
                raise
         except:
                self.logger.warning("sr_http/__open__: unable to open %s" % self.urlstr)
                self.logger.debug('Exception details: ', exc_info=True)
+               self.__done__()
                alarm_cancel()
                raise
 
         alarm_cancel()
         return False
 
+    # a range was asked for : 206 must start at remote_offset, 200 is the whole file
+
+    def __check_range__(self, remote_offset):
+
+        if self.http.status == 206 :
+           crange = self.http.getheader('Content-Range')
+           try    : start = int(crange.split()[1].split('-')[0])
+           except : start = None
+           if start != remote_offset :
+              self.__done__()
+              raise http.client.HTTPException("unexpected Content-Range %s for offset %d" % (crange,remote_offset))
+           return
+
+        # range ignored by the server : skip what comes before remote_offset
+
+        self.logger.debug("sr_http range ignored by server, skipping %d bytes" % remote_offset)
+
+        skip = remote_offset
+        while skip > 0 :
+              chunk = self.http.read(min(skip,self.bufsize))
+              if not chunk :
+                 self.__done__()
+                 raise http.client.HTTPException("file shorter than offset %d" % remote_offset)
+              skip -= len(chunk)
+
+    # scheme, host and port of an url (credentials not sent across them)
+
+    def __origin__(self, urlstr):
+        url  = urllib.parse.urlparse(urlstr)
+        port = url.port
+        if port == None : port = { 'http':80, 'https':443 }.get(url.scheme)
+        return ( url.scheme, url.hostname, port )
+
+    # one request on the persistent connection
+
+    def __request__(self, urlstr, headers):
+
+        url = urllib.parse.urlparse(urlstr)
+        key = ( url.scheme, url.netloc.split('@')[-1] )
+
+        if self.conn == None or self.conn_key != key :
+           if self.conn : self.conn.close()
+           self.conn     = self.__connection__(url)
+           self.conn_key = key
+
+        target = url.path or '/'
+        if url.query     : target += '?' + url.query
+        if self.conn_proxy : target = url.scheme + '://' + key[1] + target
+
+        # a kept-alive connection may have been closed by the server meanwhile : retry once
+
+        reused = self.conn.sock != None
+
+        try :
+                self.conn.request('GET', target, headers=headers)
+                return self.conn.getresponse()
+        except (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionError) :
+                if not reused : raise
+                self.logger.debug("sr_http connection closed by server, reconnecting")
+                self.conn.close()
+
+        self.conn.request('GET', target, headers=headers)
+        return self.conn.getresponse()
+
+#============================================================
+#
+# sr_https_connection : resumes the TLS session of the previous connection
+#                       (when the server allows it) instead of a full handshake
+#
+#============================================================
+
+class sr_https_connection(http.client.HTTPSConnection):
+
+    def __init__(self, host, port=None, **kwargs) :
+        http.client.HTTPSConnection.__init__(self, host, port, **kwargs)
+        self.tls_session = None
+
+    def connect(self) :
+        http.client.HTTPConnection.connect(self)
+
+        server_hostname = self.host
+        if self._tunnel_host : server_hostname = self._tunnel_host
+
+        # session resumption needs python >= 3.6 : a full handshake otherwise
+
+        if not hasattr(ssl.SSLSocket,'session') :
+           self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+           return
+
+        self.sock        = self._context.wrap_socket(self.sock, server_hostname=server_hostname, session=self.tls_session)
+        self.tls_session = self.sock.session
+
 #============================================================
 #
 # http_transport inherited from sr_transport
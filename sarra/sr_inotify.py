@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_inotify.py : python3 linux inotify watcher of sr_watch (watch_backend inotify)
+#
+#  The watchdog observer gets every event of the tree (each write to a file
+#  is a modify), hands them one by one to the event handler callbacks, and
+#  they are copied from new_events at each wakeup... events may be lost
+#  meanwhile.  sr_inotify talks to inotify itself (libc, through ctypes) :
+#
+#     - the kernel only reports what sr_watch posts : files written and closed
+#       (close_write, not every modify), created (links, directories), deleted,
+#       moved,
+#     - a thread reads the events in large batches, as soon as there are some,
+#       and keeps the last event of each path (created, written, deleted)
+#       until wakeup takes them all at once (collect),
+#     - moves within the tree are paired (moved_from, moved_to cookie) :
+#       moved in from outside is a create, moved out is a delete,
+#     - new directories are watched, and their files posted (they may have
+#       been written before the watch was added),
+#     - the files written and closed, or moved in, are known complete :  they
+#       are added to closed_paths of the parent (inflight_close_write).
+#
+#  When the kernel queue overflows (IN_Q_OVERFLOW, fs.inotify.max_queued_events),
+#  events were lost :  the directories watched are scanned again and the files
+#  changed since the last events read are posted (the files deleted meanwhile
+#  are not known).
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import collections,ctypes,ctypes.util,errno,os,select,stat,struct,sys,threading,time
+
+# inotify constants (linux/inotify.h)
+
+IN_CLOSE_WRITE  = 0x00000008
+IN_MOVED_FROM   = 0x00000040
+IN_MOVED_TO     = 0x00000080
+IN_CREATE       = 0x00000100
+IN_DELETE       = 0x00000200
+IN_DELETE_SELF  = 0x00000400
+IN_Q_OVERFLOW   = 0x00004000
+IN_IGNORED      = 0x00008000
+IN_ONLYDIR      = 0x01000000
+IN_EXCL_UNLINK  = 0x04000000
+IN_ISDIR        = 0x40000000
+IN_CLOEXEC      = 0o2000000
+
+# what the kernel reports :  no modify, access, open, close_nowrite, attrib
+
+watch_mask = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | \
+             IN_DELETE_SELF | IN_ONLYDIR | IN_EXCL_UNLINK
+
+event_header = struct.Struct('iIII')
+
+libc = None
+if sys.platform.startswith('linux') :
+   try :
+         libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+         libc.inotify_init1
+   except : libc = None
+
+# ===================================
+# sr_inotify
+# ===================================
+
+class sr_inotify:
+
+    bufsize = 256 * 1024
+
+    def __init__(self, parent):
+        parent.logger.debug("sr_inotify __init__")
+
+        self.parent     = parent
+        self.logger     = parent.logger
+
+        # wds[wd] : directory watched,  dirs[directory] : wd
+
+        self.wds        = {}
+        self.dirs       = {}
+
+        # events read, one per path, until collected :  key -> (event, src, dst)
+
+        self.lock       = threading.Lock()
+        self.pending    = collections.OrderedDict()
+        self.overflow   = None
+        self.last_read  = time.time()
+        self.moved      = collections.OrderedDict()
+
+        # paths of the pending events that are a close_write or a moved_to
+
+        self.closed     = set()
+
+        self.count      = 0
+        self.overflows  = 0
+
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0 :
+           err = ctypes.get_errno()
+           raise OSError(err, "inotify_init1: %s" % os.strerror(err))
+
+        self.running = True
+        self.thread  = threading.Thread(target=self.read_loop, name="inotify")
+        self.thread.daemon = True
+
+    @staticmethod
+    def available():
+        return libc is not None
+
+    def start(self):
+        self.thread.start()
+
+    def close(self):
+        self.running = False
+        if self.thread.is_alive() : self.thread.join()
+        try    : os.close(self.fd)
+        except : pass
+        self.fd = -1
+
+    # collect : the events read since the last call, added to new_events of the parent
+    #           (and closed_paths : the files known written and closed)
+
+    def collect(self):
+        with self.lock :
+             events, self.pending = self.pending, collections.OrderedDict()
+             closed, self.closed  = self.closed,  set()
+             since,  self.overflow = self.overflow, None
+
+        if since is not None : self.rescan(since, events)
+
+        closed_paths = self.parent.closed_paths
+        for event, src, dst in events.values() :
+            if src in closed : closed_paths.add(src)
+            else             : closed_paths.discard(src)
+
+        self.parent.new_events.update(events)
+        return len(events)
+
+    # watch : directory d and all its subdirectories
+
+    def watch(self, d):
+        with self.lock :
+             self.__watch_tree__(d, None)
+        self.logger.info("sr_inotify %d directories watched" % len(self.dirs))
+
+    # rescan : IN_Q_OVERFLOW, events lost... the files changed since are posted
+
+    def rescan(self, since, events):
+        self.logger.warning("sr_inotify event queue overflow (fs.inotify.max_queued_events) : rescan of %d directories" % \
+                            len(self.dirs))
+
+        n = 0
+        for d in list(self.dirs) :
+            try :
+                  entries = list(os.scandir(d))
+            except OSError : continue
+
+            for entry in entries :
+                try :
+                      if entry.is_dir(follow_symlinks=False) :
+                         if entry.path in self.dirs : continue
+                         with self.lock : self.__watch_tree__(entry.path, events)
+                         continue
+                      lstat = entry.stat(follow_symlinks=False)
+                except OSError : continue
+
+                if lstat.st_mtime < since and lstat.st_ctime < since : continue
+                self.__queue__(events, 'create', entry.path)
+                n += 1
+
+        self.logger.info("sr_inotify rescan : %d files changed since the overflow" % n)
+
+    # =============
+    # reading thread
+    # =============
+
+    def read_loop(self):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+
+        while self.running :
+              try :
+                    if not poller.poll(1000) : continue
+                    buf = os.read(self.fd, self.bufsize)
+              except InterruptedError : continue
+              except OSError as err :
+                    if not self.running : break
+                    self.logger.error("sr_inotify read failed: %s" % err)
+                    time.sleep(1)
+                    continue
+
+              with self.lock :
+                   try    : self.__events__(buf)
+                   except :
+                            self.logger.error("sr_inotify events dropped")
+                            self.logger.debug('Exception details: ', exc_info=True)
+
+    def __events__(self, buf):
+        moved  = self.moved
+        events = self.pending
+        now    = time.time()
+        offset = 0
+
+        while offset < len(buf) :
+              wd, mask, cookie, length = event_header.unpack_from(buf, offset)
+              offset += event_header.size
+              name    = os.fsdecode(buf[offset:offset+length].rstrip(b'\0'))
+              offset += length
+              self.count += 1
+
+              if mask & IN_Q_OVERFLOW :
+                 self.overflows += 1
+                 if self.overflow is None or self.last_read < self.overflow : self.overflow = self.last_read - 1
+                 continue
+
+              if mask & IN_IGNORED :
+                 d = self.wds.pop(wd, None)
+                 if d is not None and self.dirs.get(d) == wd : del self.dirs[d]
+                 continue
+
+              d = self.wds.get(wd)
+              if d is None or mask & IN_DELETE_SELF : continue
+
+              path  = d + '/' + name
+              isdir = mask & IN_ISDIR
+
+              if mask & IN_CLOSE_WRITE :
+                 self.__queue__(events, 'modify', path, closed=True)
+
+              elif mask & IN_CREATE :
+                 if isdir :
+                    self.__watch_tree__(path, events)
+                    continue
+
+                 # regular files are posted when written (close_write), links now
+
+                 try    : lstat = os.lstat(path)
+                 except OSError : continue
+                 if stat.S_ISREG(lstat.st_mode) and lstat.st_nlink < 2 : continue
+                 self.__queue__(events, 'create', path)
+
+              elif mask & IN_DELETE :
+                 self.__queue__(events, 'delete', path)
+
+              elif mask & IN_MOVED_FROM :
+                 moved[cookie] = ( path, isdir )
+
+              elif mask & IN_MOVED_TO :
+                 src = moved.pop(cookie, None)
+                 if src is None :
+                    # moved in from outside the tree : as created
+                    if isdir : self.__watch_tree__(path, events)
+                    else     : self.__queue__(events, 'create', path, closed=True)
+                    continue
+                 if isdir : self.__rename_tree__(src[0], path)
+                 self.__queue__(events, 'move', src[0], path)
+
+        self.last_read = now
+
+        # moved out of the tree : as deleted... unless the buffer was full,
+        # its moved_to may be in the next one
+
+        if len(buf) > self.bufsize - 4096 : return
+
+        for path, isdir in moved.values() :
+            if isdir : self.__forget_tree__(path)
+            self.__queue__(events, 'delete', path)
+        moved.clear()
+
+    # one event per path (create, modify, delete) :  the last one, in the order of the last ones
+    # closed : the file was written and closed, or moved in (complete)
+
+    def __queue__(self, events, event, src, dst=None, closed=False):
+        key = '%s %s' % (src,dst)
+        events.pop(key, None)
+        events[key] = ( event, src, dst )
+
+        if events is not self.pending : return
+        if closed : self.closed.add(src)
+        else      : self.closed.discard(src)
+
+    # =============
+    # watches (lock held)
+    # =============
+
+    # directory d and its subdirectories watched... when events is given (a new
+    # directory) the files found in them are posted
+
+    def __watch_tree__(self, d, events):
+        stack = [ d ]
+        while stack :
+              d = stack.pop()
+              if d in self.dirs : continue
+
+              wd = libc.inotify_add_watch(self.fd, os.fsencode(d), watch_mask)
+              if wd < 0 :
+                 err = ctypes.get_errno()
+                 if err == errno.ENOSPC :
+                    self.logger.error("sr_inotify could not watch %s: too many watches (fs.inotify.max_user_watches)" % d)
+                 elif err != errno.ENOENT :
+                    self.logger.warning("sr_inotify could not watch %s: %s" % (d, os.strerror(err)))
+                 continue
+
+              old = self.wds.get(wd)
+              if old is not None and self.dirs.get(old) == wd : del self.dirs[old]
+              self.wds[wd]  = d
+              self.dirs[d]  = wd
+
+              try    : entries = list(os.scandir(d))
+              except OSError : continue
+
+              for entry in entries :
+                  try    : isdir = entry.is_dir(follow_symlinks=False)
+                  except OSError : continue
+                  if isdir : stack.append(entry.path)
+                  elif events is not None : self.__queue__(events, 'create', entry.path)
+
+    # directory moved within the tree : its watches (and the ones under it) renamed
+
+    def __rename_tree__(self, src, dst):
+        prefix = src + '/'
+        for d in [ d for d in self.dirs if d == src or d.startswith(prefix) ] :
+            wd = self.dirs.pop(d)
+            n  = dst + d[len(src):]
+            self.dirs[n]  = wd
+            self.wds[wd]  = n
+
+    # directory moved out of the tree : no longer watched
+
+    def __forget_tree__(self, src):
+        prefix = src + '/'
+        for d in [ d for d in self.dirs if d == src or d.startswith(prefix) ] :
+            wd = self.dirs.pop(d)
+            self.wds.pop(wd, None)
+            libc.inotify_rm_watch(self.fd, wd)
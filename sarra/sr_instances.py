@@ -32,7 +32,7 @@
 #
 #
 
-import logging,os,psutil,signal,subprocess,sys
+import logging,os,psutil,random,signal,subprocess,sys,threading
 from sys import platform as _platform
 from pathlib import PureWindowsPath
 
@@ -542,6 +542,48 @@ class sr_instances(sr_config):
         except : pass
         return False
 
+    # fork_instance : (start_fork) the instance is a fork of this process instead of
+    #                 a new one :  the modules are imported, the plugins compiled...
+    #                 it configures itself as started with --no N start config would.
+
+    def fork_instance(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        pid = os.fork()
+        if pid > 0 :
+           self.logger.debug("%s forked (pid=%d)" % (self.instance_str,pid))
+           return
+
+        status = 0
+        try :
+               os.setsid()
+               fd = os.open(os.devnull, os.O_RDONLY)
+               os.dup2(fd,0)
+               os.close(fd)
+
+               random.seed()
+               self.randid = "%04x" % random.randint(0,65536)
+
+               if not self.user_args or not "--no" in self.user_args :
+                  self.user_args = [ "--no", "%d" % self.instance ] + ( self.user_args or [] )
+
+               self.action = 'start'
+               self.configure()
+               self.build_parent()
+               self.start_parent()
+
+        except SystemExit as err :
+               if   err.code is None          : status = 0
+               elif isinstance(err.code,int)  : status = err.code
+               else                           : status = 1
+        except :
+               self.logger.error("%s forked instance failed" % self.instance_str)
+               self.logger.debug('Exception details: ', exc_info=True)
+               status = 1
+        finally:
+               os._exit(status)
+
     def foreground_parent(self):
         self.logger.debug("sr_instances foreground_parent")
         self.nbr_instances = 0
@@ -727,6 +769,10 @@ class sr_instances(sr_config):
            self.build_path_migration(self.instance)
         # ===
 
+        if self.start_fork and hasattr(os,'fork') and threading.active_count() == 1 :
+           self.fork_instance()
+           return
+
         self.logger.debug("cmd = %s" % cmd)
         # FIXME: at around 3.4, https://docs.python.org/3/library/os.html#fd-inheritance
         #   inheritance of file descriptors changed.  I think earlier versions require PIPE
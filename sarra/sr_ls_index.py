@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_ls_index.py : python3 listings of the directories sr_poll polls (ls_backend indexed)
+#
+#  With ls_backend files, every poll of a directory reads its whole previous
+#  listing (ls file, the ls -l lines), compares it to the new one, line by line,
+#  and writes it all again.  sr_ls_index keeps, in one sqlite database, the
+#  name, size and modification time of every file listed :
+#
+#     - at the first poll of a directory, the new listing, sorted, is merged with
+#       the one of the database read in order (primary key dir,name),
+#     - then, the previous listing is kept in memory :  the lines not changed
+#       are skipped as such, only the others are parsed,
+#     - only new or modified files, and the files gone, are written (INSERT, DELETE),
+#     - ls_high_water : files older than the newest of the previous poll
+#       (minus a minute, ls times have minutes) are skipped, not even kept.
+#
+#  A file is modified when its size or its time changes (not its permissions).
+#  The ls files of ls_backend files found are imported, then removed.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import calendar, os, sqlite3, time
+
+# months of ls -l times (C locale)
+
+months = { m : i for i, m in enumerate(['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'], 1) }
+
+# ===================================
+# sr_ls_index
+# ===================================
+
+class sr_ls_index:
+
+    # ls times are to the minute : a file as old as the high water mark may be new
+
+    high_water_slack = 60
+
+    def __init__(self, parent, db_path):
+        self.parent     = parent
+        self.logger     = parent.logger
+        self.db_path    = db_path
+        self.high_water = getattr(parent,'ls_high_water',False)
+        self.db         = None
+        self.listings   = {}
+        self.marks      = {}
+        self.kept       = {}
+        self.times      = {}
+        self.times_year = None
+
+    def close(self):
+        self.listings = {}
+        self.kept     = {}
+        if self.db is None : return
+        self.db.close()
+        self.db = None
+
+    # differ : the new or modified files of listing ls (name -> ls line) of directory lspath
+    #          as sr_poll.differ_ls_file returns them, the listing kept for the next poll
+
+    def differ(self, ls, lspath):
+        db  = self.__open__()
+        key = os.path.basename(lspath)
+
+        # ls times without year are of the last 6 months : parsed again each new year
+
+        year = time.gmtime().tm_year
+        if year != self.times_year :
+           self.times      = {}
+           self.times_year = year
+
+        if key in self.listings :
+           mark = self.marks[key]
+           filelst, desclst, upserts, deletes, newest = self.__compare__(key, ls, mark)
+        else :
+           row = db.execute('SELECT mark FROM dirs WHERE dir=?', (key,)).fetchone()
+           if row is None :
+              self.__import__(key,lspath)
+              mark = None
+           else :
+              mark = row[0]
+           filelst, desclst, upserts, deletes, newest = self.__merge__(key, ls, mark)
+
+        if self.high_water : upserts, deletes = self.__prune__(key, newest, upserts, deletes)
+
+        # only what changed is written
+
+        if upserts or deletes or newest != mark :
+           db.execute('BEGIN')
+           try :
+                 db.executemany('INSERT OR REPLACE INTO ls VALUES (?,?,?,?)', upserts)
+                 db.executemany('DELETE FROM ls WHERE dir=? AND name=?', deletes)
+                 db.execute('INSERT OR REPLACE INTO dirs VALUES (?,?)', (key,newest))
+           except :
+                 db.execute('ROLLBACK')
+                 raise
+           db.execute('COMMIT')
+
+        self.listings[key] = ls
+        self.marks[key]    = newest
+
+        if len(self.times) > 100000 : self.times = {}
+
+        self.logger.debug("sr_ls_index %s : %d listed, %d new or modified, %d gone" % \
+                          (key, len(ls), len(upserts), len(deletes)) )
+
+        return filelst, desclst
+
+    # first poll of a directory : the sorted listing merged with the database
+
+    def __merge__(self, key, ls, mark):
+        floor = None
+        if self.high_water and mark is not None : floor = mark - self.high_water_slack
+
+        old     = self.db.execute('SELECT name, size, mtime FROM ls WHERE dir=? ORDER BY name', (key,))
+        o       = next(old, None)
+
+        filelst = []
+        desclst = {}
+        upserts = []
+        deletes = []
+        newest  = mark
+        kept    = self.kept[key] = {}
+
+        for name in sorted(ls) :
+            while o is not None and o[0] < name :
+                  deletes.append( (key,o[0]) )
+                  o = next(old, None)
+
+            line        = ls[name]
+            size, mtime = self.__entry__(line)
+
+            t = self.__time__(mtime) if self.high_water else None
+            if t is not None and ( newest is None or t > newest ) : newest = t
+
+            same = o is not None and o[0] == name
+            if same :
+               known = o[1] == size and o[2] == mtime
+               o     = next(old, None)
+            else :
+               known = False
+
+            # high water : older than the previous poll, forgotten
+
+            if floor is not None and t is not None and t < floor :
+               if same : deletes.append( (key,name) )
+               continue
+
+            if self.high_water : kept[name] = t
+
+            if known : continue
+
+            filelst.append(name)
+            desclst[name] = line
+            upserts.append( (key,name,size,mtime) )
+
+        while o is not None :
+              deletes.append( (key,o[0]) )
+              o = next(old, None)
+
+        return filelst, desclst, upserts, deletes, newest
+
+    # next polls : compared to the previous listing, kept
+
+    def __compare__(self, key, ls, mark):
+        floor = None
+        if self.high_water and mark is not None : floor = mark - self.high_water_slack
+
+        previous = self.listings[key]
+
+        filelst = []
+        desclst = {}
+        upserts = []
+        newest  = mark
+
+        for name, line in ls.items() :
+            before = previous.get(name)
+            if line == before : continue
+
+            size, mtime = self.__entry__(line)
+
+            # permissions or links changed only
+
+            if before is not None and self.__entry__(before) == (size, mtime) : continue
+
+            if self.high_water :
+               t = self.__time__(mtime)
+               if t is not None :
+                  if newest is None or t > newest : newest = t
+                  if floor is not None and t < floor : continue
+               self.kept[key][name] = t
+
+            filelst.append(name)
+            desclst[name] = line
+            upserts.append( (key,name,size,mtime) )
+
+        deletes = []
+        if len(ls) - len(filelst) != len(previous) or any( name in previous for name in filelst ) :
+           deletes = [ (key,name) for name in previous if name not in ls ]
+
+        filelst.sort()
+
+        return filelst, desclst, upserts, deletes, newest
+
+    # high water : the files kept older than the newest, forgotten
+
+    def __prune__(self, key, newest, upserts, deletes):
+        kept = self.kept[key]
+        for row in deletes : kept.pop(row[1], None)
+
+        if newest is None : return upserts, deletes
+
+        floor = newest - self.high_water_slack
+        old   = set( name for name, t in kept.items() if t is not None and t < floor )
+        if not old : return upserts, deletes
+
+        for name in old : del kept[name]
+
+        written = set( row[1] for row in upserts )
+        upserts = [ row for row in upserts if row[1] not in old ]
+        deletes = deletes + [ (key,name) for name in old if name not in written ]
+
+        return upserts, deletes
+
+    # (size, time) of an ls -l line... the whole line as time when it is something else
+
+    def __entry__(self, line):
+        parts = line.split(None,8)
+        try    : return int(parts[4]), '%s %s %s' % (parts[5],parts[6],parts[7])
+        except : return -1, line
+
+    # epoch of an ls time, Oct 18 12:34 (past 6 months) or Oct 18 2019 : None if it is not one
+
+    def __time__(self, mtime):
+        if mtime in self.times : return self.times[mtime]
+
+        t = None
+        try :
+              month, day, hour = mtime.split()
+              month = months[month]
+              day   = int(day)
+              if ':' in hour :
+                 h, m = hour.split(':')
+                 t    = calendar.timegm( (self.times_year, month, day, int(h), int(m), 0) )
+                 # no year : in the future, it is last year's
+                 if t > time.time() + 86400 :
+                    t = calendar.timegm( (self.times_year - 1, month, day, int(h), int(m), 0) )
+              else :
+                 t = calendar.timegm( (int(hour), month, day, 0, 0, 0) )
+        except : t = None
+
+        self.times[mtime] = t
+        return t
+
+    # ls file of ls_backend files : the listing of the directory until now
+
+    def __import__(self, key, lspath):
+        if not os.path.isfile(lspath) : return
+
+        ls   = self.parent.load_ls_file(lspath)
+        rows = [ (key,name) + self.__entry__(ls[name]) for name in ls ]
+
+        self.db.execute('BEGIN')
+        self.db.executemany('INSERT OR REPLACE INTO ls VALUES (?,?,?,?)', rows)
+        self.db.execute('COMMIT')
+
+        try    : os.unlink(lspath)
+        except : pass
+
+        self.logger.info("sr_ls_index imported %d files of %s" % (len(rows), lspath))
+
+    def __open__(self):
+        if self.db is not None : return self.db
+
+        # isolation_level None : autocommit, transactions explicit
+        self.db = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        # synchronous OFF : as the ls files, written to the system, never fsync'ed
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=OFF')
+        self.db.execute('CREATE TABLE IF NOT EXISTS ls ( dir TEXT, name TEXT, size INTEGER, mtime TEXT, '
+                        'PRIMARY KEY (dir, name) ) WITHOUT ROWID')
+        self.db.execute('CREATE TABLE IF NOT EXISTS dirs ( dir TEXT PRIMARY KEY, mark REAL )')
+
+        return self.db
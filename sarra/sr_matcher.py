@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_matcher.py : python3 accept/reject masks compiled once
+#
+#  The masks (accept/reject/get options) are tried in order, the first one
+#  that matches wins.  With hundreds of them, trying each regexp in turn for
+#  every message is costly.  Most masks contain a literal that any string
+#  they match contains :  .*/obs/CYUL/.*  or  .*/model_gem/[0-9]{2}/.*
+#  so sr_matcher indexes each mask by 3 characters of its literal (the ones
+#  the fewest masks share) :  only the masks whose 3 characters are found in
+#  the string, and the masks without literal, are tried... in their order.
+#
+#  Masks that are a literal only (.*text.* .*text .*text$ text.* text) are
+#  tested with in, startswith, endswith instead of their regexp.
+#
+#  The result of the last strings matched is kept (lru_max of them) :
+#  sr_poll lists the same files at every poll.
+#
+#  rejects_prefix tells when all the strings of a prefix are rejected (the
+#  files of a directory) : a walk does not need to go in that directory.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import collections,re,urllib.parse
+
+try    : import re._parser as sre_parse
+except : import sre_parse
+
+# regexp characters : a mask without them (but .* around, $ at the end) is a literal
+
+regexp_chars = set('.^$*+?{}[]\\|()')
+
+# ===================================
+# sr_matcher
+# ===================================
+
+class sr_matcher:
+
+    lru_max = 4096
+
+    def __init__(self, masks):
+        self.masks  = masks
+        self.count  = len(masks)
+        self.lru    = collections.OrderedDict()
+
+        # tests[i]    : (test, text) when mask i is a literal, None otherwise
+        # literals[i] : characters any string mask i matches contains
+        # leads[i]    : characters any string mask i matches starts with
+        # index       : 3 characters -> masks that need them
+        # always      : masks tried whatever the string
+
+        self.tests    = []
+        self.literals = []
+        self.leads    = []
+        self.index    = {}
+        self.always   = []
+
+        shared   = collections.Counter()
+        for mask in masks :
+            test = self.__literal__(mask[0])
+            self.tests.append(test)
+            literal = test[1] if test else self.__required__(mask[0])
+            self.literals.append(literal)
+            if test : self.leads.append( test[1] if test[0] in ['start','equal'] else '' )
+            else    : self.leads.append( self.__lead__(mask[0]) )
+            shared.update( set( literal[j:j+3] for j in range(len(literal)-2) ) )
+
+        for i, literal in enumerate(self.literals) :
+            if len(literal) < 3 :
+               self.always.append(i)
+               continue
+            key = min( (literal[j:j+3] for j in range(len(literal)-2)), key=shared.__getitem__ )
+            self.index.setdefault(key,[]).append(i)
+
+        self.keys = list(self.index.items())
+
+    # match : index of the first mask matching s, None if none does
+
+    def match(self, s):
+        if s in self.lru :
+           self.lru.move_to_end(s)
+           return self.lru[s]
+
+        # few keys : each one searched in s,  otherwise each 3 characters of s looked up
+
+        found = set()
+        if len(self.keys) < len(s) :
+           for key, masks in self.keys :
+               if key in s : found.update(masks)
+        else :
+           index = self.index
+           for j in range(len(s)-2) :
+               masks = index.get(s[j:j+3])
+               if masks : found.update(masks)
+
+        if found :
+           found.update(self.always)
+           candidates = sorted(found)
+        else :
+           candidates = self.always
+
+        # . does not match a newline : with one, the literals are matched with their regexp
+
+        plain = '\n' not in s
+
+        result = None
+        for i in candidates :
+            test = self.tests[i]
+            if test and plain :
+               kind, text = test
+               if   kind == 'in'    : ok = text in s
+               elif kind == 'start' : ok = s.startswith(text)
+               elif kind == 'end'   : ok = s.endswith(text)
+               else                 : ok = s == text
+            else :
+               ok = self.masks[i][3].match(s)
+            if ok :
+               result = i
+               break
+
+        self.lru[s] = result
+        if len(self.lru) > self.lru_max : self.lru.popitem(last=False)
+
+        return result
+
+    # rejects_prefix : True when all the strings starting with prefix are rejected
+    #                  (the first mask that matches them rejects, or none does and
+    #                  accept_unmatch is False)... it changes nothing : thread safe
+
+    def rejects_prefix(self, prefix, accept_unmatch):
+        if '\n' in prefix : return False
+
+        for i, mask in enumerate(self.masks) :
+
+            # mask i matches none of them
+
+            lead = self.leads[i]
+            if not lead.startswith(prefix) and not prefix.startswith(lead) : continue
+            test = self.tests[i]
+            if test and test[0] == 'equal' and not test[1].startswith(prefix) : continue
+
+            # mask i matches all of them (the ones the masks before did not)
+
+            if test and ( (test[0] == 'in'    and test[1] in prefix ) or \
+                          (test[0] == 'start' and prefix.startswith(test[1])) ) :
+               return not mask[4]
+
+            # some may be accepted
+
+            if mask[4] : return False
+
+        return not accept_unmatch
+
+    # (test, text) for a literal mask, None otherwise
+    #   .*text     .*text.*  : text in s         text  text.*  : s.startswith(text)
+    #   .*text$              : s.endswith(text)  text$         : s == text
+
+    def __literal__(self, pattern):
+        anywhere = pattern.startswith('.*')
+        if anywhere : pattern = pattern[2:]
+
+        end = pattern.endswith('$') and not pattern.endswith('\\$')
+        if end : pattern = pattern[:-1]
+        elif pattern.endswith('.*') and not pattern.endswith('\\.*') : pattern = pattern[:-2]
+
+        # escaped punctuation \. \- ... is the character itself
+
+        text    = ''
+        escaped = False
+        for c in pattern :
+            if escaped :
+               if c.isalnum() : return None
+               text   += c
+               escaped = False
+            elif c == '\\' : escaped = True
+            elif c in regexp_chars : return None
+            else : text += c
+        if escaped : return None
+
+        if end : return ('end' if anywhere else 'equal', text)
+        return ('in' if anywhere else 'start', text)
+
+    # characters a regexp matches as such at its start ('' when it ignores case)
+
+    def __lead__(self, pattern):
+        try :
+              parsed = sre_parse.parse(pattern)
+              state  = getattr(parsed,'state',None) or getattr(parsed,'pattern',None)
+              if state.flags & re.IGNORECASE : return ''
+        except: return ''
+
+        lead = ''
+        for op, av in parsed :
+            if op != sre_parse.LITERAL : break
+            lead += chr(av)
+
+        return lead
+
+    # longest run of characters a regexp matches as such, everything else
+    # of it aside ('' when there is none, or when it ignores case)
+
+    def __required__(self, pattern):
+        try :
+              parsed = sre_parse.parse(pattern)
+              state  = getattr(parsed,'state',None) or getattr(parsed,'pattern',None)
+              if state.flags & re.IGNORECASE : return ''
+        except: return ''
+
+        best = ''
+        run  = ''
+        for op, av in parsed :
+            if op == sre_parse.LITERAL :
+               run += chr(av)
+               continue
+            if len(run) > len(best) : best = run
+            run = ''
+        if len(run) > len(best) : best = run
+
+        return best
+
+# ===================================
+# sr_topic_filter
+# ===================================
+#
+#  topic_prefilter option :  the topic of a message is its relpath directories
+#  (v02.post.observations.swob-ml.CYUL  for observations/swob-ml/CYUL/file)
+#  so, when the masks are about the path of the files, it tells what masks
+#  could match before the message is decoded :
+#
+#     .*/swob-ml/CYUL/.*   may only match topics with words swob-ml.CYUL
+#     .*swob.*             surely matches topics with a word containing swob
+#
+#  The masks are gone through as isMatchingPattern would :  a topic is rejected
+#  when, whatever its files, the first mask matching rejects them (or none does
+#  and accept_unmatch is False).  The decision is kept for each topic.
+#
+#  It assumes the message urls have their whole path in the relpath (a base url
+#  without directories) :  a mask about a directory of the base url would
+#  otherwise be seen as not matching.  So nothing is rejected until a decoded
+#  message showed a base url without directories, and the first base url with
+#  directories turns the filter off.
+
+# topic words and mask words compared as such (not quoted in url, no dots)
+
+plain_word = re.compile(r'[\w\-~]+$', re.ASCII)
+
+class sr_topic_filter:
+
+    topics_max = 10000
+
+    def __init__(self, parent):
+        self.parent   = parent
+        self.logger   = parent.logger
+        self.rejected = 0
+        self.count    = 0
+        self.baseurls = set()
+        self.armed    = False
+        self.off      = False
+        self.build()
+
+    def build(self):
+        self.masks     = self.parent.masks
+        self.matcher   = sr_matcher(self.masks)
+        self.prefix    = self.parent.topic_prefix + '.'
+        self.decisions = {}
+
+        # words[i] : consecutive topic words mask i needs, None if it may match any topic
+
+        self.words = [ self.__words__(literal) for literal in self.matcher.literals ]
+
+    # rejects : True when all the messages of this topic are rejected by accept/reject
+
+    def rejects(self, topic):
+        self.count += 1
+
+        if not self.armed : return False
+
+        if self.masks is not self.parent.masks or self.matcher.count != len(self.masks) : self.build()
+
+        if topic in self.decisions :
+           rejected = self.decisions[topic]
+        else :
+           rejected = self.__decide__(topic)
+           if len(self.decisions) >= self.topics_max : self.decisions = {}
+           self.decisions[topic] = rejected
+
+        if rejected : self.rejected += 1
+        return rejected
+
+    # check : the base url of a decoded message, as the topics assume it
+
+    def check(self, baseurl):
+        if self.off or baseurl in self.baseurls : return
+
+        if urllib.parse.urlparse(baseurl).path.strip('/') :
+           self.logger.warning("topic_prefilter: base url %s has directories the topics do not have, prefilter off" % baseurl )
+           self.armed     = False
+           self.off       = True
+           self.decisions = {}
+           return
+
+        if len(self.baseurls) >= self.topics_max : self.baseurls = set()
+        self.baseurls.add(baseurl)
+        self.armed = True
+
+    # log what masks could be subtopic bindings, so the broker does not send the messages at all
+
+    def report(self):
+        broad = []
+        for i, mask in enumerate(self.masks) :
+            if not mask[4] : continue
+            if self.words[i] is None :
+               broad.append(mask[0])
+               continue
+            self.logger.info("topic_prefilter: accept %s could be bound as subtopic #.%s.#" % \
+                             (mask[0], '.'.join(self.words[i])) )
+
+        if broad :
+           self.logger.info("topic_prefilter: accept %s need all topics" % ' '.join(broad) )
+        elif self.parent.accept_unmatch :
+           self.logger.info("topic_prefilter: accept_unmatch True needs all topics" )
+        elif self.masks :
+           self.logger.info("topic_prefilter: subtopic bindings above would get all the messages accepted" )
+
+    def __decide__(self, topic):
+
+        # topics of another prefix, or truncated (255 AMQP limit) : not decided here
+
+        if topic + '.' != self.prefix and not topic.startswith(self.prefix) : return False
+        if len(topic.encode('utf8')) >= 250 : return False
+
+        # words with quoted or non ascii characters may be anything
+
+        topic_words = []
+        for w in topic[len(self.prefix):].split('.') :
+            if not w : continue
+            topic_words.append( w if plain_word.match(w) else None )
+
+        for i, mask in enumerate(self.masks) :
+            words = self.words[i]
+            if words is not None and not self.__occurs__(words,topic_words) : continue
+
+            test = self.matcher.tests[i]
+            if test and test[0] == 'in' and self.__surely__(test[1],topic_words) :
+               return not mask[4]
+
+            # may be accepted :  decided once decoded
+            if mask[4] : return False
+
+        return not self.parent.accept_unmatch
+
+    def __occurs__(self, words, topic_words):
+        k = len(words)
+        for p in range(len(topic_words)-k+1) :
+            for j in range(k) :
+                w = topic_words[p+j]
+                if w is not None and w != words[j] : break
+            else :
+                return True
+        return False
+
+    # a text any url of the topic contains
+
+    def __surely__(self, text, topic_words):
+        if not text : return True
+        if not plain_word.match(text) : return False
+        for w in topic_words :
+            if w is not None and text in w : return True
+        return False
+
+    # the directories a literal has whole :  /swob-ml/CYUL/ -> [ 'swob-ml', 'CYUL' ]
+
+    def __words__(self, literal):
+        if '//' in literal or ':' in literal : return None
+
+        parts = literal.split('/')
+        words = []
+        for part in parts[1:-1] :
+            for w in part.split('.') :
+                if not w : continue
+                if not plain_word.match(w) : return None
+                words.append(w)
+
+        return words or None
@@ -48,9 +48,11 @@ from mimetypes import guess_type
 
 
 try :
+         from sr_timestamp    import *
          from sr_util         import *
          from sr_xattr        import *
 except :
+         from sarra.sr_timestamp import *
          from sarra.sr_util    import *
          from sarra.sr_xattr   import *
 
@@ -71,6 +73,7 @@ class sr_message():
         self.post_topic_prefix  = parent.post_topic_prefix
         self.post_version  = parent.post_version
         self.report_publisher = None
+        self.reporter      = None
         self.publisher     = None
         self.pub_exchange  = None
         self.topic         = None
@@ -271,75 +274,54 @@ class sr_message():
         """
             This routine does a minimal decode of raw messages from amqplib
             raw messages are also decoded by sr_retry/msgToJSON, so must match the two. 
-        """
-
-        self.start_timer()
 
-        self.logger.debug("from_amqplib " )
-        if msg :
-           self.exchange  = msg.delivery_info['exchange']
-           self.topic     = msg.delivery_info['routing_key']
-           self.topic     = self.topic.replace('%20',' ')
-           self.topic     = self.topic.replace('%23','#')
-           if msg.body[0] == '[' :
-               self.logger.debug("from_amqplib transitional v03" )
-               self.pubtime, self.baseurl, self.relpath, self.headers = json.loads(msg.body)
-               self.notice = "%s %s %s" % ( self.pubtime, self.baseurl, self.relpath )
-           elif msg.body[0] == '{' :
-               self.logger.debug("from_amqplib v03 body: %s" % msg.body)
-               self.headers = json.loads(msg.body)
-               self.logger.debug("from_amqplib v03 headers: %s" % self.headers )
-               self.pubtime = self.headers[ "pubTime" ]
-               self.baseurl = self.headers[ "baseUrl" ]
-               self.relpath = self.headers[ "relPath" ]
-               self.notice = "%s %s %s" % ( self.pubtime, self.baseurl, self.relpath )
-               if "integrity" in self.headers.keys():
-                   sum_algo_v3tov2 = { "arbitrary":"a", "md5":"d", "sha512":"s", "md5name":"n", "random":"0", "link":"L", "remove":"R", "cod":"z" }
-                   if type( self.headers[ "integrity" ] ) is str:
-                       self.headers[ "integrity" ] = json.loads( self.headers[ "integrity" ] )
-                   sa = sum_algo_v3tov2[ self.headers[ "integrity" ][ "method" ] ]
-
-                   # transform sum value
-                   if sa in [ '0' ]:
-                       sv = self.headers[ "integrity" ][ "value" ]
-                   elif sa in [ 'z' ]:
-                       sv = sum_algo_v3tov2[ self.headers[ "integrity" ][ "value" ] ]
-                   else:
-                       sv = encode( decode( self.headers[ "integrity" ][ "value" ].encode('utf-8'), "base64" ), 'hex' ).decode('utf-8')
-                   # set event.
-                   if sa == 'L' :
-                       self.event = 'link'
-                   elif sa == 'R':
-                       self.event = 'delete'
-                   else:
-                       self.event = 'modify'
-
-                   self.headers[ "sum" ] = sa + ',' + sv
-                   self.sumstr = self.headers['sum']
-                   del self.headers['integrity']
-               if 'blocks' in self.headers.keys():
-                   parts_map = {'inplace': 'i', 'partitioned': 'p'}
-                   self.set_parts(parts_map[self.headers['blocks']['method']], int(self.headers['blocks']['size']),
-                                      int(self.headers['blocks']['count']), int(self.headers['blocks']['remainder']),
-                                      int(self.headers['blocks']['number']))
-                   del self.headers['blocks']
-               elif 'size' in self.headers.keys():
-                   self.set_parts('1', int(self.headers['size']))
-                   del self.headers['size']
+            It is done in two steps, so that a message rejected on its url is not decoded further :
+              decode_routing : exchange, topic, notice, baseurl, relpath, urlstr (the body parsed once)
+              decode_headers : integrity, parts, headers options, parse of the notice
+        """
 
+        self.decode_routing(msg)
+        self.decode_headers()
 
-           else:
-               self.logger.debug("from_amqplib v02" )
-               if 'application_headers' in msg.properties.keys():
-                   self.headers = msg.properties['application_headers']
+    def decode_headers(self):
+        """
+            second step of from_amqplib : what decode_routing left as it was in the message
+        """
 
-               if type(msg.body) == bytes: 
-                    self.notice = msg.body.decode("utf-8")
+        if self.v03 :
+           if "integrity" in self.headers.keys():
+               sum_algo_v3tov2 = { "arbitrary":"a", "blake2b":"b", "md5":"d", "sha512":"s", "md5name":"n", "random":"0", "link":"L", "remove":"R", "xxh128":"x", "cod":"z" }
+               if type( self.headers[ "integrity" ] ) is str:
+                   self.headers[ "integrity" ] = json.loads( self.headers[ "integrity" ] )
+               sa = sum_algo_v3tov2[ self.headers[ "integrity" ][ "method" ] ]
+
+               # transform sum value
+               if sa in [ '0' ]:
+                   sv = self.headers[ "integrity" ][ "value" ]
+               elif sa in [ 'z' ]:
+                   sv = sum_algo_v3tov2[ self.headers[ "integrity" ][ "value" ] ]
                else:
-                    self.notice = msg.body
-
-               self.pubtime, self.baseurl, self.relpath = self.notice.split(' ')[0:3]
-           self.isRetry   = msg.isRetry
+                   sv = b64decode( self.headers[ "integrity" ][ "value" ] ).hex()
+               # set event.
+               if sa == 'L' :
+                   self.event = 'link'
+               elif sa == 'R':
+                   self.event = 'delete'
+               else:
+                   self.event = 'modify'
+
+               self.headers[ "sum" ] = sa + ',' + sv
+               self.sumstr = self.headers['sum']
+               del self.headers['integrity']
+           if 'blocks' in self.headers.keys():
+               parts_map = {'inplace': 'i', 'partitioned': 'p'}
+               self.set_parts(parts_map[self.headers['blocks']['method']], int(self.headers['blocks']['size']),
+                                  int(self.headers['blocks']['count']), int(self.headers['blocks']['remainder']),
+                                  int(self.headers['blocks']['number']))
+               del self.headers['blocks']
+           elif 'size' in self.headers.keys():
+               self.set_parts('1', int(self.headers['size']))
+               del self.headers['size']
 
         # retransmission case :
         # topic is name of the queue...
@@ -371,6 +353,57 @@ class sr_message():
         else:
            self.parse_v02_post()
 
+    def decode_routing(self, msg=None ):
+        """
+            first step of from_amqplib : what accept/reject needs (urlstr), the body parsed once.
+            v03 headers are left as received (integrity, blocks) until decode_headers.
+        """
+
+        self.start_timer()
+
+        self.logger.debug("from_amqplib " )
+        self.v03 = False
+        if msg :
+           self.exchange  = msg.delivery_info['exchange']
+           self.topic     = msg.delivery_info['routing_key']
+           self.topic     = self.topic.replace('%20',' ')
+           self.topic     = self.topic.replace('%23','#')
+           if msg.body[0] == '[' :
+               self.logger.debug("from_amqplib transitional v03" )
+               self.pubtime, self.baseurl, self.relpath, self.headers = json.loads(msg.body)
+               self.notice = "%s %s %s" % ( self.pubtime, self.baseurl, self.relpath )
+           elif msg.body[0] == '{' :
+               # formatted only when debugging : every message goes through here
+               self.logger.debug("from_amqplib v03 body: %s", msg.body)
+               self.headers = json.loads(msg.body)
+               self.logger.debug("from_amqplib v03 headers: %s", self.headers )
+               self.pubtime = self.headers[ "pubTime" ]
+               self.baseurl = self.headers[ "baseUrl" ]
+               self.relpath = self.headers[ "relPath" ]
+               self.notice = "%s %s %s" % ( self.pubtime, self.baseurl, self.relpath )
+               self.v03 = True
+
+           else:
+               self.logger.debug("from_amqplib v02" )
+               if 'application_headers' in msg.properties.keys():
+                   self.headers = msg.properties['application_headers']
+
+               if type(msg.body) == bytes: 
+                    self.notice = msg.body.decode("utf-8")
+               else:
+                    self.notice = msg.body
+
+               self.pubtime, self.baseurl, self.relpath = self.notice.split(' ')[0:3]
+           self.isRetry   = msg.isRetry
+
+        # urlstr as parse_v02_post (or parse_v00_post) sets it
+
+        token = self.notice.split(' ')
+        if self.topic[:3] == 'v00' :
+           if len(token) > 3 : self.urlstr = token[2]+token[3]
+        elif len(token) > 2 :
+           self.urlstr = token[1]+token[2]
+
     def get_elapse_pubtime(self):
         """ Time calculated between now and the time of the first publication in seconds
 
@@ -427,8 +460,10 @@ class sr_message():
                    ok=False
                    break
 
-           # publish
-           if ok:
+           # publish (report_aggregate : counted in the next summary)
+           if ok and self.reporter :
+               self.reporter.add(self)
+           elif ok:
                self.report_publisher.publish(self.report_exchange,self.report_topic,self.report_notice,self.headers)
 
         self.logger.debug("%d %s : %s %s %s" % (code,message,self.report_topic,self.report_notice,self.hdrstr))
@@ -628,7 +663,7 @@ class sr_message():
                self.headers[ "baseUrl" ] = self.baseurl
                self.headers[ "relPath" ] = self.relpath
                
-               sum_algo_map = { "a":"arbitrary", "d":"md5", "s":"sha512", "n":"md5name", "0":"random", "L":"link", "R":"remove", "z":"cod" }
+               sum_algo_map = { "a":"arbitrary", "b":"blake2b", "d":"md5", "s":"sha512", "n":"md5name", "0":"random", "L":"link", "R":"remove", "x":"xxh128", "z":"cod" }
                if 'sum' in self.headers:
                    sm = sum_algo_map[ self.headers["sum"][0] ]
                    if sm in [ 'random' ] :
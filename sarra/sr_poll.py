@@ -80,7 +80,10 @@ try :
          from sr_file           import *
          from sr_ftp            import *
          from sr_http           import *
+         from sr_ls_index       import *
+         from sr_matcher        import *
          from sr_message        import *
+         from sr_pollpool       import *
          from sr_post           import *
          from sr_util           import *
 except : 
@@ -88,7 +91,10 @@ except :
          from sarra.sr_file      import *
          from sarra.sr_ftp       import *
          from sarra.sr_http      import *
+         from sarra.sr_ls_index  import *
+         from sarra.sr_matcher   import *
          from sarra.sr_message   import *
+         from sarra.sr_pollpool  import *
          from sarra.sr_post      import *
          from sarra.sr_util      import *
 
@@ -131,8 +137,21 @@ class sr_poll(sr_post):
         self.sleeping      = False
         self.connected     = False 
 
+        # ls_backend indexed : listings kept in an sqlite database (opened at first poll)
+
+        if self.ls_high_water and self.ls_backend != 'indexed' :
+           self.logger.warning("ls_high_water needs ls_backend indexed, now used")
+           self.ls_backend = 'indexed'
+
+        self.ls_index      = None
+
+        # poll_workers : directories listed ahead by a pool of sessions (created at each poll)
+
+        self.poll_pool     = None
+
         # rebuild mask as pulls instructions
         # pulls[directory] = [mask1,mask2...]
+        # pullmatchers[directory] = the masks of the directory compiled (sr_matcher)
 
         self.pulls   = {}
         for mask in self.masks:
@@ -142,6 +161,10 @@ class sr_poll(sr_post):
                self.pulls[maskDir] = []
             self.pulls[maskDir].append(mask)
 
+        self.pullmatchers = {}
+        for maskDir in self.pulls :
+            self.pullmatchers[maskDir] = sr_matcher(self.pulls[maskDir])
+
     # find differences between current ls and last ls
     # only the newer or modified files will be kept...
 
@@ -202,15 +225,7 @@ class sr_poll(sr_post):
 
         # try supported hardcoded download
 
-        self.dest = None
-
-        if   scheme == 'file'          : self.dest = sr_file(self)
-        elif scheme in ['ftp','ftps']  : self.dest = sr_ftp(self)
-        elif scheme in ['http','https']: self.dest = sr_http(self)
-        elif scheme == 'sftp' :
-             try    : from sr_sftp       import sr_sftp
-             except : from sarra.sr_sftp import sr_sftp
-             self.dest = sr_sftp(self)
+        self.dest = self.new_dest()
 
         # user defined poll scripts
         # if many are configured, this one is the last one in config
@@ -237,6 +252,21 @@ class sr_poll(sr_post):
 
         return False
 
+    # new_dest : a new protocol session to the destination (None if its scheme is not supported)
+
+    def new_dest(self):
+        scheme = self.details.url.scheme
+
+        if   scheme == 'file'          : return sr_file(self)
+        elif scheme in ['ftp','ftps']  : return sr_ftp(self)
+        elif scheme in ['http','https']: return sr_http(self)
+        elif scheme == 'sftp' :
+             try    : from sr_sftp       import sr_sftp
+             except : from sarra.sr_sftp import sr_sftp
+             return sr_sftp(self)
+
+        return None
+
     def help(self):
         print("Usage: %s [OPTIONS] configfile [add|cleanup|declare|disable|edit|enable|foreground|remove|start|stop|restart|reload|setup|status]\n" % self.program_name )
         print("version: %s \n" % sarra.__version__ )
@@ -295,9 +325,12 @@ class sr_poll(sr_post):
 
         return lsold
 
-    def lsdir(self):
+    # lsdir : the files and directories of the listing selected...
+    #         ls given, when the listing was done by the poll_workers pool
+
+    def lsdir(self,ls=None):
         try :
-            ls      = self.dest.ls()
+            if ls is None : ls = self.dest.ls()
             new_ls  = {}
             new_dir = {}
 
@@ -318,13 +351,10 @@ class sr_poll(sr_post):
                    new_dir[d] = self.line
                    continue
 
-                for mask in self.pulllst :
-                   pattern, maskDir, maskFileOption, mask_regexp, accepting, mirror, strip, pstrip, flatten = mask
-                   if mask_regexp.match(f):
-                       if accepting:
-                           matched=True
-                           new_ls[f] = self.line.strip('\n')
-                       break
+                i = self.pullmatch.match(f)
+                if i is not None and self.pulllst[i][4] :
+                   matched=True
+                   new_ls[f] = self.line.strip('\n')
 
 
             return True, new_ls, new_dir
@@ -360,20 +390,42 @@ class sr_poll(sr_post):
         self.logger.debug("poll_directory %s %s" % (pdir,lspath))
         npost = 0
 
-        # cd to that directory
+        # poll_workers : the listing of that directory, done by the pool
+
+        if self.poll_pool :
+           ok, ls = self.poll_pool.result( pdir )
+           if not ok : return npost
+
+           ok, file_dict, dir_dict = self.lsdir(ls)
+           if not ok : return npost
+
+        else :
 
-        self.logger.debug(" cd %s" % pdir)
-        ok = self.cd( pdir )
-        if not ok : return npost
+           # cd to that directory
 
-        # ls that directory
+           self.logger.debug(" cd %s" % pdir)
+           ok = self.cd( pdir )
+           if not ok : return npost
 
-        ok, file_dict, dir_dict = self.lsdir()
-        if not ok : return npost
+           # ls that directory
+
+           ok, file_dict, dir_dict = self.lsdir()
+           if not ok : return npost
+
+        # ls_backend indexed : sleeping or not, the listing is merged with the previous one
+
+        if self.ls_backend == 'indexed' :
+
+           filelst,desclst = self.ls_index.differ(file_dict,lspath)
+           self.logger.debug("poll_directory: after differ, len=%d" % len(filelst) )
+
+           if not self.sleeping :
+              n = self.poll_list_post( pdir, desclst, filelst ) 
+              npost += n
 
         # when not sleeping
 
-        if not self.sleeping :
+        elif not self.sleeping :
 
            # get file list from difference in ls
 
@@ -387,13 +439,17 @@ class sr_poll(sr_post):
 
         # sleeping or not, write the directory file content 
 
-        ok = self.write_ls_file(file_dict,lspath)
+        if self.ls_backend != 'indexed' :
+           ok = self.write_ls_file(file_dict,lspath)
 
         # poll in children directory
 
-        sdir = sorted(dir_dict.keys())
+        sdir = [ d for d in sorted(dir_dict.keys()) if d != '.' and d != '..' ]
+
+        if self.poll_pool :
+           for d in sdir : self.poll_pool.prefetch( pdir + os.sep + d )
+
         for d in sdir :
-            if d == '.' or d == '..' : continue
 
             d_lspath = lspath + '_'    + d
             d_pdir   = pdir   + os.sep + d
@@ -523,6 +579,7 @@ class sr_poll(sr_post):
         # General Attributes
 
         self.pulllst     = []
+        self.pullmatch   = None
 
         # number of post files
 
@@ -540,13 +597,14 @@ class sr_poll(sr_post):
             return True
 
         if hasattr(self.dest,'file_index'): self.dest_file_index = self.dest.file_index
-        # loop on all directories where there are pulls to do
 
-        for destDir in self.pulls :
+        if self.ls_backend == 'indexed' and self.ls_index is None :
+           self.ls_index = sr_ls_index(self, self.user_cache_dir + os.sep + 'ls_index.sqlite')
 
-            # setup of poll directory info
+        # all directories where there are pulls to do
 
-            self.pulllst = self.pulls[destDir]
+        polls = []
+        for destDir in self.pulls :
 
             path         = destDir
             path         = path.replace('${','')
@@ -558,7 +616,31 @@ class sr_poll(sr_post):
 
             if currentDir == '' : currentDir = destDir
 
-            npost += self.poll_directory( currentDir, lsPath )
+            polls.append( (destDir, currentDir, lsPath) )
+
+        # poll_workers : all listed ahead (file: lists local directories, with chdir)
+
+        if self.poll_workers > 1 and self.details.url.scheme != 'file' :
+           self.poll_pool = sr_pollpool(self, self.poll_workers)
+           for destDir, currentDir, lsPath in polls :
+               self.poll_pool.prefetch( currentDir )
+
+        # loop on all directories where there are pulls to do
+
+        try :
+              for destDir, currentDir, lsPath in polls :
+
+                  # setup of poll directory info
+
+                  self.pulllst   = self.pulls[destDir]
+                  self.pullmatch = self.pullmatchers[destDir]
+
+                  npost += self.poll_directory( currentDir, lsPath )
+
+        finally :
+              if self.poll_pool :
+                 self.poll_pool.close()
+                 self.poll_pool = None
 
         # close connection
 
@@ -602,7 +684,7 @@ class sr_poll(sr_post):
 
         # caching
         if self.caching :
-           self.cache      = sr_cache(self)
+           self.cache      = new_cache(self)
            self.cache_stat = True
            if self.reset:
               self.cache.close(unlink=True)
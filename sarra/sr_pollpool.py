@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_pollpool.py : python3 directory listing thread pool (poll_workers option)
+#
+#  sr_poll lists its directories one after the other, over one connection :
+#  a slow directory, or a slow server, delays all the others.  With a pool,
+#  the directories about to be polled (the directories of the config, then
+#  the subdirectories of each directory polled) are listed ahead by threads,
+#  each one with its own protocol session (parent.new_dest).
+#
+#  Only the listing (cd, ls) runs in the threads :  the on_line plugins,
+#  the accept/reject masks, the comparison to the previous listing and the
+#  posting stay in the main thread, in the same order as without a pool.
+#
+#  The on_html_page plugins of sr_http are not thread safe : the sessions
+#  run them one at a time (plugin_lock).
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import collections,concurrent.futures,sys,threading
+
+# ===================================
+# sr_pollpool
+# ===================================
+
+class sr_pollpool:
+
+    def __init__(self, parent, count):
+        parent.logger.debug("sr_pollpool __init__ %d" % count)
+
+        self.logger   = parent.logger
+        self.parent   = parent
+        self.count    = count
+
+        # listings started ahead : directory -> future
+        # no more than window of them at once, the others wait in upcoming
+
+        self.window     = 4 * count
+        self.prefetched = collections.OrderedDict()
+        self.upcoming   = collections.deque()
+
+        # sessions : one per thread, all closed with the pool
+
+        self.local       = threading.local()
+        self.lock        = threading.Lock()
+        self.plugin_lock = threading.Lock()
+        self.sessions    = []
+
+        # pool threads are named from python 3.6
+        named = { 'thread_name_prefix' : 'poll' } if sys.version_info >= (3,6) else {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=count, **named)
+
+    def close(self):
+        self.logger.debug("sr_pollpool close")
+
+        self.forget()
+        self.executor.shutdown(wait=True)
+
+        for dest in self.sessions :
+            try   : dest.close()
+            except: pass
+        self.sessions = []
+
+    # forget : drop the listings not used (directories not polled after all)
+
+    def forget(self):
+        for pdir in self.prefetched :
+            self.prefetched[pdir].cancel()
+        self.prefetched = collections.OrderedDict()
+        self.upcoming   = collections.deque()
+
+    # listing of directory pdir, run by a pool thread : (ok, ls) as dest.ls() returns it
+
+    def list(self, pdir):
+        dest = self.__session__()
+        if dest is None : return False, None
+
+        try   :
+                dest.cd(pdir)
+        except:
+                self.logger.warning("sr_poll/cd: could not cd to directory %s" % pdir )
+                return False, None
+
+        try   :
+                return True, dest.ls()
+        except:
+                self.logger.warning("dest.lsdir: Could not ls directory")
+                self.logger.debug("Exception details:", exc_info=True)
+
+        return False, None
+
+    # prefetch : the listing of a directory about to be polled
+    #            is started as soon as there is room in the window
+
+    def prefetch(self, pdir):
+        if pdir in self.prefetched or pdir in self.upcoming : return
+        self.upcoming.append(pdir)
+        self.__fill__()
+
+    # result : the listing of pdir, waited for... started now if it was not prefetched
+
+    def result(self, pdir):
+        if not pdir in self.prefetched :
+           try    : self.upcoming.remove(pdir)
+           except ValueError : pass
+           self.prefetched[pdir] = self.executor.submit(self.list, pdir)
+
+        future = self.prefetched.pop(pdir)
+        self.__fill__()
+
+        return future.result()
+
+    def __fill__(self):
+        while self.upcoming and len(self.prefetched) < self.window :
+              pdir = self.upcoming.popleft()
+              self.prefetched[pdir] = self.executor.submit(self.list, pdir)
+
+    # the session of this thread, connected on first use
+
+    def __session__(self):
+        dest = getattr(self.local,'dest',None)
+        if dest is not None : return dest
+
+        try   :
+                dest = self.parent.new_dest()
+                with self.lock : self.sessions.append(dest)
+                if hasattr(dest,'plugin_lock') : dest.plugin_lock = self.plugin_lock
+                dest.connect()
+        except:
+                self.logger.error("sr_pollpool: unable to connect to %s" % self.parent.destination)
+                self.logger.debug('Exception details: ', exc_info=True)
+                return None
+
+        self.local.dest = dest
+        return dest
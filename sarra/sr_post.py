@@ -55,19 +55,27 @@ from watchdog.events            import PatternMatchingEventHandler
 try :    
          from sr_amqp            import *
          from sr_cache           import *
+         from sr_inotify         import *
          from sr_instances       import *
+         from sr_matcher         import *
          from sr_message         import *
          from sr_rabbit          import *
+         from sr_sumpool         import *
          from sr_util            import *
+         from sr_walker          import *
          from sr_xattr import *
 except : 
          from sarra.sr_xattr import *
          from sarra.sr_amqp      import *
          from sarra.sr_cache     import *
+         from sarra.sr_inotify   import *
          from sarra.sr_instances import *
+         from sarra.sr_matcher   import *
          from sarra.sr_message   import *
          from sarra.sr_rabbit    import *
+         from sarra.sr_sumpool   import *
          from sarra.sr_util      import *
+         from sarra.sr_walker    import *
 
 #============================================================
 
@@ -144,6 +152,7 @@ class sr_post(sr_instances):
            if not plugin(self): break
 
         if self.post_hc :
+           if hasattr(self,'publisher') : self.publisher.flush()
            self.post_hc.close()
            self.post_hc = None
 
@@ -151,6 +160,14 @@ class sr_post(sr_instances):
            self.cache.save()
            self.cache.close()
 
+        if self.sum_pool :
+           self.sum_pool.close()
+           self.sum_pool = None
+
+        if self.inotify :
+           self.inotify.close()
+           self.inotify = None
+
         if self.sleep > 0 and len(self.obs_watched):
            for ow in self.obs_watched:
                try:
@@ -196,6 +213,7 @@ class sr_post(sr_instances):
            return
 
         self.publisher = Publisher(self.post_hc)
+        self.publisher.set_confirm_window(self.post_confirm_window)
         self.publisher.build()
 
         self.logger.info("Output AMQP broker(%s) user(%s) vhost(%s)" % \
@@ -249,6 +267,7 @@ class sr_post(sr_instances):
         print("-sub <subtopic>        default:'path.of.file'")
         print("-rn  <rename>          default:None")
         print("-sum <sum>             default:d")
+        print("-cth <checksum_threads> default:0 (checksums computed one after the other)")
         print("-caching               default:enable caching")
         print("-reset                 default:enable reset")
         print("-path <path1... pathN> default:required")
@@ -346,12 +365,20 @@ class sr_post(sr_instances):
 
         self.obs_watched   = []
         self.watch_handler = None
+        self.inotify       = None
+        self.walk_matcher  = None
         self.post_topic_prefix = "v02.post"
 
         self.inl           = OrderedDict()
         self.new_events    = OrderedDict()
         self.left_events   = OrderedDict()
 
+        # inflight : files known written and closed (watch_backend inotify),
+        #            when the files too new will be old enough
+
+        self.closed_paths  = set()
+        self.inflight_due  = {}
+
         self.blocksize     = 200 * 1024 * 1024
 
     # =============
@@ -369,6 +396,10 @@ class sr_post(sr_instances):
            #self.logger.debug("ok lstat None")
            return False
 
+        if self.inflight_close_write and path in self.closed_paths :
+           #self.logger.debug("ok written and closed")
+           return False
+
         age = nowflt() - lstat.st_mtime
         if age < self.inflight :
            self.logger.debug("%d vs (inflight setting) %d seconds. Too New!" % (age,self.inflight) )
@@ -376,6 +407,20 @@ class sr_post(sr_instances):
 
         return False
 
+    # =============
+    # path_aging : a create/modify of a file found too new (path_inflight), not yet old
+    #              enough... no need to stat it again until then
+    # =============
+
+    def path_aging(self,event,src,now):
+
+        if event not in [ 'create', 'modify' ] : return False
+
+        due = self.inflight_due.get(src)
+        if due is None or due <= now : return False
+
+        return not ( self.inflight_close_write and src in self.closed_paths )
+
     # =============
     # path renamed
     # =============
@@ -597,33 +642,67 @@ class sr_post(sr_instances):
         if sumflg[:2] == 'z,' and len(sumflg) > 2:
             sumstr = sumflg
         else:
-            if not sumflg[0] in ['0', 'd', 'n', 's', 'z']: sumflg = 'd'
+            if not sumflg[0] in ['0', 'b', 'd', 'n', 's', 'x', 'z']: sumflg = 'd'
 
             self.set_sumalgo(sumflg)
             sumalgo = self.sumalgo
             sumalgo.set_path(path)
 
+            # checksum computed ahead by the checksum_threads
+
+            checksum = None
+            if self.sum_pool and sumflg in ['b','d','s','x'] :
+               checksum = self.sum_pool.result(sumflg, path)
+
             # compute checksum
 
-            if sumflg in ['d','s'] :
+            if checksum == None :
 
-                fp = open(path,'rb')
-                i  = 0
-                while i<fsiz :
-                    buf = fp.read(self.bufsize)
-                    if not buf: break
-                    sumalgo.update(buf)
-                    i  += len(buf)
-                fp.close()
+               if sumflg in ['b','d','s','x'] :
+
+                   fp = open(path,'rb')
+                   i  = 0
+                   while i<fsiz :
+                       buf = fp.read(self.bufsize)
+                       if not buf: break
+                       sumalgo.update(buf)
+                       i  += len(buf)
+                   fp.close()
+
+               checksum = sumalgo.get_value()
 
             # setting sumstr
-            checksum = sumalgo.get_value()
             sumstr = '%s,%s' % (sumflg, checksum)
 
         xattr.set('sum', sumstr)
         xattr.persist()
         return sumstr
 
+    # =============
+    # prefetch_sumstr : have the checksum_threads compute ahead
+    #                   the checksum of a file about to be posted
+    # =============
+
+    def prefetch_sumstr(self, path, lstat):
+
+        if self.randomize or not self.sumflg in ['b','d','s','x'] : return
+
+        if path.endswith('.'+self.msg.part_ext) : return
+
+        fsiz  = lstat[stat.ST_SIZE]
+        blksz = self.set_blocksize(self.blocksize,fsiz)
+        if blksz > 0 and blksz < fsiz : return
+
+        if self.path_rejected(path): return
+
+        # checksum remembered by xattr
+
+        xattr = sr_xattr(path)
+        if 'sum' in xattr.x and 'mtime' in xattr.x and \
+           xattr.get('mtime') >= timeflt2str(lstat.st_mtime) : return
+
+        self.sum_pool.prefetch(self.sumalgos[self.sumflg], self.sumflg, path, lstat)
+
     # =============
     # post_file_in_parts
     # =============
@@ -657,6 +736,18 @@ class sr_post(sr_instances):
             #blocks = [8, 3, 1, 2, 9, 6, 0, 7, 4, 5] # Testing
             self.logger.info('Sending partitions in the following order: '+str(blocks))
 
+        # the checksum_threads compute the checksums of all parts at once
+
+        futures = {}
+        if self.sum_pool and not self.sumflg in ['0','n','z'] and self.sumflg[:2] != 'z,' :
+           sumflg = self.sumflg
+           if not sumflg[0] in ['0','b','d','n','s','x','z' ]: sumflg = 'd'
+           self.set_sumalgo(sumflg)
+           for i in blocks :
+               length = chunksize
+               if i == block_count-1 and remainder > 0 : length = remainder
+               futures[i] = self.sum_pool.submit(self.sumalgo, path, i * chunksize, length)
+
         for i in blocks: 
 
               # setting sumalgo for that part
@@ -668,7 +759,7 @@ class sr_post(sr_instances):
 
               else:
                  sumflg = self.sumflg
-                 if not self.sumflg[0] in ['0','d','n','s','z' ]: sumflg = 'd'
+                 if not self.sumflg[0] in ['0','b','d','n','s','x','z' ]: sumflg = 'd'
                  self.set_sumalgo(sumflg)
                  sumalgo = self.sumalgo
                  sumalgo.set_path(path)
@@ -692,20 +783,25 @@ class sr_post(sr_instances):
               # compute checksum if needed
 
               if not self.sumflg in ['0','n','z'] :
-                 bufsize = self.bufsize
-                 if length < bufsize : bufsize = length
-
-                 fp = open(path,'rb')
-                 if offset != 0 : fp.seek(offset,0)
-                 t  = 0
-                 while t<length :
-                       buf = fp.read(bufsize)
-                       if not buf: break
-                       sumalgo.update(buf)
-                       t  += len(buf)
-                 fp.close()
+                 if i in futures :
+                    checksum = futures.pop(i).result()
+
+                 else :
+                    bufsize = self.bufsize
+                    if length < bufsize : bufsize = length
+
+                    fp = open(path,'rb')
+                    if offset != 0 : fp.seek(offset,0)
+                    t  = 0
+                    while t<length :
+                          buf = fp.read(bufsize)
+                          if not buf: break
+                          sumalgo.update(buf)
+                          t  += len(buf)
+                    fp.close()
+
+                    checksum = sumalgo.get_value()
 
-                 checksum = sumalgo.get_value()
                  sumstr   = '%s,%s' % (sumflg,checksum)
 
               # caching
@@ -1039,7 +1135,10 @@ class sr_post(sr_instances):
         # file : must be old enough
 
         lstat = os.stat(src)
-        if self.path_inflight(src,lstat): return later
+        if self.path_inflight(src,lstat):
+           now = nowflt()
+           self.inflight_due[src] = min(lstat.st_mtime,now) + self.inflight
+           return later
 
         # post it
 
@@ -1087,6 +1186,10 @@ class sr_post(sr_instances):
         if not ok:
             return
 
+        # watch_backend inotify : the events read since the last wakeup
+
+        if self.inotify : self.inotify.collect()
+
         # pile up left events to process
 
         self.left_events.update(self.new_events)
@@ -1097,19 +1200,43 @@ class sr_post(sr_instances):
         self.cur_events  = OrderedDict()
         self.cur_events.update(self.left_events)
 
+        now = nowflt()
+
+        # checksums of the files about to be posted computed ahead
+
+        if self.sum_pool and self.create_modify :
+           for key in self.cur_events:
+               event, src, dst = self.cur_events[key]
+               if event in [ 'delete', 'move' ] : continue
+               if self.path_aging(event,src,now) : continue
+               try:
+                   if os.path.islink(src) or not os.path.isfile(src) : continue
+                   lstat = os.stat(src)
+                   if not self.path_inflight(src,lstat) : self.prefetch_sumstr(src,lstat)
+               except OSError: pass
+
         # loop on all events
 
         for key in self.cur_events:
             event, src, dst = self.cur_events[key]
+
+            # too new at the last wakeup, and still not old enough : not even stat'ed
+
+            if self.path_aging(event,src,now) : continue
+
             done = False
             try:
                 done = self.process_event(event, src, dst)
             except OSError as err:
                 self.logger.error("could not process event({}): {}".format(event, err))
                 self.logger.debug("Exception details:", exc_info=True)
-                self.left_events.pop(key)
+                done = True
             if done:
                 self.left_events.pop(key)
+                self.inflight_due.pop(src,None)
+                self.closed_paths.discard(src)
+
+        if self.sum_pool : self.sum_pool.forget()
 
         # heartbeat
         self.heartbeat_check()
@@ -1130,18 +1257,68 @@ class sr_post(sr_instances):
            if sys.platform == 'win32':
                src = src.replace('\\','/')
 
-        # walk src directory, this walk is depth first... there could be a lot of time
-        # between *listdir* run, and when a file is visited, if there are subdirectories before you get there.
-        # hence the existence check after listdir (crashed in flow_tests of > 20,000)
-        for x in os.listdir(src):
-            path = src + '/' + x
-            if os.path.isdir(path):
-               self.walk(path)
+        # walk src directory (sr_walker, os.scandir) : the type and stat of each file come with
+        # the listing. The files are posted directory by directory, as the walk goes, so their
+        # checksums can be computed ahead.  Files may be gone when posted (crashed in flow_tests
+        # of > 20,000).  Directories where all files would be rejected are not walked.
+        # walk_threads : the directories are listed by threads.
+
+        rejected = None
+        if self.masks and not ( self.realpath_filter and not self.realpath_post ) :
+           self.walk_matcher = sr_matcher(self.masks)
+           rejected = self.dir_rejected
+
+        walker = sr_walker(self, self.walk_threads, rejected)
+
+        for d, files in walker.walk(src):
+            self.walk_post(files)
+
+        self.logger.debug("walk %s : %d directories, %d files, %d directories rejected" % \
+                          (src, walker.dirs, walker.files, walker.pruned) )
+
+    # =============
+    # walk_post : the files of a directory walked, as sr_walker gives them
+    # =============
+
+    def walk_post(self, files ):
+
+        if self.sum_pool :
+           for path, lstat, islink in files:
+               try:
+                   if not islink : self.prefetch_sumstr(path,lstat)
+               except OSError: pass
+
+        for path, lstat, islink in files:
+
+            # a regular file : to post_file, as post1file would do after checking it is one
+
+            if islink or not stat.S_ISREG(lstat.st_mode) :
+               self.post1file(path,lstat)
                continue
 
-            # add path created
-            if os.path.exists(path):
-                self.post1file(path,os.stat(path))
+            path = path.replace( '/./', '/' )
+            if os.sep != '/' : path = path.replace( os.sep, '/' )
+
+            try:
+                self.post_file(path,lstat)
+            except FileNotFoundError:
+                self.logger.debug("%s gone since walked" % path )
+
+        if self.sum_pool : self.sum_pool.forget()
+
+    # =============
+    # dir_rejected : all the files under directory path are rejected by accept/reject
+    #                (the walk does not go in it)... called by the walk_threads
+    # =============
+
+    def dir_rejected(self, path):
+
+        relpath = path.replace( '/./', '/' )
+        if self.post_base_dir : relpath = relpath.replace(self.post_base_dir, '')
+
+        prefix = ( self.post_base_url or 'file:/' ) + '/' + relpath + '/'
+
+        return self.walk_matcher.rejects_prefix(prefix, self.accept_unmatch)
 
     # =============
     # original walk_priming
@@ -1205,6 +1382,9 @@ class sr_post(sr_instances):
     def watch_dir(self, sld ):
         self.logger.debug("watch_dir %s" % sld )
 
+        if self.watch_backend == 'inotify' and not self.force_polling :
+           if self.watch_inotify(sld) : return
+
         if self.force_polling :
            self.logger.info("sr_watch polling observer overriding default (slower but more reliable.)")
            self.observer = PollingObserver()
@@ -1225,6 +1405,39 @@ class sr_post(sr_instances):
             self.walk(sld)
 
 
+    # =============
+    # watch_inotify : watch_dir with watch_backend inotify (False : not available)
+    # =============
+
+    def watch_inotify(self, sld ):
+
+        if self.inotify is None :
+           if not sr_inotify.available() :
+              self.logger.warning("sr_watch watch_backend inotify not available on %s, observer used" % sys.platform )
+              return False
+           try :
+                 self.inotify = sr_inotify(self)
+                 self.inotify.start()
+           except :
+                 self.logger.warning("sr_watch inotify failed, observer used")
+                 self.logger.debug('Exception details:', exc_info=True)
+                 self.inotify = None
+                 return False
+           self.logger.info("sr_watch inotify watcher selected (watch_backend inotify).")
+
+        d = sld
+        if os.path.islink(sld) and self.realpath_post :
+           d = os.path.realpath(sld)
+           self.logger.info("sr_watch %s is a link to directory %s" % ( sld, d) )
+
+        self.inotify.watch(d)
+        self.logger.info("sr_watch now active on %s posting to exchange: %s"%(d,self.post_exchange))
+
+        if self.post_on_start:
+            self.walk(d)
+
+        return True
+
     # =============
     # watch_loop
     # =============
@@ -1380,14 +1593,15 @@ class sr_post(sr_instances):
     def run(self):
         self.logger.info("%s run partflg=%s, sum=%s, caching=%s basis=%s" % \
               ( self.program_name, self.partflg, self.sumflg, self.caching, self.cache_basis ))
-        self.logger.info("%s realpath_post=%s follow_links=%s force_polling=%s"  % \
-              ( self.program_name, self.realpath_post, self.follow_symlinks, self.force_polling ) )
+        self.logger.info("%s realpath_post=%s follow_links=%s force_polling=%s watch_backend=%s inflight_close_write=%s"  % \
+              ( self.program_name, self.realpath_post, self.follow_symlinks, self.force_polling, self.watch_backend, \
+                self.inflight_close_write ) )
 
         self.connect()
 
         # caching
         if self.caching :
-           self.cache      = sr_cache(self)
+           self.cache      = new_cache(self)
            self.cache_stat = True
            if self.reset:
               self.cache.close(unlink=True)
@@ -1397,6 +1611,14 @@ class sr_post(sr_instances):
               self.on_heartbeat_list.append(self.on_heartbeat)
               self.heartbeat_cache_installed = True
 
+        # unconfirmed publishing window
+        if self.post_confirm_window > 0 :
+           self.execfile("on_heartbeat",'hb_post_flush')
+
+        # checksums computed by a pool of threads
+        if self.checksum_threads > 0 :
+           self.sum_pool = sr_sumpool(self, self.checksum_threads)
+
         pbd = self.post_base_dir
 
         for plugin in self.on_start_list:
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_reporter.py : python3 aggregated reports (report_aggregate)
+#
+#  With report_back, each file processed is reported (201 Downloaded,
+#  304 Not modified, 499...) :  one report message per file.  When only
+#  the volume and the delays matter, report_aggregate <interval> has the
+#  reports counted instead, and a summary published every interval, as a
+#  v03 message (any v03 report consumer decodes it) :
+#
+#     topic  :  v03.report.summary
+#     body   :  { "pubTime":..., "baseUrl":"report:", "relPath":"/summary/<host>",
+#                 "report":"<max elapsed> 0 <host> <user>",
+#                 "summary" : { "start":..., "end":..., "host":..., "user":...,
+#                 "codes" : { "201" : { "count":..., "bytes":...,
+#                             "elapsed" : { "p50":..., "p90":..., "p99":..., "max":... } } } } }
+#
+#  elapsed is the elapsedTime of the reports (seconds from the message
+#  received to its report).  The report code 0 tells the summary from the
+#  report of a file.  The on_report plugins still see every report.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import json,math
+
+try :
+         from sr_timestamp       import *
+except :
+         from sarra.sr_timestamp import *
+
+# ===================================
+# sr_reporter
+# ===================================
+
+class sr_reporter:
+
+    percentiles = [ ('p50',0.50), ('p90',0.90), ('p99',0.99) ]
+
+    def __init__(self, parent, publisher):
+        parent.logger.debug("sr_reporter __init__")
+
+        self.logger    = parent.logger
+        self.publisher = publisher
+        self.exchange  = parent.report_exchange
+        self.interval  = parent.report_aggregate
+
+        self.host      = None
+        self.user      = None
+
+        # code -> [ count, bytes, [ elapsed ... ] ]
+
+        self.codes     = {}
+        self.start     = nowflt()
+        self.summaries = 0
+
+    # add : the report of msg (report_publish), counted
+
+    def add(self, msg):
+        code = self.codes.get(msg.code)
+        if code is None :
+           code = self.codes[msg.code] = [ 0, 0, [] ]
+
+        code[0] += 1
+        code[1] += msg.length or msg.filesize or 0
+        code[2].append( msg.get_elapse() )
+
+        self.host    = msg.host
+        self.user    = msg.user
+
+        now = nowflt()
+        if now - self.start >= self.interval : self.publish(now)
+
+    # flush : the summary when due (heartbeat), the reports published confirmed
+
+    def flush(self):
+        now = nowflt()
+        if now - self.start >= self.interval : self.publish(now)
+        self.publisher.flush()
+
+    def close(self):
+        self.publish(nowflt())
+        self.publisher.flush()
+
+    # publish : the summary of the reports since start
+
+    def publish(self, now):
+        codes      = self.codes
+        start      = self.start
+        self.codes = {}
+        self.start = now
+
+        if not codes : return
+
+        summary = { 'start' : timeflt2str(start), 'end' : timeflt2str(now),
+                    'host'  : self.host, 'user' : self.user, 'codes' : {} }
+
+        for code in sorted(codes) :
+            count, size, elapsed = codes[code]
+            elapsed.sort()
+            stats = {}
+            for name, q in self.percentiles :
+                stats[name] = elapsed[ max(0, math.ceil(q * count) - 1) ]
+            stats['max'] = elapsed[-1]
+            summary['codes'][str(code)] = { 'count' : count, 'bytes' : size, 'elapsed' : stats }
+
+        # a v03 message : pubTime, baseUrl, relPath and report as consumers decode them
+
+        elapse = max( s['elapsed']['max'] for s in summary['codes'].values() )
+        topic  = 'v03.report.summary'
+        notice = json.dumps( { 'pubTime' : v3timeflt2str(now), 'baseUrl' : 'report:',
+                               'relPath' : '/summary/%s' % self.host,
+                               'report'  : '%g 0 %s %s' % ( elapse, self.host, self.user ),
+                               'summary' : summary } )
+
+        self.publisher.publish(self.exchange, topic, notice, { 'summary' : 'true' } )
+        self.summaries += 1
+
+        self.logger.info("sr_reporter summary of %d reports published (%s)" % \
+                         (sum(c[0] for c in codes.values()), ', '.join('%s:%d' % (c,codes[c][0]) for c in sorted(codes))))
@@ -29,16 +29,40 @@
 #  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
 #
 
-import os,json,sys,time
+import os,json,sqlite3,sys,time,urllib.parse
 from _codecs import decode, encode
 
 try :
          from sr_config          import *
+         from sr_timestamp       import *
          from sr_util            import *
 except :
          from sarra.sr_config    import *
+         from sarra.sr_timestamp import *
          from sarra.sr_util      import *
 
+# retry_backend files (sr_retry) : json lines, one message per line
+#
+#     retry_path          messages to retry, read by get()
+#     retry_path.new      messages that failed for the first time
+#     retry_path.state    retried messages that failed again, or worked (_retry_tag_ done)
+#     retry_path.heart    at heartbeat, state + retry + new are merged into it
+#                         and it becomes the next retry_path
+#     retry_path.count    number of messages to retry, at the last heartbeat
+#                         (read by sr status, kept by both backends)
+#
+# retry_backend indexed (sr_retry_indexed) : one sqlite table (WAL journal)
+#
+#     retry_path.sqlite   one row per message, same json line, unique on its key,
+#                         done messages deleted in place, expired ones by an expiry index
+
+def new_retry(parent):
+    """ return the retry store selected by the retry_backend option
+    """
+    if getattr(parent,'retry_backend','files') == 'files' :
+       return sr_retry(parent)
+    return sr_retry_indexed(parent)
+
 # class sr_retry
 
 class sr_retry:
@@ -50,6 +74,10 @@ class sr_retry:
 
         self.retry_ttl  = self.parent.retry_ttl
 
+        # get() returns only messages due (sr_retry_indexed)
+
+        self.scheduled  = False
+
         # message to work with
 
         self.message    = raw_message(self.logger)
@@ -75,6 +103,9 @@ class sr_retry:
         if os.path.exists(self.parent.retry_path):
             os.unlink(self.parent.retry_path)
 
+        if os.path.exists(self.count_path):
+            os.unlink(self.count_path)
+
         if hasattr(self.parent,'retry_work') : 
             if os.path.exists(self.parent.retry_work):
                 os.unlink(self.parent.retry_work)
@@ -131,8 +162,8 @@ class sr_retry:
            notice  = "%s %s %s" % ( message.pubtime, message.baseurl, message.relpath )
            if 'integrity' in headers.keys():
                # v3 has no sum, must add it here
-               sum_algo_map = { "a":"arbitrary", "d": "md5", "s": "sha512", "n": "md5name", 
-                                "0": "random", "L": "link", "R": "remove", "z": "cod" }
+               sum_algo_map = { "a":"arbitrary", "b": "blake2b", "d": "md5", "s": "sha512", "n": "md5name", 
+                                "0": "random", "L": "link", "R": "remove", "x": "xxh128", "z": "cod" }
                sum_algo_map = {v: k for k, v in sum_algo_map.items()}
                sumstr = sum_algo_map[headers['integrity']['method']]
                if sumstr == '0':
@@ -242,6 +273,13 @@ class sr_retry:
         self.heart_path = self.parent.retry_path + '.heart'
         self.heart_fp   = None
 
+        # number of messages to retry (sr status)
+
+        self.count_path = self.parent.retry_path + '.count'
+
+    def host_worked(self,message):
+        pass
+
     def in_cache(self,message):
         relpath = '/'.join(message.body.split()[1:])
         sumstr  = message.properties['application_headers']['sum']
@@ -484,6 +522,8 @@ class sr_retry:
         try   : os.unlink(self.new_work)
         except: pass
 
+        self.write_count(N)
+
         self.last_body = None
         elapse         = nowflt()-now
         self.logger.info("sr_retry on_heartbeat elapse %f" % elapse)
@@ -503,3 +543,369 @@ class sr_retry:
            new_age = os.stat(self.new_path).st_mtime
            if retry_age > new_age : os.unlink(self.new_path)
 
+    # write_count : the number of messages to retry, for sr status to read
+    #               instead of counting the lines of the retry files.
+
+    def write_count(self,N):
+        tmp = self.count_path + '.tmp'
+        try   :
+                with open(tmp,'w') as fp :
+                     fp.write('%d' % N)
+                os.replace(tmp,self.count_path)
+        except:
+                self.logger.error("sr_retry could not write %s" % self.count_path)
+                self.logger.debug('Exception details: ', exc_info=True)
+
+
+
+# class sr_retry_indexed
+
+class sr_retry_indexed(sr_retry):
+    """ retry store for long outages (retry_backend indexed)
+
+    Every message to retry is a row of an sqlite table (WAL journal), keyed as the
+    heartbeat of sr_retry dedups them (relpath sum parts) :
+
+      - a failure is one INSERT (a message already waiting is left as is),
+      - a retry that worked is deleted in place,
+      - expiry deletes, through an index, only the rows that expired,
+      - get() returns, in order, the rows that are due (next attempt time reached).
+
+    Each row keeps its number of attempts and the time of its next attempt : every
+    time it is returned by get(), its next attempt is pushed back by retry_backoff,
+    doubled at each attempt up to retry_backoff_max.
+
+    Rows are grouped by destination (netloc of the message's baseurl, or of the
+    destination of a sender). After
+    breaker_failures failures in a row for a destination, its rows are suspended
+    (circuit breaker) : their next attempt is pushed back for the host as a whole,
+    then one of them is tried, and a success resumes them all. Retries for the
+    other destinations are not held back by a dead one.
+
+    The files of retry_backend files found at start are imported, then removed.
+    """
+
+    breaker_failures = 5
+    fetch_count      = 100
+
+    def __init__(self, parent ):
+        self.db = None
+        super().__init__(parent)
+
+        self.scheduled         = True
+        self.retry_backoff     = self.parent.retry_backoff
+        self.retry_backoff_max = self.parent.retry_backoff_max
+
+        # per destination : [ failures in a row, suspended until ]
+        # a sender has only one : its destination
+
+        self.hosts   = {}
+        self.sendto  = None
+        if getattr(self.parent,'destination',None) :
+           self.sendto = urllib.parse.urlparse(self.parent.destination).netloc
+
+    def init(self):
+        super().init()
+
+        self.db_path  = self.retry_path + '.sqlite'
+
+        # rows due, fetched from the table : (id, host, attempts, message)
+
+        self.fetched  = []
+
+    def add_msg_to_state_file(self,message,done=False):
+        if done :
+           self.host_worked(message)
+           try:
+              key, expiry, host = self.__row__(self.msgToJSON(message))
+              self.__open__().execute('DELETE FROM retry WHERE key=?', (key,))
+           except:
+              self.logger.error("failed to remove message from retry: %s" % message.body)
+              self.logger.debug('Exception details:', exc_info=True)
+           return
+
+        # failed again : still in the table, its next attempt set by get()
+
+        if message.isRetry :
+           try   : self.__failed__(self.__host__(message),nowflt())
+           except: self.logger.debug('Exception details:', exc_info=True)
+           return
+
+        self.add_msg_to_new_file(message)
+
+    def add_msg_to_new_file(self, message):
+        try:
+           line = self.msgToJSON(message)
+           key, expiry, host = self.__row__(line)
+           now  = nowflt()
+           self.__open__().execute('INSERT OR IGNORE INTO retry (key, expiry, message, host, attempts, due) '
+                                   'VALUES (?,?,?,?,1,?)', (key, expiry, line, host, now + self.backoff(1)))
+           self.__failed__(host,now)
+        except:
+           self.logger.error("failed to serialize message to JSON: %s" % message.body)
+           self.logger.debug('Exception details:', exc_info=True)
+
+    def backoff(self,attempts):
+        # delay before the next attempt, after attempts failed
+        return min( self.retry_backoff * 2 ** min(attempts-1,32), self.retry_backoff_max )
+
+    def cleanup(self):
+        self.close()
+
+        for path in [ self.db_path, self.db_path + '-wal', self.db_path + '-shm' ] :
+            try   : os.unlink(path)
+            except: pass
+
+        super().cleanup()
+
+    def close(self):
+        super().close()
+
+        try   : self.db.close()
+        except: pass
+        self.db      = None
+        self.fetched = []
+
+    def get_retry(self):
+        now = nowflt()
+
+        if not self.fetched :
+           self.fetched = self.__open__().execute('SELECT id, host, attempts, message FROM retry WHERE due <= ? '
+                                                  'ORDER BY due, id LIMIT ?', (now, self.fetch_count)).fetchall()
+           self.fetched.reverse()
+           if not self.fetched : return True,None
+
+        id, host, attempts, line = self.fetched.pop()
+
+        # destination suspended : all its rows were pushed back, or one is tried
+
+        if host in self.hosts :
+           failures, until = self.hosts[host]
+           if failures >= self.breaker_failures :
+              if now < until :
+                 self.__suspend__(host, until, now)
+                 return False,None
+              self.__suspend__(host, now + self.backoff(failures - self.breaker_failures + 1), now)
+              self.logger.info("sr_retry trying destination %s again" % host)
+
+        message = self.msgFromJSON(line)
+        if message == None :
+           self.db.execute('DELETE FROM retry WHERE id=?', (id,))
+           return False,None
+
+        if self.is_expired(message):
+           self.logger.info("expired message skipped %s" % message.body)
+           self.db.execute('DELETE FROM retry WHERE id=?', (id,))
+           return False,None
+
+        # this attempt is counted now : its next attempt, should it fail
+
+        attempts += 1
+        self.db.execute('UPDATE retry SET attempts=?, due=max(due,?) WHERE id=?',
+                        (attempts, now + self.backoff(attempts), id))
+
+        message.isRetry = True
+
+        return True,message
+
+    def host_worked(self,message):
+        if not self.hosts : return
+
+        try   : host = self.__host__(message)
+        except: return
+
+        if host not in self.hosts : return
+
+        failures, until = self.hosts.pop(host)
+        if failures < self.breaker_failures : return
+
+        self.logger.info("sr_retry destination %s resumed" % host)
+
+        # the rows held back by its suspension are due again
+
+        now = nowflt()
+        self.__open__().execute('UPDATE retry SET due=? WHERE host=? AND due > ? AND due <= ?', (now, host, now, until))
+
+    def import_files(self):
+        """ messages of retry_backend files into the table, with the precedence of its heartbeat
+        """
+        done  = set()
+        count = 0
+        paths = [ self.state_work, self.state_path, self.retry_work, self.retry_path,
+                  self.heart_path, self.new_work, self.new_path ]
+
+        for path in paths :
+            if not os.path.isfile(path) : continue
+
+            rows     = []
+            pubtimes = []
+            with open(path,'r') as fp :
+                 for line in fp :
+                     try:
+                        topic, headers, notice, key, pubtime, host = self.__parse__(line)
+                     except:
+                        self.logger.error("corrupted line in retry file: %s " % line)
+                        continue
+                     if key in done : continue
+                     if headers.get('_retry_tag_') == 'done' :
+                        done.add(key)
+                        continue
+                     rows.append( (key, line, host) )
+                     pubtimes.append( pubtime )
+
+            # expiries of the file at once... one at a time when one of them is corrupted
+
+            try :
+                  expiries = self.__expiry__(pubtimes)
+            except:
+                  expiries = []
+                  for row, pubtime in zip(rows, pubtimes) :
+                      try   : expiries.extend( self.__expiry__([pubtime]) )
+                      except:
+                              self.logger.error("corrupted line in retry file: %s " % row[1])
+                              expiries.append(None)
+
+            rows = [ (key, expiry, line, host) for (key, line, host), expiry in zip(rows, expiries) if expiry is not None ]
+
+            # due now, as they would have been at the next heartbeat
+
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                self.db.executemany('INSERT OR IGNORE INTO retry (key, expiry, message, host, attempts, due) '
+                                    'VALUES (?,?,?,?,1,0)', rows)
+            except:
+                self.db.execute('ROLLBACK')
+                raise
+            self.db.execute('COMMIT')
+
+            count += len(rows)
+            os.unlink(path)
+
+        if count > 0 : self.logger.info("sr_retry imported %d messages from retry files" % count)
+
+    def on_heartbeat(self,parent):
+        self.logger.info("sr_retry on_heartbeat")
+
+        now = nowflt()
+
+        try:
+             # the expiry index makes this visit only expired rows
+
+             db = self.__open__()
+             n  = db.execute('DELETE FROM retry WHERE expiry < ?', (now,)).rowcount
+             if n > 0 : self.logger.info("expired messages removed from retry list %d" % n)
+
+             N   = db.execute('SELECT COUNT(*) FROM retry').fetchone()[0]
+             due = db.execute('SELECT COUNT(*) FROM retry WHERE due <= ?', (now,)).fetchone()[0]
+
+             if N == 0 : self.logger.info("No retry in list")
+             else      : self.logger.info("Number of messages in retry list %d (due %d)" % (N,due))
+
+             self.write_count(N)
+
+             for host in sorted(self.hosts) :
+                 failures, until = self.hosts[host]
+                 if failures < self.breaker_failures : continue
+                 self.logger.info("sr_retry destination %s suspended, %d failures, until %s" % \
+                                  (host, failures, timeflt2str(until)))
+
+        except:
+                self.logger.error("sr_retry/on_heartbeat: something went wrong")
+                self.logger.debug('Exception details: ', exc_info=True)
+
+        elapse = nowflt()-now
+        self.logger.info("sr_retry on_heartbeat elapse %f" % elapse)
+
+    def on_start(self,parent):
+        self.logger.info("sr_retry on_start")
+        self.__open__()
+
+    # one more failure for a destination : suspended once breaker_failures are reached
+
+    def __failed__(self,host,now):
+        failures, until = self.hosts.get(host, (0,0))
+        failures += 1
+        self.hosts[host] = [ failures, until ]
+
+        if failures < self.breaker_failures : return
+
+        suspended = until > now
+        self.hosts[host][1] = now + self.backoff(failures - self.breaker_failures + 1)
+
+        # already suspended : its rows are pushed back further when get() meets them
+
+        if suspended : return
+
+        if failures == self.breaker_failures :
+           self.logger.warning("sr_retry destination %s suspended, %d failures in a row" % (host, failures))
+        self.__suspend__(host, self.hosts[host][1], now)
+
+    def __host__(self,message):
+        if self.sendto : return self.sendto
+
+        body = message.body
+        if type(body) == bytes : body = body.decode('utf-8')
+
+        if   body[0] == '{' : baseurl = json.loads(body)['baseUrl']
+        elif body[0] == '[' : baseurl = json.loads(body)[1]
+        else                : baseurl = body.split()[1]
+
+        return urllib.parse.urlparse(baseurl).netloc
+
+    # key (as in_cache : relpath sum parts), expiry and destination of a json line
+
+    def __row__(self,line):
+        topic, headers, notice, key, pubtime, host = self.__parse__(line)
+        return key, self.__expiry__([pubtime])[0], host
+
+    # expiry of messages published at pubtimes (timestamps)
+
+    def __expiry__(self,pubtimes):
+
+        # no expiry : never selected by the expiry index
+        if self.retry_ttl == None or self.retry_ttl <= 0 : return [ float('inf') ] * len(pubtimes)
+
+        ttl = self.retry_ttl/1000
+        return [ t + ttl for t in timestrs2flts(pubtimes) ]
+
+    def __parse__(self,line):
+        topic, headers, notice = json.loads(line)
+        words   = notice.split()
+        relpath = '/'.join(words[1:])
+        partstr = headers.get('parts',relpath)
+        key     = relpath + ' ' + headers['sum'] + ' ' + partstr
+        host    = self.sendto or urllib.parse.urlparse(words[1]).netloc
+
+        return topic, headers, notice, key, words[0], host
+
+    def __open__(self):
+        if self.db is not None : return self.db
+
+        # isolation_level None : autocommit, transactions explicit (import_files)
+        self.db = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        # synchronous NORMAL : with WAL, a crash of the system loses at most the last
+        # transactions, never the table (OFF could leave it corrupted)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS retry ( id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                        'key TEXT UNIQUE, expiry REAL, message TEXT, '
+                        "host TEXT DEFAULT '', attempts INTEGER DEFAULT 1, due REAL DEFAULT 0 )")
+
+        self.db.execute('CREATE INDEX IF NOT EXISTS retry_expiry ON retry (expiry)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS retry_due    ON retry (due)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS retry_host   ON retry (host, due)')
+
+        self.import_files()
+
+        return self.db
+
+    # all rows of a destination wait until its suspension ends
+
+    def __suspend__(self,host,until,now):
+        self.hosts[host][1] = until
+
+        # no backoff : nothing to hold back
+        if until <= now : return
+
+        self.__open__().execute('UPDATE retry SET due=? WHERE host=? AND due < ?', (until, host, until))
+        self.fetched = [ row for row in self.fetched if row[1] != host ]
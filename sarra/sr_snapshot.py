@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Shared Services Canada, 2019
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_snapshot.py : python3 snapshot of what sr read of the configurations,
+#                  states and logs of a node (sr status, sanity, start...)
+#
+#  Each entry is kept with what it was read from (mtimes and sizes of files
+#  and directories...) :  sr checks that with a stat, and reads again
+#  only what changed since the last snapshot.
+#
+#     ~/.cache/sarra/sr_snapshot.json :  { "version" : 1,
+#                                          "section" : { "name" : entry ... } ... }
+#
+#  Entries are json (lists and dicts of strings and numbers).  Those not
+#  looked up or stored by a run are dropped when it saves the snapshot
+#  (configurations removed...).  A snapshot unreadable, or of another
+#  version, is started over.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import json,os,time
+
+# ===================================
+# sr_snapshot
+# ===================================
+
+class sr_snapshot:
+
+    version = 1
+
+    # an entry read from something changed within settle seconds is not kept :
+    # mtimes may be coarse, and a file may still be written (pid files...)
+
+    settle  = 2
+
+    def __init__(self, path):
+        self.path     = path
+        self.sections = {}
+        self.seen     = {}
+        self.changed  = False
+
+        try :
+               with open(path,'r') as f :
+                    snapshot = json.load(f)
+               if snapshot.get('version') == self.version :
+                  self.sections = snapshot['sections']
+        except : pass
+
+    # lookup : the entry of name in section, None if there is none
+
+    def lookup(self, section, name):
+        entry = self.sections.get(section,{}).get(name)
+        if entry is not None :
+           self.seen.setdefault(section,{})[name] = entry
+        return entry
+
+    # store : the entry of name in section, read from something of mtime (seconds)
+
+    def store(self, section, name, entry, mtime=None):
+        if mtime is not None and time.time() - mtime < self.settle :
+           self.seen.setdefault(section,{}).pop(name,None)
+           self.changed = True
+           return
+
+        self.seen.setdefault(section,{})[name] = entry
+        self.changed = True
+
+    # save : the entries looked up or stored, written atomically
+
+    def save(self):
+        if not self.changed and self.seen == self.sections : return
+
+        tmp = '%s.%d' % (self.path, os.getpid())
+        try :
+               with open(tmp,'w') as f :
+                    json.dump( { 'version' : self.version, 'sections' : self.seen }, f )
+               os.replace(tmp, self.path)
+        except OSError :
+               try    : os.unlink(tmp)
+               except : pass
+               return
+
+        self.sections = self.seen
+        self.seen     = {}
+        self.changed  = False
+
+
+# stat : [ mtime_ns, size ] of a path, None if it is not there
+
+def stat(path):
+    try :
+           st = os.stat(path)
+           return [ st.st_mtime_ns, st.st_size ]
+    except OSError :
+           return None
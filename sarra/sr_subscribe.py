@@ -58,7 +58,9 @@ try :
          from sr_http            import *
          from sr_instances       import *
          from sr_message         import *
+         from sr_reporter        import *
          from sr_util            import *
+         from sr_workers         import *
          from sr_xattr           import *
 except : 
          from sarra.sr_cache     import *
@@ -68,7 +70,9 @@ except :
          from sarra.sr_http      import *
          from sarra.sr_instances import *
          from sarra.sr_message   import *
+         from sarra.sr_reporter  import *
          from sarra.sr_util      import *
+         from sarra.sr_workers   import *
          from sarra.sr_xattr     import *
 
 
@@ -169,18 +173,37 @@ class sr_subscribe(sr_instances):
            sys.exit(1)
 
         if self.caching :
-           self.cache      = sr_cache(self)
+           self.cache      = new_cache(self)
            self.cache_stat = True
            if not self.heartbeat_cache_installed :
               self.execfile("on_heartbeat",'hb_cache')
               self.on_heartbeat_list.append(self.on_heartbeat)
               self.heartbeat_cache_installed = True
 
+        # unconfirmed publishing window
+
+        if self.post_confirm_window > 0 :
+           self.execfile("on_heartbeat",'hb_post_flush')
+
+        # reports by batches, or summaries
+
+        if self.reportback and ( self.report_batch > 0 or self.report_aggregate > 0 ) :
+           self.execfile("on_heartbeat",'hb_report_flush')
+
     def close(self):
 
         for plugin in self.on_stop_list:
             if not plugin(self): break
 
+        if hasattr(self, 'worker_pool') and self.worker_pool :
+           self.worker_pool.close()
+           self.worker_pool = None
+
+        if hasattr(self, 'publisher'): self.publisher.flush()
+
+        if hasattr(self, 'reporter') : self.reporter.close()
+        elif hasattr(self, 'report_publisher') : self.report_publisher.flush()
+
         if hasattr(self, 'consumer'): self.consumer.close()
 
         if self.post_broker :
@@ -225,8 +248,12 @@ class sr_subscribe(sr_instances):
            self.msg.report_publisher = self.report_publisher
            self.msg.report_exchange  = self.report_exchange
 
-           self.logger.info("report_back to %s@%s, exchange: %s" % 
-               ( self.broker.username, self.broker.hostname, self.msg.report_exchange ) )
+           if self.report_aggregate > 0 :
+              self.reporter     = sr_reporter(self, self.report_publisher)
+              self.msg.reporter = self.reporter
+
+           self.logger.info("report_back to %s@%s, exchange: %s report_batch=%d report_aggregate=%g" % 
+               ( self.broker.username, self.broker.hostname, self.msg.report_exchange, self.report_batch, self.report_aggregate ) )
 
         else:
            self.logger.info("report_back suppressed")
@@ -273,6 +300,7 @@ class sr_subscribe(sr_instances):
            # publisher
 
            self.publisher = Publisher(self.post_hc)
+           self.publisher.set_confirm_window(self.post_confirm_window)
            self.publisher.build()
            self.msg.publisher = self.publisher
            if self.post_exchange :
@@ -938,8 +966,12 @@ class sr_subscribe(sr_instances):
            return True
 
         #=================================
-        # do all tasks
+        # do all tasks (in a download worker if any)
         #=================================
+
+        if self.worker_pool :
+           return self.worker_pool.submit()
+
         ok = self.__do_tasks__()
 
         return ok
@@ -1709,6 +1741,11 @@ class sr_subscribe(sr_instances):
         if self.retry_mode : 
            self.consumer.retry.on_heartbeat(self)
 
+        # download workers
+
+        if self.download_workers > 0 and not self.save :
+           self.worker_pool = sr_workers(self,self.download_workers)
+
         # processing messages
 
         if self.vip : last = not self.has_vip()
@@ -1721,6 +1758,9 @@ class sr_subscribe(sr_instances):
         while True :
               try  :
 
+                      #  ack messages processed (in order) when running download workers
+                      if self.worker_pool : self.worker_pool.settle()
+
                       #  heartbeat (may be used to check if program is alive if not "has_vip")
                       ok = self.heartbeat_check()
 
@@ -1744,6 +1784,7 @@ class sr_subscribe(sr_instances):
 
                       #  consume message
                       ok, self.msg = self.consumer.consume()
+                      if self.worker_pool : self.worker_pool.receive()
                       if not ok : continue
 
                       #  in save mode
@@ -2046,7 +2087,7 @@ class sr_subscribe(sr_instances):
            self.declare_exchanges()
 
         if self.caching :
-           self.cache = sr_cache(self)
+           self.cache = new_cache(self)
            self.cache.open()
 
         self.close()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_sumpool.py : python3 checksum thread pool (checksum_threads option)
+#
+#  sr_post/sr_watch read and checksum the files they announce before
+#  posting them.  hashlib lets go of the GIL while it hashes, so the
+#  checksums of several parts (post_file_in_parts), or of several files
+#  about to be posted (walk, wakeup), are computed by a pool of threads.
+#
+#  A checksum is computed by its own copy of the registered sumalgo
+#  (sr_checksum API : set_path, update, get_value), so plugin checksums
+#  work as before.  Only the checksums run in the threads : the posting
+#  itself (caching, xattr, plugins, publishing) stays in the main thread
+#  and in the same order.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import collections,concurrent.futures,copy,os,sys
+
+# ===================================
+# sr_sumpool
+# ===================================
+
+class sr_sumpool:
+
+    def __init__(self, parent, count):
+        parent.logger.debug("sr_sumpool __init__ %d" % count)
+
+        self.logger   = parent.logger
+        self.parent   = parent
+        self.count    = count
+        self.bufsize  = parent.bufsize
+
+        # whole file checksums computed ahead : (path,sumflg) -> (size,mtime,future)
+        # no more than window of them at once, the others wait in upcoming
+
+        self.window   = 4 * count
+        self.prefetched = collections.OrderedDict()
+        self.upcoming   = collections.deque()
+
+        # pool threads are named from python 3.6
+        named = { 'thread_name_prefix' : 'checksum' } if sys.version_info >= (3,6) else {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=count, **named)
+
+    def close(self):
+        self.logger.debug("sr_sumpool close")
+
+        self.forget()
+        self.executor.shutdown(wait=True)
+
+    # checksum of length bytes of path from offset (length 0 : to the end)
+    # run by a pool thread, with its own copy of sumalgo
+
+    def checksum(self, sumalgo, path, offset=0, length=0):
+        sumalgo.set_path(path)
+
+        fp = open(path,'rb')
+        try :
+                if offset != 0 : fp.seek(offset,0)
+                t = 0
+                while length == 0 or t < length :
+                      bufsize = self.bufsize
+                      if length != 0 and length - t < bufsize : bufsize = length - t
+                      buf = fp.read(bufsize)
+                      if not buf : break
+                      sumalgo.update(buf)
+                      t += len(buf)
+        finally :
+                fp.close()
+
+        return sumalgo.get_value()
+
+    # forget : drop the checksums prefetched and not used (files not posted after all)
+
+    def forget(self):
+        for key in self.prefetched :
+            size, mtime, future = self.prefetched[key]
+            future.cancel()
+        self.prefetched = collections.OrderedDict()
+        self.upcoming   = collections.deque()
+
+    # prefetch : the whole file checksum of a file about to be posted
+    #            is started as soon as there is room in the window
+
+    def prefetch(self, sumalgo, sumflg, path, lstat):
+        self.upcoming.append( (sumalgo, sumflg, path, lstat) )
+        self.__fill__()
+
+    # result : the prefetched checksum of path, if the file did not change since,
+    #          None otherwise (the caller computes it)
+
+    def result(self, sumflg, path):
+        key = (path,sumflg)
+
+        # files prefetched before this one were not posted : drop them
+
+        if key in self.prefetched :
+           while next(iter(self.prefetched)) != key :
+                 size, mtime, future = self.prefetched.popitem(last=False)[1]
+                 future.cancel()
+           size, mtime, future = self.prefetched.pop(key)
+        else :
+           future = None
+
+        self.__fill__()
+
+        if future == None : return None
+
+        try :
+                lstat = os.stat(path)
+                if lstat.st_size != size or lstat.st_mtime != mtime :
+                   future.cancel()
+                   return None
+                return future.result()
+        except OSError :
+                self.logger.debug("sr_sumpool prefetched checksum of %s failed" % path)
+                self.logger.debug('Exception details: ', exc_info=True)
+                return None
+
+    # submit : start the checksum of a part (or whole file), returns its future
+
+    def submit(self, sumalgo, path, offset=0, length=0):
+        return self.executor.submit(self.checksum, copy.copy(sumalgo), path, offset, length)
+
+    def __fill__(self):
+        while self.upcoming and len(self.prefetched) < self.window :
+              sumalgo, sumflg, path, lstat = self.upcoming.popleft()
+              key = (path,sumflg)
+              if key in self.prefetched : continue
+              self.prefetched[key] = (lstat.st_size, lstat.st_mtime, self.submit(sumalgo, path))
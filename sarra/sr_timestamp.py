@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_timestamp.py : python3 timestamps of the messages (pubtime, mtime, atime...)
+#
+#  v02 : YYYYMMDDHHMMSS.f     v03 : YYYYMMDDTHHMMSS.f     (UTC)
+#
+#     - nowflt is time.time() (it was formatted to a string, then parsed back),
+#     - timestr2flt computes the seconds of the date and time itself, the ones
+#       of the last seconds and days met are cached (messages come in order :
+#       most timestamps are of the same few seconds),
+#     - timeflt2str formats the seconds of the date and time once, the ones of
+#       the last seconds met are cached, only the fraction is formatted.
+#
+#  timestrs2flts : timestr2flt of many timestamps (loading files of messages).
+#
+#  The functions are imported by sr_util, as they were defined there.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import datetime,functools,time
+
+epoch_ordinal = datetime.date(1970,1,1).toordinal()
+
+def nowflt():
+    return time.time()
+
+
+def nowstr():
+    return timeflt2str(time.time())
+
+
+def timeflt2str(f):
+    s = f // 1
+    return __second2str__(int(s)) + __fraction2str__(f - s)
+
+
+def v3timeflt2str(f):
+    s = f // 1
+    return timev2tov3str(__second2str__(int(s))) + __fraction2str__(f - s)
+
+
+def timestr2flt(s):
+    if s[8] == 'T' :
+       fraction = s[15:]
+       seconds  = __str2second__(s[0:15])
+    else :
+       fraction = s[14:]
+       seconds  = __str2second__(s[0:14])
+
+    if fraction : return seconds + float('0' + fraction)
+    return float(seconds)
+
+
+def timestrs2flts(strs):
+    """ timestr2flt of each timestamp of strs (a list of them)
+    """
+    str2second = __str2second__
+    flts       = []
+    append     = flts.append
+
+    for s in strs :
+        n        = 15 if s[8] == 'T' else 14
+        fraction = s[n:]
+        if fraction : append( str2second(s[0:n]) + float('0' + fraction) )
+        else        : append( float(str2second(s[0:n])) )
+
+    return flts
+
+
+def timev2tov3str(s):
+    if s[8] == 'T':
+        return s
+    else:
+        return s[0:8] + 'T' + s[8:]
+
+# the seconds of YYYYMMDDHHMMSS (or YYYYMMDDTHHMMSS) since the epoch
+
+@functools.lru_cache(maxsize=4096)
+def __str2second__(s):
+    o = 1 if s[8] == 'T' else 0
+    if len(s) != 14 + o : raise ValueError("invalid timestamp: %s" % s)
+
+    hour, minute, second = int(s[8+o:10+o]), int(s[10+o:12+o]), int(s[12+o:14+o])
+    if hour > 23 or minute > 59 or second > 59 : raise ValueError("time out of range: %s" % s)
+
+    return __day2second__(s[0:8]) + hour * 3600 + minute * 60 + second
+
+@functools.lru_cache(maxsize=1024)
+def __day2second__(d):
+    day = datetime.date(int(d[0:4]), int(d[4:6]), int(d[6:8]))
+    return (day.toordinal() - epoch_ordinal) * 86400
+
+# YYYYMMDDHHMMSS of the seconds since the epoch
+
+@functools.lru_cache(maxsize=1024)
+def __second2str__(s):
+    day, second    = divmod(s, 86400)
+    hour, second   = divmod(second, 3600)
+    minute, second = divmod(second, 60)
+    return '%s%02d%02d%02d' % (__day2str__(day), hour, minute, second)
+
+@functools.lru_cache(maxsize=1024)
+def __day2str__(day):
+    return datetime.date.fromordinal(day + epoch_ordinal).strftime('%Y%m%d')
+
+# .f of a fraction of second :  up to 9 significant digits, no exponent
+
+def __fraction2str__(f):
+    s = '%.9g' % f
+    if s[0] == '0' : return s[1:]
+
+    # rounded to 1, or an exponent (below 0.0001)
+    if f > 0.5 : return '.999999999'
+    return ('%.9f' % f).rstrip('0').rstrip('.')[1:]
@@ -35,8 +35,8 @@ from hashlib import md5
 from hashlib import sha512
 
 import sys
-import calendar,datetime
-import os,random,signal,stat,sys,time
+import calendar,collections,datetime
+import mmap,os,random,signal,stat,sys,threading,time
 import urllib
 import urllib.parse
 
@@ -57,7 +57,7 @@ class TimeoutException(Exception):
 
 # alarm_cancel
 def alarm_cancel():
-    if sys.platform != 'win32' :
+    if sys.platform != 'win32' and alarm_thread() :
         signal.alarm(0)
 
 # alarm_raise
@@ -66,10 +66,88 @@ def alarm_raise(n, f):
 
 # alarm_set
 def alarm_set(time):
-    if sys.platform != 'win32' :
+    if sys.platform != 'win32' and alarm_thread() :
         signal.signal(signal.SIGALRM, alarm_raise)
         signal.alarm(time)
 
+# alarm_thread : signals are only handled by the main thread,
+# download_workers threads rely on the socket timeouts instead.
+def alarm_thread():
+    return threading.current_thread() is threading.main_thread()
+
+# =========================================
+# zero_copy : copy between two local files without going through python
+# =========================================
+
+# largest copy asked of the kernel at once (alarm rearmed between them)
+
+ZERO_COPY_CHUNK = 64 * 1024 * 1024
+
+# zero_copy
+# copy length bytes (0 = up to the end of src) from the current position of src
+# to the current position of dst with os.copy_file_range (os.sendfile if it is
+# not available or not supported by the filesystems).  Both positions are left
+# after the copied data, as with read/write.  When a sumalgo is given, it is
+# updated from a memory mapped view of the source (memoryview chunks of bufsize).
+#
+# Returns the number of bytes copied, or None when src or dst is not a regular
+# file or the kernel cannot copy it : the caller then copies through buffers.
+
+def zero_copy(src, dst, length=0, sumalgo=None, bufsize=1024*1024, iotime=0):
+
+    if not hasattr(os,'sendfile') : return None
+
+    try :
+            ifd = src.fileno()
+            ofd = dst.fileno()
+            if not stat.S_ISREG(os.fstat(ifd).st_mode) : return None
+            if not stat.S_ISREG(os.fstat(ofd).st_mode) : return None
+            dst.flush()
+            ipos = src.tell()
+            opos = dst.tell()
+    except (AttributeError, OSError, ValueError) :
+            return None
+
+    if length == 0 : length = max(os.fstat(ifd).st_size - ipos, 0)
+
+    use_range = hasattr(os,'copy_file_range')
+    copied    = 0
+
+    while copied < length :
+          count = min(length - copied, ZERO_COPY_CHUNK)
+          if iotime : alarm_set(iotime)
+          try :
+                  if use_range :
+                     n = os.copy_file_range(ifd, ofd, count, ipos + copied, opos + copied)
+                  else :
+                     os.lseek(ofd, opos + copied, os.SEEK_SET)
+                     n = os.sendfile(ofd, ifd, ipos + copied, count)
+          except OSError :
+                  alarm_cancel()
+                  # copy_file_range unsupported (kernel, cross filesystem) : try sendfile
+                  if use_range :
+                     use_range = False
+                     continue
+                  if copied != 0 : raise
+                  src.seek(ipos)
+                  dst.seek(opos)
+                  return None
+          alarm_cancel()
+          # source shorter than announced
+          if n == 0 : break
+          copied += n
+
+    src.seek(ipos + copied)
+    dst.seek(opos + copied)
+
+    if sumalgo and copied > 0 :
+       with mmap.mmap(ifd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view :
+            end = ipos + copied
+            for i in range(ipos, end, bufsize) :
+                with view[i:min(i + bufsize, end)] as chunk : sumalgo.update(chunk)
+
+    return copied
+
 # =========================================
 # raw_message to mimic raw amqplib
 # use for retry and to convert from pika
@@ -227,6 +305,13 @@ class sr_proto():
         self.tbytes   = 0.0
         self.tbegin   = nowflt()
 
+        # local file to local file, data untouched and not throttled : kernel copy
+
+        if not self.parent.on_data_list and not self.kbytes_ps :
+           rw_length = zero_copy( src, dst, length, self.sumalgo, self.bufsize, self.iotime )
+           if rw_length != None : return rw_length
+           rw_length = 0
+
 
         # length = 0, transfer entire remote file to local file
 
@@ -393,15 +478,86 @@ class sr_transport():
         self.proto  = None
         self.scheme = None
 
-    def close(self) :
+        # live protocol sessions by destination (scheme,netloc,user)
+        # least recently used first, with their last time of use
+
+        self.pool   = collections.OrderedDict()
+        self.stats  = {}
+
+    # close the session in use, or all of them (when the transport is closed)
+
+    def close(self, only_current=False) :
         self.logger.debug("%s_transport close" % self.scheme)
 
         try    : self.proto.close()
         except : pass
 
+        for key in list(self.pool.keys()) :
+            proto, last = self.pool[key]
+            if proto is self.proto or not only_current :
+               del self.pool[key]
+               try    : proto.close()
+               except : pass
+
         self.cdir  = None
         self.proto = None
 
+    # hit/miss/evict counters by destination, logged and reset by hb_transport
+
+    def count(self, key, what ):
+        if not key in self.stats : self.stats[key] = { 'hit':0, 'miss':0, 'evict':0 }
+        self.stats[key][what] += 1
+
+    # get a connected protocol session for parent.destination,
+    # reusing the pooled one when it is still alive
+
+    def connect(self, parent) :
+
+        now  = nowflt()
+        key  = self.pool_key(parent.destination)
+
+        # sessions left idle too long are closed
+
+        for k in list(self.pool.keys()) :
+            proto, last = self.pool[k]
+            if k != key and now - last > parent.transport_idle :
+               self.logger.debug("%s_transport closing idle session %s" % (self.scheme,self.pool_str(k)))
+               del self.pool[k]
+               self.count(k,'evict')
+               try    : proto.close()
+               except : pass
+
+        proto = None
+        if key in self.pool :
+           proto, last = self.pool.pop(key)
+           if now - last > parent.transport_idle or not proto.check_is_connected() :
+              try    : proto.close()
+              except : pass
+              proto = None
+
+        if proto :
+           self.count(key,'hit')
+        else :
+           self.count(key,'miss')
+           self.logger.debug("%s_transport connects to %s" % (self.scheme,self.pool_str(key)))
+           proto = self.pclass(parent)
+           if not proto.connect() : return None
+           self.cdir = None
+
+        self.pool[key] = [ proto, now ]
+
+        # too many sessions : close the least recently used
+
+        while len(self.pool) > max(parent.transport_pool,1) :
+              k, (oldest, last) = self.pool.popitem(last=False)
+              self.logger.debug("%s_transport evicting session %s" % (self.scheme,self.pool_str(k)))
+              self.count(k,'evict')
+              try    : oldest.close()
+              except : pass
+
+        self.proto = proto
+        return proto
+
     # generalized download...
     def download( self, parent ):
         self.logger = parent.logger
@@ -427,13 +583,8 @@ class sr_transport():
         try :
                 parent.destination = msg.baseurl
 
-                proto = self.proto
-                if not proto or not proto.check_is_connected() :
-                   self.logger.debug("%s_transport download connects" % self.scheme)
-                   proto = self.pclass(parent)
-                   ok = proto.connect()
-                   if not ok : return False
-                   self.proto = proto
+                proto = self.connect(parent)
+                if not proto : return False
 
                 #=================================
                 # if parts, check that the protol supports it
@@ -518,7 +669,7 @@ class sr_transport():
 
         except:
                 #closing on problem
-                try    : self.close()
+                try    : self.close(only_current=True)
                 except : pass
     
                 msg.logger.error("Download failed 3 %s" % urlstr)
@@ -547,7 +698,32 @@ class sr_transport():
               raise Exception('Not ok')
            else:
               self.logger.debug("sr_util/get ok is None executing this do_get %s" % do_get)
-        self.proto.get(remote_file, local_file, remote_offset, local_offset, length)
+
+        # download_workers : the other workers can work while this one transfers,
+        # (on_data plugins excepted) so the local file cannot depend on the working directory
+
+        pool = None
+        if hasattr(self.parent,'worker_pool') and not self.parent.on_data_list :
+           pool = self.parent.worker_pool
+
+        if not pool :
+           self.proto.get(remote_file, local_file, remote_offset, local_offset, length)
+           return
+
+        cwd = pool.release()
+        try    : self.proto.get(remote_file, os.path.join(cwd or '', local_file), remote_offset, local_offset, length)
+        finally: pool.acquire(cwd)
+
+    # pool key of a destination : scheme, host[:port], user
+
+    def pool_key(self, destination ):
+        url = urllib.parse.urlparse(destination)
+        return ( url.scheme, url.netloc.split('@')[-1], url.username )
+
+    def pool_str(self, key ):
+        scheme, netloc, user = key
+        if user : return "%s://%s@%s" % (scheme,user,netloc)
+        return "%s://%s" % (scheme,netloc)
 
     # generalized put...
     def put(self, local_file, remote_file, local_offset=0, remote_offset=0, length=0 ):
@@ -591,14 +767,8 @@ class sr_transport():
 
         try :
 
-                proto = self.proto
-                if proto == None or not proto.check_is_connected() :
-                   self.logger.debug("%s_transport send connects" % self.scheme)
-                   proto = self.pclass(parent)
-                   ok = proto.connect()
-                   if not ok : return False
-                   self.proto = proto
-                   self.cdir = None
+                proto = self.connect(parent)
+                if not proto : return False
 
                 #=================================
                 # if parts, check that the protol supports it
@@ -725,7 +895,7 @@ class sr_transport():
                    except: pass
 
                 #closing on problem
-                try    : self.close()
+                try    : self.close(only_current=True)
                 except : pass
 
                 msg.logger.error("Delivery failed %s" % msg.new_dir+'/'+msg.new_file)
@@ -906,37 +1076,12 @@ def startup_args(sys_argv):
   caveat:
    - FIXME: this encoding will break in the year 10000 (assumes four digit year) and requires leading zeroes prior to 1000.
      one will have to add detection of the decimal point, and change the offsets at that point.
-    
-"""
-
-def nowflt():
-    return timestr2flt(nowstr())
-
-
-def nowstr():
-    return timeflt2str(time.time())
-
-
-def timeflt2str(f):
-    nsec = "{:.9g}".format(f % 1)[1:]
-    return "{}{}".format(time.strftime("%Y%m%d%H%M%S", time.gmtime(f)), nsec)
-
-
-def v3timeflt2str(f):
-    nsec = "{:.9g}".format(f % 1)[1:]
-    return "{}{}".format(time.strftime("%Y%m%dT%H%M%S", time.gmtime(f)), nsec)
-
-
-def timestr2flt(s):
-    if s[8] == "T":
-        s = s.replace('T', '')
-    dt_tuple = int(s[0:4]), int(s[4:6]), int(s[6:8]), int(s[8:10]), int(s[10:12]), int(s[12:14])
-    t = datetime.datetime(*dt_tuple, tzinfo=datetime.timezone.utc)
-    return calendar.timegm(t.timetuple()) + float('0' + s[14:])
 
+  the routines are in sr_timestamp (nowflt, nowstr, timeflt2str, v3timeflt2str, timestr2flt,
+  timestrs2flts, timev2tov3str), imported here.
+"""
 
-def timev2tov3str(s):
-    if s[8] == 'T':
-        return s
-    else:
-        return s[0:8] + 'T' + s[8:]
+try:
+   from sr_timestamp import *
+except:
+   from sarra.sr_timestamp import *
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_walker.py : python3 tree walk of sr_post/sr_watch (walk, post_on_start)
+#
+#  The files of a tree are listed with os.scandir :  whether an entry is a
+#  directory or a link comes with the listing, and its stat is done once,
+#  instead of listdir, then isdir, exists and stat for each file.
+#
+#  The files are given by directory (walk yields each directory with its
+#  files) :  sr_post posts them, in order, as the walk goes on.
+#
+#     - count 0 :  the directories are listed one after the other, depth first,
+#       the files of a directory before its subdirectories (as before),
+#     - count N :  N threads list the directories, the files of each directory
+#       are given as soon as it is listed (in no particular order), but no more
+#       than window directories ahead of the posting.
+#
+#  rejected(path) tells when no file under directory path can be accepted :
+#  that directory is not walked (see sr_matcher rejects_prefix).  With threads,
+#  it is called by them.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import os,queue,sys,threading
+
+# ===================================
+# sr_walker
+# ===================================
+
+class sr_walker:
+
+    def __init__(self, parent, count, rejected=None):
+        parent.logger.debug("sr_walker __init__ %d" % count)
+
+        self.logger   = parent.logger
+        self.count    = count
+        self.rejected = rejected
+        self.realpath = getattr(parent,'realpath_post',False)
+        self.window   = 4 * max(count,1)
+        self.running  = False
+
+        self.lock     = threading.Lock()
+        self.dirs     = 0
+        self.files    = 0
+        self.pruned   = 0
+
+    # walk : ( directory, [ (path, lstat, islink) ... ] ) for each directory of the tree src
+    #        lstat is os.stat of the path (of what a link points to)
+
+    def walk(self, src):
+        if self.count > 0 : return self.__walk_threads__(src)
+        return self.__walk__(src)
+
+    # scan : the files and the subdirectories of directory d
+
+    def scan(self, d):
+        files   = []
+        subdirs = []
+        pruned  = 0
+
+        try :
+              entries = os.scandir(d)
+        except OSError as err :
+              self.logger.warning("sr_walker could not list %s: %s" % (d, err))
+              return files, subdirs
+
+        # scandir iterators are not context managers before python 3.6
+
+        try :
+              for entry in entries :
+                  path = d + '/' + entry.name
+                  try :
+                        # a link to a directory is walked, as os.path.isdir would
+                        # (where it points to, with realpath_post)
+                        if entry.is_dir() :
+                           if self.realpath and entry.is_symlink() :
+                              path = os.path.realpath(path)
+                              if sys.platform == 'win32' : path = path.replace('\\','/')
+                           if self.rejected and self.rejected(path) :
+                              pruned += 1
+                           else :
+                              subdirs.append(path)
+                           continue
+                        islink = entry.is_symlink()
+                        lstat  = entry.stat()
+                  # gone since listed, or link to nothing
+                  except OSError : continue
+                  files.append( (path, lstat, islink) )
+        finally :
+              if hasattr(entries,'close') : entries.close()
+
+        with self.lock :
+             self.dirs   += 1
+             self.files  += len(files)
+             self.pruned += pruned
+
+        return files, subdirs
+
+    # one directory after the other
+
+    def __walk__(self, src):
+        stack = [ src ]
+        while stack :
+              d = stack.pop()
+              files, subdirs = self.scan(d)
+              yield d, files
+              stack.extend(reversed(subdirs))
+
+    # directories listed by threads
+
+    def __walk_threads__(self, src):
+        self.running = True
+        self.work    = queue.Queue()
+        self.results = queue.Queue(self.window)
+        self.pending = 1
+        self.work.put(src)
+
+        threads = []
+        for i in range(self.count) :
+            thread = threading.Thread(target=self.__work__, name="walk_%d" % (i+1))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        try :
+              while True :
+                    result = self.results.get()
+                    if result is None : break
+                    yield result
+        finally :
+              # done, or the walk was given up : the threads are stopped
+              self.running = False
+              for thread in threads : self.work.put(None)
+              while any( thread.is_alive() for thread in threads ) :
+                    try    : self.results.get(timeout=0.1)
+                    except queue.Empty : pass
+
+    def __work__(self):
+        while True :
+              d = self.work.get()
+              if d is None : return
+              if not self.running : continue
+
+              try   :
+                      files, subdirs = self.scan(d)
+              except:
+                      self.logger.error("sr_walker could not walk %s" % d)
+                      self.logger.debug('Exception details: ', exc_info=True)
+                      files, subdirs = [], []
+
+              with self.lock : self.pending += len(subdirs)
+              for s in subdirs : self.work.put(s)
+
+              self.results.put( (d, files) )
+
+              with self.lock :
+                   self.pending -= 1
+                   done = self.pending == 0
+              if done : self.results.put(None)
@@ -56,9 +56,9 @@ class sr_winnow(sr_subscribe):
            self.post_exchange = 'xs_%s' % self.post_broker.username + self.post_exchange_suffix
 
         # we cannot have more than one instance since we 
-        # need to work with a single cache.
+        # need to work with a single cache... unless all instances share it.
 
-        if ( self.nbr_instances > 1 ) and not self.exchange_split :
+        if ( self.nbr_instances > 1 ) and not self.exchange_split and self.cache_backend != 'shared' :
             self.logger.debug("instance > 1, forcing exchange_split on, modifying exchange setting.")
             self.exchange_split = True
 
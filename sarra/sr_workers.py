@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Questions or bugs report: dps-client@ec.gc.ca
+# sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# sr_workers.py : python3 download worker pool (download_workers option)
+#
+#  The instance keeps one thread consuming messages (the main thread).
+#  Once a message is accepted (on_message, duplicate suppression...) its
+#  tasks (doit_download...) are handed to a pool of worker threads.
+#
+#  Every worker works on its own copy of the instance (and so keeps its
+#  own protocol connections: http_link, ftp_link, sftp_link) and on its
+#  own copy of the message.
+#
+#  The code of the instance, its plugins, its publishers and the broker
+#  connection it shares with the consumer were never meant to be run
+#  by several threads at once... So one lock is held by whoever works
+#  on the instance and it is let go only while waiting : by the workers
+#  while a file is transferred (sr_transport.get), by the main thread
+#  while it waits for room in the queue or for new messages.
+#  Since the working directory also belongs to the whole process, it is
+#  put back as it was each time the lock is taken again.
+#
+#  Broker messages are acked by the main thread, in the order they were
+#  received, once their processing is over.  The msg_worked/msg_to_retry
+#  asked for by a worker are applied to the retry list at the same time.
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+#
+
+import collections,copy,os,queue,threading
+
+# class sr_job : one message, from its reception to its ack
+
+class sr_job:
+
+    def __init__(self, raw_msg ):
+        self.raw_msg = raw_msg
+        self.msg     = None
+        self.done    = True
+        self.outcome = None
+
+    # a job stands for parent.consumer in the worker processing it
+
+    def msg_to_retry(self):
+        self.outcome = 'retry'
+
+    def msg_worked(self):
+        self.outcome = 'worked'
+
+# class sr_workers
+
+class sr_workers:
+
+    def __init__(self, parent, count ):
+        parent.logger.debug("sr_workers __init__ %d" % count)
+
+        self.logger  = parent.logger
+        self.parent  = parent
+        self.count   = count
+
+        # at most count messages waiting for a worker, and no more than
+        # window messages received but not acked yet
+
+        self.queue   = queue.Queue(count)
+        self.jobs    = collections.deque()
+        self.window  = 4 * count
+        self.current = None
+        self.running = True
+
+        # the main thread holds the lock, except when it waits
+
+        self.lock    = threading.RLock()
+        self.cond    = threading.Condition(self.lock)
+        self.lock.acquire()
+
+        consumer = parent.consumer
+        consumer.ack_deferred = True
+        consumer.sleeper      = self.wait
+
+        self.threads = []
+        for i in range(count) :
+            thread = threading.Thread(target=self.work, args=(self.new_worker(),), name="download_worker_%d" % (i+1) )
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+        self.logger.info("sr_workers %d download workers started" % count)
+
+    def acquire(self, cwd ):
+        self.lock.acquire()
+        if cwd is None : return
+        try   : os.chdir(cwd)
+        except: pass
+
+    def close(self):
+        self.logger.debug("sr_workers close")
+
+        self.running = False
+
+        # messages not processed yet are not acked... the broker will send them again
+
+        while True :
+              try   : self.queue.get_nowait()
+              except queue.Empty : break
+
+        for thread in self.threads :
+            try   : self.queue.put_nowait(None)
+            except queue.Full : break
+
+        pending = len([ job for job in self.jobs if not job.done ])
+        if pending : self.logger.info("sr_workers closing with %d downloads in progress" % pending)
+
+        self.jobs.clear()
+        self.current = None
+
+        try   : self.lock.release()
+        except RuntimeError : pass
+
+    def new_worker(self):
+
+        worker = copy.copy(self.parent)
+
+        # its own protocol connections... created on first use
+
+        for link in [ 'ftp_link', 'http_link', 'sftp_link' ] :
+            if link in worker.__dict__ : del worker.__dict__[link]
+
+        # its own checksum objects (they hold the running checksum)
+
+        worker.sumalgos = {}
+        for name in self.parent.sumalgos :
+            worker.sumalgos[name] = copy.copy(self.parent.sumalgos[name])
+        worker.lastflg  = None
+
+        # tasks bound to the instance are bound to the worker
+
+        worker.do_task_list = []
+        for task in self.parent.do_task_list :
+            if getattr(task,'__self__',None) is self.parent :
+               task = getattr(worker,task.__name__)
+            worker.do_task_list.append(task)
+
+        return worker
+
+    def receive(self):
+
+        # every message consumed gets a job... in order... for its ack
+
+        self.current = None
+
+        raw_msg = self.parent.consumer.raw_msg
+        if raw_msg is None : return
+
+        # sr_retry reuses its message for every retry it gets : the job keeps a copy
+
+        if raw_msg.isRetry :
+           raw_msg               = copy.copy(raw_msg)
+           raw_msg.delivery_info = raw_msg.delivery_info.copy()
+           raw_msg.properties    = raw_msg.properties.copy()
+
+        self.current = sr_job(raw_msg)
+        self.jobs.append(self.current)
+
+    def release(self):
+        try   : cwd = os.getcwd()
+        except: cwd = None
+        self.lock.release()
+        return cwd
+
+    def run_job(self, worker, job ):
+
+        msg        = job.msg
+        msg.parent = worker
+        for name in self.parent.sumalgos :
+            if msg.sumalgo is self.parent.sumalgos[name] :
+               msg.sumalgo = worker.sumalgos[name]
+
+        worker.msg      = msg
+        worker.sumalgo  = msg.sumalgo
+        worker.lastflg  = None
+        worker.consumer = job
+
+        try :
+                worker.__do_tasks__()
+        except :
+                self.logger.error("sr_workers could not process %s" % msg.notice)
+                self.logger.debug('Exception details: ', exc_info=True)
+                if worker.retry_mode : job.msg_to_retry()
+
+    def settle(self):
+
+        consumer = self.parent.consumer
+
+        while self.jobs :
+              job = self.jobs[0]
+
+              # too many messages unacked : wait for the oldest one
+
+              if not job.done :
+                 if len(self.jobs) < self.window : break
+                 self.wait(1)
+                 continue
+
+              self.jobs.popleft()
+
+              if job.outcome :
+                 raw_msg          = consumer.raw_msg
+                 consumer.raw_msg = job.raw_msg
+                 if job.outcome == 'worked' : consumer.msg_worked()
+                 else                       : consumer.msg_to_retry()
+                 consumer.raw_msg = raw_msg
+
+              if job.raw_msg is not None and not job.raw_msg.isRetry :
+                 consumer.ack(job.raw_msg)
+
+    def submit(self):
+
+        job = self.current
+        if job is None :
+           job = sr_job(None)
+           self.jobs.append(job)
+        self.current = None
+
+        # the worker gets a copy of the message : the main thread reuses it for the next one
+
+        job.msg         = copy.copy(self.parent.msg)
+        job.msg.headers = job.msg.headers.copy()
+        job.done        = False
+
+        while True :
+              try   :
+                      self.queue.put_nowait(job)
+                      break
+              except queue.Full :
+                      self.wait(1)
+
+        return True
+
+    def wait(self, timeout ):
+
+        # wait (lock released) until a worker starts or ends a job
+
+        try   : cwd = os.getcwd()
+        except: cwd = None
+
+        self.cond.wait(timeout)
+
+        if cwd is None : return
+        try   : os.chdir(cwd)
+        except: pass
+
+    def work(self, worker ):
+
+        while self.running :
+              job = self.queue.get()
+              if job is None : break
+
+              with self.cond :
+                   self.cond.notify_all()
+                   if self.running : self.run_job(worker,job)
+                   job.done = True
+                   self.cond.notify_all()
+
+        for link in [ 'ftp_link', 'http_link', 'sftp_link' ] :
+            if hasattr(worker,link) :
+               try   : getattr(worker,link).close()
+               except: pass
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+try :
+         from sr_checksum       import *
+except :
+         from sarra.sr_checksum import *
+
+# ===================================
+# checksum_b class
+# ===================================
+
+class checksum_b(sr_checksum):
+      """
+      The BLAKE2b algorithm (IETF RFC 7693, 512 bits) to checksum the entire file, which is called 'b'.
+      A cryptographic hash as strong as SHA512, from the python standard library (python >= 3.6).
+      """
+
+      def __init__(self):
+          super().__init__()
+          # the sum file is run by sr_config.execfile : its imports are not seen by the methods
+          try :
+                   from hashlib import blake2b
+                   self.new_hash = blake2b
+          except :
+                   self.new_hash = None
+
+      def available(self):
+          return self.new_hash != None
+
+      def get_value(self):
+          return self.filehash.hexdigest()
+
+      def registered_as(self):
+          return 'b'
+
+      def set_path(self,path):
+          self.filehash = self.new_hash()
+
+      def update(self,chunk):
+          if type(chunk) == str : chunk = bytes(chunk,'utf-8')
+          self.filehash.update(chunk)
+
+self.add_sumalgo=checksum_b()
@@ -26,8 +26,8 @@ class checksum_s(sr_checksum):
           self.filehash = sha512()
 
       def update(self,chunk):
-          if type(chunk) == bytes : self.filehash.update(chunk)
-          else                    : self.filehash.update(bytes(chunk,'utf-8'))
+          if type(chunk) == str : chunk = bytes(chunk,'utf-8')
+          self.filehash.update(chunk)
 
 self.add_sumalgo=checksum_s()
 
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+try :
+         from sr_checksum       import *
+except :
+         from sarra.sr_checksum import *
+
+# ===================================
+# checksum_x class
+# ===================================
+
+class checksum_x(sr_checksum):
+      """
+      The XXH3 128 bits (xxh128) non-cryptographic hash of the entire file, which is called 'x'.
+      Many times faster than MD5: it detects changes and corruption, but is not meant
+      to authenticate data.  Needs the python xxhash module.
+      """
+
+      def __init__(self):
+          super().__init__()
+          # the sum file is run by sr_config.execfile : its imports are not seen by the methods
+          try :
+                   import xxhash
+                   self.new_hash = xxhash.xxh3_128
+          except :
+                   self.new_hash = None
+
+      def available(self):
+          return self.new_hash != None
+
+      def get_value(self):
+          return self.filehash.hexdigest()
+
+      def registered_as(self):
+          return 'x'
+
+      def set_path(self,path):
+          self.filehash = self.new_hash()
+
+      def update(self,chunk):
+          if type(chunk) == str : chunk = bytes(chunk,'utf-8')
+          self.filehash.update(chunk)
+
+self.add_sumalgo=checksum_x()
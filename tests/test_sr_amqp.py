@@ -14,6 +14,7 @@ import re
 import json
 import logging
 import os
+import socket
 import unittest
 import urllib.parse
 
@@ -28,6 +29,7 @@ except ImportError:
     pass
 from amqp import AMQPError, RecoverableConnectionError, ResourceError, PreconditionFailed
 from sarra.sr_amqp import HostConnect, Publisher, Consumer, Queue
+from sarra.sr_consumer import sr_consumer
 
 
 class SrAmqpBaseCase(unittest.TestCase):
@@ -429,6 +431,34 @@ class ConsumerCase(HostConnectBaseCase):
         self.assertEqual(expected, chan.mock_calls, self.amqp_channel_assert_msg)
         self.assertNoErrorInLog()
 
+    @patch('sarra.sr_util.raw_message')
+    def test_ack__multiple(self, msg, hc, chan):
+        # Prepare test
+        msg.delivery_tag = 5
+        self.consumer.channel = chan
+        # Execute test
+        self.consumer.ack(msg, multiple=True)
+        # Evaluate results
+        expected = [call.basic_ack(msg.delivery_tag, multiple=True)]
+        self.assertEqual(expected, chan.mock_calls, self.amqp_channel_assert_msg)
+        self.assertNoErrorInLog()
+
+    @patch('sarra.sr_util.raw_message')
+    def test_ack_batch__channel_rebuilt(self, msg, hc, chan):
+        # Prepare test
+        hc.new_channel.return_value = chan
+        self.consumer.hc = hc
+        self.consumer.build()
+        msg.delivery_tag = 5
+        msg.builds = self.consumer.builds
+        self.consumer.build()
+        chan.reset_mock()
+        # Execute test
+        self.consumer.ack_batch(msg)
+        # Evaluate results
+        self.assertEqual([], chan.mock_calls, self.amqp_channel_assert_msg)
+        self.assertNoErrorInLog()
+
     def test_add_prefetch(self, hc, chan):
         # Prepare test
         new_prefetch = 10
@@ -474,6 +504,41 @@ class ConsumerCase(HostConnectBaseCase):
         # Evaluate results
         self.assertEqual(msg, msg_returned)
 
+    def test_consume_batch(self, hc, chan):
+        # Prepare test
+        hc.use_pika = False
+        hc.new_channel.return_value = chan
+        self.consumer.hc = hc
+        self.consumer.prefetch = 3
+        self.consumer.build()
+        msgs = [Mock(delivery_tag=i + 1) for i in range(4)]
+
+        def basic_consume(queue, no_ack, callback):
+            self.callback = callback
+            return 'ctag'
+
+        def drain_events(timeout):
+            if msgs:
+                self.callback(msgs.pop(0))
+            else:
+                raise socket.timeout()
+
+        chan.basic_consume.side_effect = basic_consume
+        hc.connection.drain_events.side_effect = drain_events
+        # Execute test
+        first = self.consumer.consume_batch(self.qname)
+        second = self.consumer.consume_batch(self.qname)
+        third = self.consumer.consume_batch(self.qname)
+        # Evaluate results
+        self.assertEqual([1, 2, 3], [m.delivery_tag for m in first])
+        self.assertEqual([4], [m.delivery_tag for m in second])
+        self.assertEqual([], third)
+        self.assertEqual(1, chan.basic_consume.call_count)
+        self.assertFalse(first[0].isRetry)
+        self.consumer.ack_batch(first[-1])
+        chan.basic_ack.assert_called_once_with(3, multiple=True)
+        self.assertNoErrorInLog()
+
     @patch('sarra.sr_util.raw_message')
     def test_consume__IrrecoverabeChannelError(self, msg, hc, chan):
         """ If a wrong delivery tag is provided, the next basic get will fail with PRECONDITION_FAILED error
@@ -561,6 +626,190 @@ class PublisherCase(HostConnectBaseCase):
         self.assertTrue(ok)
         self.assertNoErrorInLog()
 
+    def test_publish__confirm_window(self, hc, chan):
+        # Prepare test
+        hc.use_pika = False
+        hc.use_amqp = True
+        hc.new_channel.return_value = chan
+        chan.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.pub.hc = hc
+        self.pub.set_confirm_window(3)
+        self.pub.build()
+
+        def drain_events(timeout):
+            for on_ack in chan.events['basic_ack']:
+                on_ack(2, True)
+
+        hc.connection.drain_events.side_effect = drain_events
+        # Execute test
+        for i in range(3):
+            ok = self.pub.publish(self.xname, self.pubkey, 'msg %d' % i, {'i': i})
+            self.assertTrue(ok)
+        # Evaluate results
+        self.assertEqual(3, chan.basic_publish.call_count)
+        chan.confirm_select.assert_called_once_with()
+        chan.tx_commit.assert_not_called()
+        self.assertEqual([3], list(self.pub.unconfirmed.keys()))
+        self.assertNoErrorInLog()
+
+    def test_publish__confirm_window_replay(self, hc, chan):
+        # Prepare test
+        hc.use_pika = False
+        hc.use_amqp = True
+        hc.new_channel.return_value = chan
+        chan.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.pub.hc = hc
+        self.pub.set_confirm_window(10)
+        self.pub.build()
+        for i in range(2):
+            self.pub.publish(self.xname, self.pubkey, 'msg %d' % i, None)
+        chan.reset_mock()
+        # Execute test
+        self.pub.build()
+        # Evaluate results
+        self.assertEqual(2, chan.basic_publish.call_count)
+        self.assertEqual([1, 2], list(self.pub.unconfirmed.keys()))
+        self.assertEqual('msg 1', self.pub.unconfirmed[2][1][2])
+
+    def test_publish__confirm_window_nack(self, hc, chan):
+        # Prepare test
+        hc.use_pika = False
+        hc.use_amqp = True
+        hc.new_channel.return_value = chan
+        chan.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.pub.hc = hc
+        self.pub.set_confirm_window(10)
+        self.pub.build()
+        self.pub.publish(self.xname, self.pubkey, 'refused', None)
+        answers = [('basic_nack', 1), ('basic_ack', 2)]
+
+        def drain_events(timeout):
+            event, tag = answers.pop(0)
+            for callback in chan.events[event]:
+                callback(tag, False)
+
+        hc.connection.drain_events.side_effect = drain_events
+        # Execute test
+        ok = self.pub.flush()
+        # Evaluate results
+        self.assertTrue(ok)
+        self.assertEqual(2, chan.basic_publish.call_count)
+        self.assertEqual(0, len(self.pub.unconfirmed))
+
+    def windowed(self, hc, chan, window):
+        hc.use_pika = False
+        hc.use_amqp = True
+        hc.new_channel.return_value = chan
+        chan.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.pub.hc = hc
+        self.pub.set_confirm_window(window)
+        self.pub.build()
+
+        def confirm(tag):
+            def drain_events(timeout):
+                for on_ack in chan.events['basic_ack']:
+                    on_ack(tag, True)
+            hc.connection.drain_events.side_effect = drain_events
+
+        return confirm
+
+    def test_after_confirms(self, hc, chan):
+        # Prepare test
+        confirm = self.windowed(hc, chan, 10)
+        ack = Mock()
+        self.pub.after_confirms(ack.nothing_posted)
+        self.pub.publish(self.xname, self.pubkey, 'post of message 1', None)
+        self.pub.after_confirms(ack.message_1)
+        self.pub.publish(self.xname, self.pubkey, 'post of message 2', None)
+        self.pub.after_confirms(ack.message_2)
+        # Execute test & Evaluate results : no ack while a post made before it is unconfirmed
+        self.assertEqual([call.nothing_posted()], ack.mock_calls)
+        confirm(1)
+        self.pub.settle(1)
+        self.assertEqual([call.nothing_posted(), call.message_1()], ack.mock_calls)
+        confirm(2)
+        self.pub.flush()
+        self.assertEqual([call.nothing_posted(), call.message_1(), call.message_2()], ack.mock_calls)
+        self.assertEqual(0, len(self.pub.acks))
+
+    def test_after_confirms__replayed(self, hc, chan):
+        # Prepare test : the post is published again on a new channel, with another sequence number
+        confirm = self.windowed(hc, chan, 10)
+        ack = Mock()
+        self.pub.publish(self.xname, self.pubkey, 'confirmed post', None)
+        confirm(1)
+        self.pub.flush()
+        self.pub.publish(self.xname, self.pubkey, 'post', None)
+        self.pub.after_confirms(ack)
+        self.pub.build()
+        self.assertEqual([1], list(self.pub.unconfirmed.keys()))
+        ack.assert_not_called()
+        # Execute test
+        self.pub.flush()
+        # Evaluate results
+        ack.assert_called_once_with()
+
+    def test_consumer_ack__post_unconfirmed(self, hc, chan):
+        # Prepare test : a consumer posting what it consumes with a confirm window
+        confirm = self.windowed(hc, chan, 10)
+        consumer = sr_consumer.__new__(sr_consumer)
+        consumer.logger = self.pub.logger
+        consumer.parent = Mock(publisher=self.pub)
+        consumer.consumer = Mock(builds=1)
+        consumer.batch_consume = False
+        raw_msg = Mock()
+        self.pub.publish(self.xname, self.pubkey, 'post of raw_msg', None)
+        # Execute test
+        consumer.ack(raw_msg)
+        # Evaluate results : acked only once its post is confirmed
+        consumer.consumer.ack.assert_not_called()
+        confirm(1)
+        self.pub.flush()
+        consumer.consumer.ack.assert_called_once_with(raw_msg)
+
+    def test_flush__gives_up(self, hc, chan):
+        # Prepare test
+        hc.use_pika = False
+        hc.use_amqp = True
+        hc.loop = True
+        hc.new_channel.return_value = chan
+        chan.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.pub.hc = hc
+        self.pub.set_confirm_window(10)
+        self.pub.build()
+        self.pub.publish(self.xname, self.pubkey, 'unconfirmed', None)
+        hc.connection.drain_events.side_effect = ConnectionError('broker gone')
+        # Execute test
+        with patch('sarra.sr_amqp.time.sleep') as sleep:
+            ok = self.pub.flush()
+        # Evaluate results
+        self.assertFalse(ok)
+        self.assertEqual(self.pub.flush_attempts - 1, hc.reconnect.call_count)
+        self.assertEqual(self.pub.flush_attempts - 1, sleep.call_count)
+        self.assertTrue(hc.loop)
+        self.assertEqual(1, len(self.pub.unconfirmed))
+
+    def test_publish__commit_window_amqplib(self, hc, chan):
+        # Prepare test
+        hc.use_pika = False
+        hc.use_amqp = False
+        hc.use_amqplib = True
+        hc.new_channel.return_value = chan
+        self.pub.hc = hc
+        self.pub.set_confirm_window(2)
+        self.pub.build()
+        # Execute test
+        with patch('sarra.sr_amqp.amqplib_0_8', create=True):
+            for i in range(3):
+                self.pub.publish(self.xname, self.pubkey, 'msg %d' % i, None)
+        # Evaluate results
+        chan.tx_select.assert_called_once_with()
+        self.assertEqual(1, chan.tx_commit.call_count)
+        self.assertEqual(1, len(self.pub.unconfirmed))
+        self.pub.flush()
+        self.assertEqual(2, chan.tx_commit.call_count)
+        self.assertEqual(0, len(self.pub.unconfirmed))
+
     def test_restore_clear(self, hc, chan):
         # Prepare test
         self.pub.channel = chan
@@ -18,6 +18,7 @@ Code contributed by:
 """
 import logging
 import os
+import tempfile
 import time
 import unittest
 from enum import Enum, auto
@@ -25,7 +26,7 @@ from io import TextIOWrapper
 from unittest import TestCase
 from unittest.mock import patch, call, Mock, DEFAULT
 
-from sarra.sr_cache import sr_cache
+from sarra.sr_cache import sr_cache, sr_cache_indexed, sr_cache_shared, new_cache
 
 KEY_FMT = "{}_{}"
 ENTRY_KEY_FMT = "{}*{}"
@@ -508,6 +509,230 @@ class SrCacheCase(TestCase):
         self.assertEqual(self.now, self.cache.last_expire, ASSERT_INVALID_VALUE_FMT.format('sr_cache.last_expire'))
 
 
+class SrCacheIndexedCase(TestCase):
+    def setUp(self) -> None:
+        self.now = time.time()
+        self.logger = logging.getLogger(__class__.__name__)
+        self.cache_basis = CacheBasis.path.name
+        self.cache_backend = 'indexed'
+        self.caching = 10
+        self.instance = 1
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.user_cache_dir = self.tmpdir.name
+        self.key = 'd,5d41402abc4b2a76b9719d911017c592'
+        self.cache = new_cache(self)
+        self.cache.open()
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def reopen(self):
+        self.cache.close()
+        self.cache = new_cache(self)
+        self.cache.open()
+
+    def test_new_cache(self):
+        self.assertIsInstance(self.cache, sr_cache_indexed)
+        self.cache_backend = 'dict'
+        self.assertNotIsInstance(new_cache(self), sr_cache_indexed)
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_check(self, nowflt):
+        nowflt.return_value = self.now
+        self.assertTrue(self.cache.check(self.key, 'a/file', 'f'))
+        self.assertFalse(self.cache.check(self.key, 'a/file', 'f'))
+        self.assertEqual('a/file*f', self.cache.cache_hit)
+        self.assertTrue(self.cache.check(self.key, 'b/file', 'f'))
+        self.assertEqual(2, self.cache.count)
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_check__part_same_block(self, nowflt):
+        nowflt.return_value = self.now
+        self.assertTrue(self.cache.check(self.key, 'file', 'i,457,2,24,1'))
+        self.assertFalse(self.cache.check(self.key, 'file', 'i,457,3,30,1'))
+        self.assertEqual('file*i,457,2,24,1', self.cache.cache_hit)
+        self.assertTrue(self.cache.check(self.key, 'file', 'i,457,3,30,2'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_clean__only_expired(self, nowflt):
+        nowflt.return_value = self.now - 20
+        self.cache.check(self.key, 'old', 'f')
+        self.cache.check(self.key, 'refreshed', 'f')
+        nowflt.return_value = self.now
+        self.cache.check(self.key, 'refreshed', 'f')
+        self.cache.check('s,abc', 'new', 'f')
+        # Execute test
+        self.cache.clean()
+        # Evaluate results
+        self.assertEqual(2, self.cache.count)
+        self.assertEqual(2, len(self.cache.expiry))
+        self.assertTrue(self.cache.check(self.key, 'old', 'f'))
+        self.assertFalse(self.cache.check(self.key, 'refreshed', 'f'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_save_load(self, nowflt):
+        nowflt.return_value = self.now
+        self.cache.check(self.key, 'file 1', 'f')
+        self.cache.save()
+        self.cache.check(self.key, 'file 2', 'f')
+        self.cache.check(self.key, 'file 3', None)
+        self.cache.delete_path('file 2')
+        # Execute test
+        self.reopen()
+        # Evaluate results
+        self.assertEqual(2, self.cache.count)
+        self.assertFalse(self.cache.check(self.key, 'file 1', 'f'))
+        self.assertTrue(self.cache.check(self.key, 'file 2', 'f'))
+        self.assertFalse(self.cache.check(self.key, 'file 3', None))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_save__segments(self, nowflt):
+        nowflt.return_value = self.now - 20
+        for i in range(4):
+            self.cache.check(self.key, 'expired %d' % i, 'f')
+        self.cache.save()
+        nowflt.return_value = self.now
+        for i in range(4):
+            self.cache.check(self.key, 'alive %d' % i, 'f')
+        self.cache.save()
+        self.cache.check(self.key, 'alive 0', 'f')
+        self.cache.check(self.key, 'alive 1', 'f')
+        self.cache.check(self.key, 'alive 2', 'f')
+        # Execute test
+        self.cache.save()
+        # Evaluate results
+        files = sorted(os.listdir(self.user_cache_dir))
+        self.assertEqual(['recent_files_001.cache', 'recent_files_001.cache.000001',
+                          'recent_files_001.cache.000002'], files)
+        with open(os.path.join(self.user_cache_dir, 'recent_files_001.cache.000001')) as fp:
+            self.assertEqual(1, len(fp.readlines()))
+        self.reopen()
+        self.assertEqual(4, self.cache.count)
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_delete_path__compact_load(self, nowflt):
+        nowflt.return_value = self.now
+        self.cache.check(self.key, 'deleted', 'f')
+        self.cache.check(self.key, 'kept', 'f')
+        self.cache.save()
+        self.cache.delete_path('deleted')
+        # Execute test
+        self.cache.save()
+        self.cache.compact()
+        self.reopen()
+        # Evaluate results : the deletion outlives the compaction of its segment
+        self.assertEqual(1, self.cache.count)
+        self.assertTrue(self.cache.check(self.key, 'deleted', 'f'))
+        self.assertFalse(self.cache.check(self.key, 'kept', 'f'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_delete_path__older_segments_gone(self, nowflt):
+        nowflt.return_value = self.now - 20
+        self.cache.check(self.key, 'deleted', 'f')
+        self.cache.save()
+        self.cache.delete_path('deleted')
+        self.cache.save()
+        nowflt.return_value = self.now
+        # Execute test : the older segment expired, the deletion is not needed anymore
+        self.cache.save()
+        # Evaluate results
+        self.assertEqual(['recent_files_001.cache'], sorted(os.listdir(self.user_cache_dir)))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_load__dict_cache_file(self, nowflt):
+        nowflt.return_value = self.now
+        self.cache.close()
+        with open(self.cache.cache_file, 'w') as fp:
+            fp.write(WRITE_LINE_FMT.format(self.key, self.now, 'some%20file', 'f'))
+            fp.write(WRITE_LINE_FMT.format(self.key, self.now - 20, 'expired', 'f'))
+        # Execute test
+        self.cache.open()
+        # Evaluate results
+        self.assertEqual(1, self.cache.count)
+        self.assertFalse(self.cache.check(self.key, 'some file', 'f'))
+
+
+class SrCacheSharedCase(TestCase):
+    def setUp(self) -> None:
+        self.now = time.time()
+        self.logger = logging.getLogger(__class__.__name__)
+        self.cache_basis = CacheBasis.path.name
+        self.cache_backend = 'shared'
+        self.caching = 10
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.user_cache_dir = self.tmpdir.name
+        self.key = 'd,5d41402abc4b2a76b9719d911017c592'
+        self.instance = 1
+        self.cache = new_cache(self)
+        self.cache.open()
+        self.instance = 2
+        self.other = new_cache(self)
+        self.other.open()
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.other.close()
+        self.tmpdir.cleanup()
+
+    def test_open__one_file(self):
+        self.assertIsInstance(self.cache, sr_cache_shared)
+        self.assertEqual(self.cache.cache_file, self.other.cache_file)
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_check__across_instances(self, nowflt):
+        nowflt.return_value = self.now
+        self.assertTrue(self.cache.check(self.key, 'a/file', 'f'))
+        self.assertFalse(self.other.check(self.key, 'a/file', 'f'))
+        self.assertEqual('a/file*f', self.other.cache_hit)
+        self.assertTrue(self.other.check(self.key, 'b/file', 'f'))
+        self.assertFalse(self.cache.check(self.key, 'b/file', 'f'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_check__part_same_block(self, nowflt):
+        nowflt.return_value = self.now
+        self.assertTrue(self.cache.check(self.key, 'file', 'i,457,2,24,1'))
+        self.assertFalse(self.other.check(self.key, 'file', 'i,457,3,30,1'))
+        self.assertTrue(self.other.check(self.key, 'file', 'i,457,3,30,2'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_save__expired(self, nowflt):
+        nowflt.return_value = self.now - 8
+        self.cache.check(self.key, 'old', 'f')
+        self.cache.check(self.key, 'refreshed', 'f')
+        nowflt.return_value = self.now
+        # lru hit, refreshed in the database on save
+        self.assertFalse(self.cache.check(self.key, 'refreshed', 'f'))
+        nowflt.return_value = self.now + 5
+        # Execute test
+        self.cache.save()
+        # Evaluate results
+        self.assertEqual(1, self.cache.count)
+        self.assertTrue(self.other.check(self.key, 'old', 'f'))
+        self.assertFalse(self.other.check(self.key, 'refreshed', 'f'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_save__refresh_gone(self, nowflt):
+        nowflt.return_value = self.now
+        self.cache.check(self.key, 'refreshed', 'f')
+        self.cache.check(self.key, 'refreshed', 'f')
+        # the row expired by another instance meanwhile
+        self.other.db.execute('DELETE FROM cache')
+        # Execute test
+        self.cache.save()
+        # Evaluate results
+        self.assertFalse(self.other.check(self.key, 'refreshed', 'f'))
+
+    @patch('sarra.sr_cache.nowflt')
+    def test_delete_path(self, nowflt):
+        nowflt.return_value = self.now
+        self.cache.check(self.key, 'file', 'f')
+        # Execute test
+        self.other.delete_path('file')
+        # Evaluate results
+        self.assertTrue(self.other.check(self.key, 'file', 'f'))
+
+
 class CacheBasis(Enum):
     name = auto()
     path = auto()
@@ -521,6 +746,8 @@ def suite():
     """
     sr_amqp_suite = unittest.TestSuite()
     sr_amqp_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrCacheCase))
+    sr_amqp_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrCacheIndexedCase))
+    sr_amqp_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrCacheSharedCase))
     return sr_amqp_suite
 
 
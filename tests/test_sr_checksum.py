@@ -0,0 +1,103 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_checksum.py : test utility tool used for the checksum algorithms of sarra/sum
+
+  - algorithms are loaded as sr_config.load_sums does (execfile of sarra/sum/checksum_*.py),
+  - values are compared with hashlib (and xxhash when installed).
+"""
+import hashlib
+import os
+import unittest
+from unittest import TestCase
+
+import sarra.sr_config
+import sarra.sum
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DATA = os.urandom(10000)
+
+
+class Loader:
+    def load(self, sumflg):
+        path = os.path.join(os.path.dirname(sarra.sum.__file__), 'checksum_%s.py' % sumflg)
+        # as sr_config.execfile : module globals, locals of its own
+        exec(compile(open(path).read(), path, 'exec'), dict(vars(sarra.sr_config)), {'self': self})
+        return self.add_sumalgo
+
+
+class SrChecksumCase(TestCase):
+    def checksum(self, sumflg, chunks):
+        sumalgo = Loader().load(sumflg)
+        sumalgo.set_path('file')
+        for chunk in chunks:
+            sumalgo.update(chunk)
+        return sumalgo
+
+    def test_checksum_b(self):
+        # Execute test
+        sumalgo = self.checksum('b', [DATA[:3000], memoryview(DATA)[3000:]])
+
+        # Evaluate results
+        self.assertEqual('b', sumalgo.registered_as())
+        self.assertEqual(hashlib.blake2b(DATA).hexdigest(), sumalgo.get_value())
+
+    def test_checksum_b__available(self):
+        # Prepare test : hashlib without blake2b, as before python 3.6
+        blake2b = hashlib.blake2b
+        del hashlib.blake2b
+
+        # Execute test
+        try:
+            sumalgo = Loader().load('b')
+        finally:
+            hashlib.blake2b = blake2b
+
+        # Evaluate results
+        self.assertFalse(sumalgo.available())
+        self.assertTrue(Loader().load('b').available())
+
+    @unittest.skipIf(xxhash is None, 'xxhash module not installed')
+    def test_checksum_x(self):
+        # Execute test
+        sumalgo = self.checksum('x', [DATA[:3000], memoryview(DATA)[3000:]])
+
+        # Evaluate results
+        self.assertTrue(sumalgo.available())
+        self.assertEqual('x', sumalgo.registered_as())
+        self.assertEqual(xxhash.xxh3_128(DATA).hexdigest(), sumalgo.get_value())
+
+    def test_checksum_x__available(self):
+        # Execute test
+        sumalgo = Loader().load('x')
+
+        # Evaluate results
+        self.assertEqual(xxhash is not None, sumalgo.available())
+
+    def test_checksum_d__memoryview(self):
+        # Execute test
+        sumalgo = self.checksum('d', [memoryview(DATA)])
+
+        # Evaluate results
+        self.assertEqual(hashlib.md5(DATA).hexdigest(), sumalgo.get_value())
+
+
+def suite():
+    """ Create the test suite that include all sr_checksum test cases
+
+    :return: sr_checksum test suite
+    """
+    sr_checksum_suite = unittest.TestSuite()
+    sr_checksum_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrChecksumCase))
+    return sr_checksum_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,122 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_config.py : test utility tool used for sr_config
+
+  - plugin_code compiles plugin scripts of a temporary directory, cached in a temporary plugin_cache_dir.
+"""
+import logging
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from sarra.sr_config import sr_config
+
+
+class StandInConfig:
+    plugin_code = sr_config.plugin_code
+
+    def __init__(self, plugin_cache_dir):
+        self.logger = logging.getLogger('test_sr_config')
+        self.plugin_cache_dir = plugin_cache_dir
+
+
+class PluginCodeCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.workdir.name, 'pycache')
+        self.script = os.path.join(self.workdir.name, 'plugin.py')
+        self.write('value = 1\n')
+        sr_config.plugin_codes.clear()
+
+    def tearDown(self) -> None:
+        sr_config.plugin_codes.clear()
+        self.workdir.cleanup()
+
+    def write(self, source):
+        with open(self.script, 'w') as f:
+            f.write(source)
+
+    def run_plugin(self, cfg):
+        scope = {}
+        exec(cfg.plugin_code(self.script), scope)
+        return scope['value']
+
+    def test_plugin_code(self):
+        # Prepare test
+        cfg = StandInConfig(self.cache_dir)
+
+        # Execute test
+        first = cfg.plugin_code(self.script)
+        second = cfg.plugin_code(self.script)
+
+        # Evaluate results
+        self.assertIs(first, second)
+        self.assertEqual(self.script, first.co_filename)
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+        self.assertEqual(1, self.run_plugin(cfg))
+
+    def test_plugin_code__cached(self):
+        # Prepare test : another process, the code compiled by the first one
+        cfg = StandInConfig(self.cache_dir)
+        cfg.plugin_code(self.script)
+        sr_config.plugin_codes.clear()
+        cache_file = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        mtime = os.stat(cache_file).st_mtime_ns
+
+        # Execute test & Evaluate results
+        self.assertEqual(1, self.run_plugin(StandInConfig(self.cache_dir)))
+        self.assertEqual(mtime, os.stat(cache_file).st_mtime_ns)
+
+    def test_plugin_code__changed(self):
+        # Prepare test
+        cfg = StandInConfig(self.cache_dir)
+        self.run_plugin(cfg)
+
+        # Execute test
+        self.write('value = 2\n')
+
+        # Evaluate results
+        self.assertEqual(2, self.run_plugin(cfg))
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+    def test_plugin_code__corrupted(self):
+        # Prepare test
+        cfg = StandInConfig(self.cache_dir)
+        cfg.plugin_code(self.script)
+        sr_config.plugin_codes.clear()
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), 'wb') as f:
+                f.write(b'\xff\x00corrupted')
+
+        # Execute test & Evaluate results : compiled again, and the cache rewritten
+        self.assertEqual(1, self.run_plugin(cfg))
+        sr_config.plugin_codes.clear()
+        self.assertEqual(1, self.run_plugin(cfg))
+
+    def test_plugin_code__unwritable(self):
+        # Prepare test : the cache dir cannot be made
+        with open(self.cache_dir, 'w') as f:
+            f.write('a file')
+        cfg = StandInConfig(os.path.join(self.cache_dir, 'sub'))
+
+        # Execute test & Evaluate results
+        self.assertEqual(1, self.run_plugin(cfg))
+
+
+def suite():
+    """ Create the test suite that include all sr_config test cases
+
+    :return: sr_config test suite
+    """
+    sr_config_suite = unittest.TestSuite()
+    sr_config_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(PluginCodeCase))
+    return sr_config_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
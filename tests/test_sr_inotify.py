@@ -0,0 +1,177 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_inotify.py : test utility tool used for sr_inotify, the watcher of sr_watch with watch_backend inotify
+
+  - the tree watched is a temporary directory, the events are the ones sr_watch gets (parent.new_events),
+  - linux only.
+"""
+import collections
+import logging
+import os
+import tempfile
+import time
+import unittest
+from unittest import TestCase
+
+from sarra.sr_inotify import sr_inotify
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.new_events = collections.OrderedDict()
+        self.closed_paths = set()
+
+
+@unittest.skipUnless(sr_inotify.available(), "inotify is linux only")
+class SrInotifyCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.root = self.workdir.name + '/tree'
+        os.mkdir(self.root)
+        os.mkdir(self.root + '/sub')
+        self.parent = StandInParent()
+        self.inotify = sr_inotify(self.parent)
+        self.inotify.watch(self.root)
+        self.inotify.start()
+
+    def tearDown(self) -> None:
+        self.inotify.close()
+        self.workdir.cleanup()
+
+    def write(self, path, data=b'data'):
+        with open(self.root + '/' + path, 'wb') as fp:
+            fp.write(data)
+
+    def events(self, count=1):
+        """ the events of the parent once count of them are there (or after 2 seconds) """
+        for i in range(20):
+            self.inotify.collect()
+            if len(self.parent.new_events) >= count:
+                break
+            time.sleep(0.1)
+        time.sleep(0.1)
+        self.inotify.collect()
+        return [(e, os.path.relpath(src, self.root), dst and os.path.relpath(dst, self.root))
+                for e, src, dst in self.parent.new_events.values()]
+
+    def test_collect__written(self):
+        # Execute test : the writes of a file are one event
+        with open(self.root + '/sub/a', 'wb') as fp:
+            for i in range(100):
+                fp.write(b'x')
+                fp.flush()
+        self.write('b')
+
+        # Evaluate results
+        self.assertEqual([('modify', 'sub/a', None), ('modify', 'b', None)], self.events(2))
+
+    def test_collect__created_deleted(self):
+        # Execute test
+        self.write('a')
+        os.symlink('a', self.root + '/link')
+        os.unlink(self.root + '/a')
+
+        # Evaluate results : the last event of each path
+        self.assertEqual([('create', 'link', None), ('delete', 'a', None)], self.events(2))
+
+    def test_collect__moved(self):
+        # Prepare test
+        self.write('a')
+        self.write('../outside')
+        self.events()
+        self.parent.new_events.clear()
+
+        # Execute test
+        os.rename(self.root + '/a', self.root + '/sub/b')
+        os.rename(self.root + '/sub/b', self.workdir.name + '/gone')
+        os.rename(self.workdir.name + '/outside', self.root + '/c')
+
+        # Evaluate results : moved out is known at the end of the events read
+        self.assertEqual([('create', 'c', None), ('delete', 'sub/b', None), ('move', 'a', 'sub/b')],
+                         sorted(self.events(3)))
+
+    def test_collect__new_directory(self):
+        # Execute test : a directory is watched once created, and so is the one moved in
+        os.makedirs(self.root + '/new/deeper')
+        self.write('new/deeper/a')
+        os.makedirs(self.workdir.name + '/other')
+        with open(self.workdir.name + '/other/b', 'wb') as fp:
+            fp.write(b'b')
+        os.rename(self.workdir.name + '/other', self.root + '/other')
+        events = self.events(2)
+        self.parent.new_events.clear()
+        self.write('other/c')
+        os.rename(self.root + '/new', self.root + '/renamed')
+        self.write('renamed/deeper/d')
+
+        # Evaluate results : a written before its directory is watched, or after
+        self.assertTrue(('create', 'new/deeper/a', None) in events or ('modify', 'new/deeper/a', None) in events)
+        self.assertIn(('create', 'other/b', None), events)
+        self.assertEqual([('modify', 'other/c', None), ('move', 'new', 'renamed'),
+                          ('modify', 'renamed/deeper/d', None)], self.events(3))
+
+    def test_collect__closed(self):
+        # Prepare test
+        self.write('../outside')
+        os.mkdir(self.workdir.name + '/other')
+        with open(self.workdir.name + '/other/b', 'wb') as fp:
+            fp.write(b'b')
+        self.write('c')
+        self.events()
+        self.parent.closed_paths.clear()
+        self.parent.new_events.clear()
+
+        # Execute test : written and closed, moved in, being written, found in a new directory
+        self.write('a')
+        os.rename(self.workdir.name + '/outside', self.root + '/sub/moved')
+        os.rename(self.workdir.name + '/other', self.root + '/other')
+        with open(self.root + '/c', 'ab') as fp:
+            fp.write(b'more')
+            fp.flush()
+            events = self.events(3)
+
+        # Evaluate results : only the files known complete
+        self.assertEqual([('create', 'other/b', None), ('create', 'sub/moved', None), ('modify', 'a', None)],
+                         sorted(events))
+        self.assertEqual({self.root + '/a', self.root + '/sub/moved'}, self.parent.closed_paths)
+
+    def test_collect__overflow(self):
+        # Prepare test : events not read (no thread), then lost
+        parent = StandInParent()
+        inotify = sr_inotify(parent)
+        inotify.watch(self.root)
+        self.write('old')
+        time.sleep(1.1)
+        since = time.time() - 0.5
+        self.write('sub/new')
+        os.mkdir(self.root + '/unwatched')
+        self.write('unwatched/new')
+        inotify.overflow = since
+
+        # Execute test : the files changed since are posted, the new directories watched
+        inotify.collect()
+        inotify.close()
+
+        # Evaluate results
+        self.assertEqual([('create', self.root + '/sub/new', None), ('create', self.root + '/unwatched/new', None)],
+                         sorted(parent.new_events.values()))
+        self.assertIn(self.root + '/unwatched', inotify.dirs)
+
+
+def suite():
+    """ Create the test suite that include all sr_inotify test cases
+
+    :return: sr_inotify test suite
+    """
+    sr_inotify_suite = unittest.TestSuite()
+    sr_inotify_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrInotifyCase))
+    return sr_inotify_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
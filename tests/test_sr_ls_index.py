@@ -0,0 +1,138 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_ls_index.py : test utility tool used for sr_ls_index, the listings sr_poll keeps (ls_backend indexed)
+
+  - listings are name -> ls -l line dictionaries, as sr_poll.lsdir returns them,
+  - the database and the ls files are in a temporary directory.
+"""
+import logging
+import os
+import tempfile
+import time
+import unittest
+from unittest import TestCase
+
+from sarra.sr_ls_index import sr_ls_index
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.ls_high_water = False
+
+    def load_ls_file(self, path):
+        with open(path) as fp:
+            return {line.split()[-1]: line.strip('\n') for line in fp}
+
+
+def ls_line(name, size, t, mode='-rw-r--r--'):
+    return '%s 1 0 0 %d %s %s' % (mode, size, time.strftime('%b %d %H:%M', time.gmtime(t)), name)
+
+
+class SrLsIndexCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.parent = StandInParent()
+        self.lspath = os.path.join(self.workdir.name, 'ls_data_obs')
+        self.index = sr_ls_index(self.parent, os.path.join(self.workdir.name, 'ls_index.sqlite'))
+        self.now = time.time()
+
+    def tearDown(self) -> None:
+        self.index.close()
+        self.workdir.cleanup()
+
+    def listing(self, entries):
+        return {name: ls_line(name, size, self.now - age) for name, size, age in entries}
+
+    def rows(self):
+        return self.index.db.execute('SELECT name, size FROM ls ORDER BY name').fetchall()
+
+    def test_differ(self):
+        # Prepare test
+        first = self.listing([('a', 1, 0), ('b', 2, 0), ('c', 3, 0)])
+        second = self.listing([('a', 1, 0), ('c', 4, 0), ('d', 5, 0)])
+        second['a'] = second['a'].replace('-rw-r--r--', '-rw-------')
+
+        # Execute test
+        new, new_desc = self.index.differ(first, self.lspath)
+        modified, modified_desc = self.index.differ(second, self.lspath)
+        again, again_desc = self.index.differ(second, self.lspath)
+
+        # Evaluate results : permissions are not a modification
+        self.assertEqual(['a', 'b', 'c'], new)
+        self.assertEqual(first, new_desc)
+        self.assertEqual(['c', 'd'], modified)
+        self.assertEqual(second['c'], modified_desc['c'])
+        self.assertEqual([], again)
+        self.assertEqual([('a', 1), ('c', 4), ('d', 5)], self.rows())
+
+    def test_differ__directories(self):
+        # Execute test
+        self.index.differ(self.listing([('a', 1, 0)]), self.lspath)
+        other = self.index.differ(self.listing([('a', 1, 0)]), self.lspath + '_sub')
+        empty = self.index.differ({}, self.lspath)
+
+        # Evaluate results
+        self.assertEqual(['a'], other[0])
+        self.assertEqual([], empty[0])
+        self.assertEqual([('a', 1)], self.rows())
+
+    def test_differ__high_water(self):
+        # Prepare test
+        self.parent.ls_high_water = True
+        self.index = sr_ls_index(self.parent, self.index.db_path)
+        self.index.differ(self.listing([('old', 1, 86400), ('recent', 2, 600)]), self.lspath)
+
+        # Execute test : files older than the newest of the last poll are skipped
+        found, desc = self.index.differ(self.listing([('old', 1, 86400), ('older', 2, 7200),
+                                                      ('recent', 2, 600), ('late', 3, 660), ('new', 4, 0)]),
+                                        self.lspath)
+
+        # Evaluate results : only the files the next poll may not skip are kept
+        self.assertEqual(['late', 'new'], found)
+        self.assertEqual([('new', 4)], self.rows())
+
+    def test_differ__restart(self):
+        # Prepare test
+        self.index.differ(self.listing([('a', 1, 0), ('b', 2, 0)]), self.lspath)
+        self.index.close()
+
+        # Execute test : a new process merges with the database
+        self.index = sr_ls_index(self.parent, self.index.db_path)
+        found, desc = self.index.differ(self.listing([('a', 1, 0), ('b', 3, 0), ('c', 4, 0)]), self.lspath)
+
+        # Evaluate results
+        self.assertEqual(['b', 'c'], found)
+        self.assertEqual([('a', 1), ('b', 3), ('c', 4)], self.rows())
+
+    def test_differ__import(self):
+        # Prepare test : the ls file of ls_backend files
+        ls = self.listing([('a', 1, 0), ('b', 2, 0)])
+        with open(self.lspath, 'w') as fp:
+            for name in sorted(ls):
+                fp.write(ls[name] + '\n')
+
+        # Execute test
+        found, desc = self.index.differ(self.listing([('a', 1, 0), ('b', 3, 0)]), self.lspath)
+
+        # Evaluate results
+        self.assertEqual(['b'], found)
+        self.assertFalse(os.path.exists(self.lspath))
+
+
+def suite():
+    """ Create the test suite that include all sr_ls_index test cases
+
+    :return: sr_ls_index test suite
+    """
+    sr_ls_index_suite = unittest.TestSuite()
+    sr_ls_index_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrLsIndexCase))
+    return sr_ls_index_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
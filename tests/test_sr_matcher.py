@@ -0,0 +1,230 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_matcher.py : test utility tool used for sr_matcher, the accept/reject masks compiled,
+                     and sr_topic_filter, the accept/reject masks applied to topics
+
+  - masks are built by sr_config accept/reject options, as in a configuration file,
+  - the matcher must give the mask that a loop over the masks (first match wins) gives.
+"""
+import unittest
+from unittest import TestCase
+
+from sarra.sr_config import sr_config
+from sarra.sr_matcher import sr_matcher, sr_topic_filter
+
+
+class SrMatcherCase(TestCase):
+    def setUp(self) -> None:
+        self.cfg = sr_config(config=None, args=None)
+        self.cfg.defaults()
+        self.cfg.general()
+
+    def add_masks(self, masks):
+        for option, pattern in masks:
+            self.cfg.option([option, pattern])
+        return self.cfg.masks
+
+    @staticmethod
+    def first_match(masks, s):
+        for i, mask in enumerate(masks):
+            if mask[3].match(s):
+                return i
+        return None
+
+    def test_match__first_wins(self):
+        # Prepare test : literals, regexps, masks without literal mixed
+        masks = self.add_masks([('reject', '.*\\.tmp'), ('accept', '.*GRIB.*'), ('accept', '.*/(\\w+)/\\1/.*'),
+                                ('reject', '.*/obs/.*\\.csv$'), ('accept', '(?i).*bufr.*'), ('accept', '.*/obs/.*'),
+                                ('accept', 'http://localhost/data.*'), ('reject', '.*')])
+        matcher = sr_matcher(masks)
+        strings = ['http://localhost/obs/a.tmp', 'http://localhost/GRIB/a', 'http://localhost/x/x/a',
+                   'http://localhost/obs/a.csv', 'http://localhost/BUFR/a', 'http://localhost/obs/a.txt',
+                   'http://localhost/data/a', 'http://remote/a', 'http://localhost/obs/\nGRIB']
+
+        # Execute test
+        for s in strings + strings:
+            # Evaluate results
+            self.assertEqual(self.first_match(masks, s), matcher.match(s), s)
+        self.assertEqual(('in', '.tmp'), matcher.tests[0])
+        self.assertEqual(('start', 'http://localhost/data'), matcher.tests[6])
+        self.assertEqual([2, 4, 7], matcher.always)
+
+    def test_match__indexed(self):
+        # Prepare test : hundreds of masks, the literal of each regexp indexed
+        masks = self.add_masks([('accept', '.*/model_%03d/[0-9]{2}/.*\\.grib2$' % i) for i in range(300)] +
+                               [('reject', '.*/(a|b)+/.*'), ('accept', '.*/model_1[0-9]{2}/.*')])
+        matcher = sr_matcher(masks)
+
+        # Execute test
+        for s in ['/model_042/12/x.grib2', '/model_042/1/x.grib2', '/model_142/1/x.grib2', '/a/model_142/1/x',
+                  '/model_1000/12/x.grib2', '/model_999/12/x.grib2', '/model_299/12/x.grib2\n']:
+            # Evaluate results
+            self.assertEqual(self.first_match(masks, s), matcher.match(s), s)
+        self.assertEqual([300], matcher.always)
+
+    def test_match__unmatched(self):
+        # Prepare test
+        matcher = sr_matcher(self.add_masks([('accept', '.*\\.grib2'), ('accept', '.*\\.bufr')]))
+
+        # Execute test
+        found = matcher.match('http://localhost/a.txt')
+
+        # Evaluate results
+        self.assertIsNone(found)
+        self.assertIn('http://localhost/a.txt', matcher.lru)
+
+    def test_match__lru(self):
+        # Prepare test
+        matcher = sr_matcher(self.add_masks([('accept', '.*a.*')]))
+        matcher.lru_max = 2
+
+        # Execute test
+        for s in ['a', 'b', 'c', 'b']:
+            matcher.match(s)
+
+        # Evaluate results
+        self.assertEqual(['c', 'b'], list(matcher.lru))
+
+    def test_isMatchingPattern(self):
+        # Prepare test : directory options follow the masks
+        self.cfg.option(['directory', '/tmp/grib'])
+        self.cfg.option(['accept', '.*GRIB.*'])
+        self.cfg.option(['directory', '/tmp/other'])
+        self.cfg.option(['reject', '.*\\.tmp'])
+        self.cfg.option(['accept', '.*'])
+
+        # Execute test & Evaluate results
+        self.assertTrue(self.cfg.isMatchingPattern('http://localhost/GRIB/a.tmp'))
+        self.assertEqual('/tmp/grib', self.cfg.currentDir)
+        self.assertFalse(self.cfg.isMatchingPattern('http://localhost/a.tmp'))
+        self.assertEqual('.*\\.tmp', self.cfg.currentPattern)
+
+    def test_isMatchingPattern__unmatched(self):
+        # Prepare test
+        self.cfg.option(['directory', '/tmp/grib'])
+        self.cfg.option(['accept', '.*GRIB.*'])
+
+        # Execute test & Evaluate results : fields of the last mask, as when all masks are tried
+        self.assertFalse(self.cfg.isMatchingPattern('http://localhost/a'))
+        self.assertTrue(self.cfg.isMatchingPattern('http://localhost/a', accept_unmatch=True))
+        self.assertEqual('.*GRIB.*', self.cfg.currentPattern)
+
+        # masks added afterwards are compiled too
+        self.cfg.option(['accept', '.*/a'])
+        self.assertTrue(self.cfg.isMatchingPattern('http://localhost/a'))
+
+    def test_rejects_prefix(self):
+        # Prepare test
+        masks = self.add_masks([('reject', '.*/tmp/.*'), ('accept', 'file:/data/radar/.*'), ('accept', '.*\\.grib2$'),
+                                ('reject', 'file:/data/.*')])
+        matcher = sr_matcher(masks)
+
+        # Execute test & Evaluate results : all the files of a directory rejected, or maybe not
+        self.assertTrue(matcher.rejects_prefix('file:/data/radar/tmp/', False))
+        self.assertFalse(matcher.rejects_prefix('file:/data/radar/', False))
+        self.assertFalse(matcher.rejects_prefix('file:/data/', False))
+        self.assertFalse(matcher.rejects_prefix('file:/data/model/', False))
+        self.assertFalse(matcher.rejects_prefix('file:/data/tmp\n/', False))
+
+        # without the .grib2 mask : the other directories are not walked (unless accept_unmatch)
+        matcher = sr_matcher([mask for mask in masks if mask[0] != '.*\\.grib2$'])
+        self.assertTrue(matcher.rejects_prefix('file:/data/model/', False))
+        self.assertTrue(matcher.rejects_prefix('file:/other/', False))
+        self.assertFalse(matcher.rejects_prefix('file:/other/', True))
+        self.assertFalse(matcher.rejects_prefix('file:/data/radar/', False))
+        self.assertFalse(matcher.rejects_prefix('file:/data/rad', False))
+
+
+class SrTopicFilterCase(TestCase):
+    def setUp(self) -> None:
+        self.cfg = sr_config(config=None, args=None)
+        self.cfg.defaults()
+        self.cfg.general()
+        self.cfg.topic_prefix = 'v02.post'
+
+    def test_rejects(self):
+        # Prepare test
+        self.cfg.option(['reject', '.*CYUL.*'])
+        self.cfg.option(['accept', '.*/swob-ml/.*'])
+        self.cfg.option(['accept', '.*/model_gem/[0-9]{2}/.*'])
+        topic_filter = sr_topic_filter(self.cfg)
+        topic_filter.check('http://localhost')
+
+        # Execute test & Evaluate results
+        self.assertTrue(topic_filter.rejects('v02.post.observations.swob-ml.CYUL'))
+        self.assertFalse(topic_filter.rejects('v02.post.observations.swob-ml.CYYZ'))
+        self.assertTrue(topic_filter.rejects('v02.post.radar.CYUL'))
+        self.assertFalse(topic_filter.rejects('v02.post.model_gem.12'))
+        # files of model_gem/ itself : the filter does not know a directory must follow
+        self.assertFalse(topic_filter.rejects('v02.post.model_gem'))
+        # CYUL may be in the file name, not in the topic
+        self.assertTrue(topic_filter.rejects('v02.post'))
+        self.assertTrue(topic_filter.rejects('v02.post'))
+        self.assertEqual((7, 4), (topic_filter.count, topic_filter.rejected))
+        self.assertEqual(6, len(topic_filter.decisions))
+
+    def test_rejects__undecided(self):
+        # Prepare test : masks that may match anything or quoted characters in the topic
+        self.cfg.option(['accept', '.*\\.grib2$'])
+        self.cfg.option(['accept', '.*/obs/.*'])
+        topic_filter = sr_topic_filter(self.cfg)
+        topic_filter.check('http://localhost/')
+
+        # Execute test & Evaluate results
+        self.assertFalse(topic_filter.rejects('v02.post.radar'))
+        self.cfg.masks.pop(0)
+        self.assertTrue(topic_filter.rejects('v02.post.radar'))
+        self.assertFalse(topic_filter.rejects('v02.post.radar.a%20b'))
+        self.assertFalse(topic_filter.rejects('v03.radar'))
+        self.cfg.accept_unmatch = True
+        topic_filter = sr_topic_filter(self.cfg)
+        topic_filter.check('http://localhost/')
+        self.assertFalse(topic_filter.rejects('v02.post.radar'))
+
+    def test_check__baseurl_path(self):
+        # Prepare test : the path of the files starts in the base url
+        self.cfg.option(['accept', '.*/data/swob-ml/.*'])
+        topic_filter = sr_topic_filter(self.cfg)
+
+        # Execute test & Evaluate results : nothing rejected before a base url is known
+        self.assertFalse(topic_filter.rejects('v02.post.swob-ml.20201010.CYUL'))
+        topic_filter.check('http://localhost')
+        self.assertTrue(topic_filter.rejects('v02.post.swob-ml.20201010.CYUL'))
+        with self.assertLogs(self.cfg.logger, 'WARNING') as logs:
+            topic_filter.check('http://host/data')
+        self.assertIn('prefilter off', logs.output[0])
+        self.assertEqual({}, topic_filter.decisions)
+        topic_filter.check('http://localhost')
+        self.assertFalse(topic_filter.rejects('v02.post.swob-ml.20201010.CYUL'))
+
+    def test_report(self):
+        # Prepare test
+        self.cfg.option(['accept', '.*/swob-ml/CYUL/.*'])
+        self.cfg.option(['accept', '.*CYYZ.*'])
+
+        # Execute test
+        with self.assertLogs(self.cfg.logger, 'INFO') as logs:
+            sr_topic_filter(self.cfg).report()
+
+        # Evaluate results
+        self.assertIn('subtopic #.swob-ml.CYUL.#', logs.output[0])
+        self.assertIn('accept .*CYYZ.* need all topics', logs.output[1])
+
+
+def suite():
+    """ Create the test suite that include all sr_matcher test cases
+
+    :return: sr_matcher test suite
+    """
+    sr_matcher_suite = unittest.TestSuite()
+    sr_matcher_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrMatcherCase))
+    sr_matcher_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrTopicFilterCase))
+    return sr_matcher_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
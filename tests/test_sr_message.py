@@ -0,0 +1,103 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_message.py : test utility tool used for sr_message decoding of raw messages
+
+  - the message is built on a default configuration (sr_config defaults),
+  - raw messages are v02 and v03 posts, as sr_consumer receives them.
+"""
+import base64
+import hashlib
+import json
+import unittest
+from unittest import TestCase
+
+from sarra.sr_config import sr_config
+from sarra.sr_message import sr_message
+from sarra.sr_util import raw_message
+
+DIGEST = hashlib.md5(b'data').digest()
+PUBTIME = '20201005123456.789'
+
+
+class SrMessageCase(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.cfg = sr_config(config=None, args=None)
+        cls.cfg.defaults()
+        cls.cfg.general()
+        cls.cfg.load_sums()
+
+    def setUp(self) -> None:
+        self.msg = sr_message(self.cfg)
+
+    def new_raw(self, version):
+        raw = raw_message(self.cfg.logger)
+        raw.isRetry = False
+        raw.delivery_info['exchange'] = 'xpublic'
+        if version == 'v02':
+            raw.delivery_info['routing_key'] = 'v02.post.data.obs'
+            raw.properties['application_headers'] = {'sum': 'd,' + DIGEST.hex(), 'parts': '1,4,1,0,0'}
+            raw.body = '%s http://localhost /data/obs/file%%20a.txt' % PUBTIME
+        else:
+            raw.delivery_info['routing_key'] = 'v03.data.obs'
+            raw.properties['application_headers'] = {}
+            raw.body = json.dumps({'pubTime': PUBTIME, 'baseUrl': 'http://localhost', 'relPath': '/data/obs/file.txt',
+                                   'integrity': {'method': 'md5', 'value': base64.b64encode(DIGEST).decode()},
+                                   'size': 4})
+        return raw
+
+    def test_decode_routing__v02(self):
+        # Execute test
+        self.msg.decode_routing(self.new_raw('v02'))
+
+        # Evaluate results
+        self.assertEqual('http://localhost/data/obs/file%20a.txt', self.msg.urlstr)
+        self.assertEqual('/data/obs/file%20a.txt', self.msg.relpath)
+
+    def test_decode_routing__v03(self):
+        # Execute test
+        self.msg.decode_routing(self.new_raw('v03'))
+
+        # Evaluate results : headers left as received
+        self.assertEqual('http://localhost/data/obs/file.txt', self.msg.urlstr)
+        self.assertEqual('md5', self.msg.headers['integrity']['method'])
+        self.assertEqual(4, self.msg.headers['size'])
+
+    def test_from_amqplib__v03(self):
+        # Execute test
+        self.msg.from_amqplib(self.new_raw('v03'))
+
+        # Evaluate results
+        self.assertEqual('d,' + DIGEST.hex(), self.msg.sumstr)
+        self.assertEqual('1,4,1,0,0', self.msg.partstr)
+        self.assertEqual('modify', self.msg.event)
+        self.assertNotIn('integrity', self.msg.headers)
+        self.assertEqual('http://localhost/data/obs/file.txt', self.msg.urlstr)
+
+    def test_from_amqplib__v02(self):
+        # Execute test
+        self.msg.from_amqplib(self.new_raw('v02'))
+
+        # Evaluate results
+        self.assertEqual('d,' + DIGEST.hex(), self.msg.sumstr)
+        self.assertEqual(4, self.msg.filesize)
+        self.assertEqual('/data/obs/file a.txt', self.msg.relpath)
+        self.assertEqual('http://localhost/data/obs/file%20a.txt', self.msg.urlstr)
+
+
+def suite():
+    """ Create the test suite that include all sr_message test cases
+
+    :return: sr_message test suite
+    """
+    sr_message_suite = unittest.TestSuite()
+    sr_message_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrMessageCase))
+    return sr_message_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
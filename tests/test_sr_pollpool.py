@@ -0,0 +1,140 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_pollpool.py : test utility tool used for sr_pollpool
+
+  - the sessions are stand-ins of a protocol (cd, ls) taking some time to list,
+  - a directory named 'missing' cannot be cd'ed to.
+"""
+import logging
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+from sarra.sr_pollpool import sr_pollpool
+
+
+class StandInDest:
+    def __init__(self, parent):
+        self.parent = parent
+        self.closed = False
+        self.path = None
+
+    def connect(self):
+        if self.parent.refuse:
+            raise ConnectionRefusedError()
+
+    def cd(self, path):
+        if path == 'missing':
+            raise FileNotFoundError(path)
+        self.path = path
+
+    def ls(self):
+        time.sleep(self.parent.delay)
+        return {'file_of_' + self.path: '-rw-r--r-- 1 0 0 10 Oct 18 12:34 file_of_' + self.path}
+
+    def close(self):
+        self.closed = True
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.destination = 'ftp://anonymous@localhost'
+        self.delay = 0.0
+        self.refuse = False
+        self.threads = set()
+
+    def new_dest(self):
+        self.threads.add(threading.current_thread().name)
+        return StandInDest(self)
+
+
+class SrPollpoolCase(TestCase):
+    def setUp(self) -> None:
+        self.parent = StandInParent()
+        self.pool = sr_pollpool(self.parent, 2)
+
+    def tearDown(self) -> None:
+        self.pool.close()
+
+    def test_prefetch__result(self):
+        # Prepare test
+        self.pool.window = 2
+        dirs = ['a', 'b', 'c', 'd']
+
+        # Execute test
+        for d in dirs:
+            self.pool.prefetch(d)
+        upcoming = len(self.pool.upcoming)
+        listings = [self.pool.result(d) for d in dirs]
+
+        # Evaluate results : one session per thread
+        self.assertEqual(2, upcoming)
+        self.assertEqual([(True, ['file_of_' + d]) for d in dirs], [(ok, list(ls)) for ok, ls in listings])
+        self.assertEqual(len(self.parent.threads), len(self.pool.sessions))
+        self.assertTrue(len(self.pool.sessions) <= 2)
+
+    def test_result__parallel(self):
+        # Prepare test
+        self.parent.delay = 0.2
+        start = time.time()
+
+        # Execute test
+        for d in ['a', 'b', 'c', 'd']:
+            self.pool.prefetch(d)
+        listings = [self.pool.result(d) for d in ['a', 'b', 'c', 'd']]
+
+        # Evaluate results : 2 listings at once
+        self.assertTrue(all(ok for ok, ls in listings))
+        self.assertTrue(time.time() - start < 0.7)
+
+    def test_result__not_prefetched(self):
+        # Execute test
+        ok, ls = self.pool.result('z')
+
+        # Evaluate results
+        self.assertTrue(ok)
+        self.assertEqual(['file_of_z'], list(ls))
+
+    def test_result__failures(self):
+        # Execute test
+        missing = self.pool.result('missing')
+        self.parent.refuse = True
+        refused = sr_pollpool(self.parent, 1)
+        unconnected = refused.result('a')
+        refused.close()
+
+        # Evaluate results
+        self.assertEqual((False, None), missing)
+        self.assertEqual((False, None), unconnected)
+
+    def test_close(self):
+        # Prepare test
+        self.pool.result('a')
+        sessions = list(self.pool.sessions)
+
+        # Execute test
+        self.pool.close()
+
+        # Evaluate results
+        self.assertTrue(all(dest.closed for dest in sessions))
+        self.assertEqual([], self.pool.sessions)
+
+
+def suite():
+    """ Create the test suite that include all sr_pollpool test cases
+
+    :return: sr_pollpool test suite
+    """
+    sr_pollpool_suite = unittest.TestSuite()
+    sr_pollpool_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrPollpoolCase))
+    return sr_pollpool_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
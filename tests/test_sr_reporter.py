@@ -0,0 +1,159 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_reporter.py : test utility tool used for sr_reporter, the summaries of reports (report_aggregate)
+
+  - the publisher keeps what is published, the messages give their elapsed time.
+"""
+import json
+import logging
+import unittest
+from unittest import TestCase
+from unittest.mock import patch
+
+from sarra.sr_config import sr_config
+from sarra.sr_message import sr_message
+from sarra.sr_reporter import sr_reporter
+from sarra.sr_util import raw_message
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.report_exchange = 'xs_tsource'
+        self.report_aggregate = 60
+
+
+class StandInPublisher:
+    def __init__(self):
+        self.published = []
+        self.raw = []
+        self.flushed = 0
+
+    def publish(self, exchange, topic, notice, headers):
+        self.published.append((exchange, topic, json.loads(notice)['summary']))
+        self.raw.append((exchange, topic, notice, headers))
+
+    def flush(self):
+        self.flushed += 1
+
+
+class StandInMsg:
+    def __init__(self, code, elapsed, length=None, filesize=None):
+        self.code = code
+        self.elapsed = elapsed
+        self.length = length
+        self.filesize = filesize
+        self.host = 'localhost'
+        self.user = 'tsub'
+        self.topic_prefix = 'v03.post'
+
+    def get_elapse(self):
+        return self.elapsed
+
+
+class SrReporterCase(TestCase):
+    def setUp(self) -> None:
+        self.publisher = StandInPublisher()
+        with patch('sarra.sr_reporter.nowflt', return_value=1000.0):
+            self.reporter = sr_reporter(StandInParent(), self.publisher)
+
+    @patch('sarra.sr_reporter.nowflt')
+    def test_add(self, nowflt):
+        # Execute test : 100 downloads and 2 not modified in the interval, one more after it
+        nowflt.return_value = 1010.0
+        for i in range(100):
+            self.reporter.add(StandInMsg(201, (i + 1) / 100, length=10))
+        self.reporter.add(StandInMsg(304, 0.5, filesize=7))
+        self.reporter.add(StandInMsg(304, 0.25))
+        self.assertEqual([], self.publisher.published)
+        nowflt.return_value = 1060.0
+        self.reporter.add(StandInMsg(499, 2.0))
+
+        # Evaluate results
+        exchange, topic, summary = self.publisher.published[0]
+        self.assertEqual(('xs_tsource', 'v03.report.summary'), (exchange, topic))
+        self.assertEqual(('19700101001640', '19700101001740', 'tsub'), (summary['start'], summary['end'], summary['user']))
+        self.assertEqual({'count': 100, 'bytes': 1000, 'elapsed': {'p50': 0.5, 'p90': 0.9, 'p99': 0.99, 'max': 1.0}},
+                         summary['codes']['201'])
+        self.assertEqual({'count': 2, 'bytes': 7, 'elapsed': {'p50': 0.25, 'p90': 0.5, 'p99': 0.5, 'max': 0.5}},
+                         summary['codes']['304'])
+        self.assertEqual(['201', '304', '499'], sorted(summary['codes']))
+        self.assertEqual({}, self.reporter.codes)
+
+    @patch('sarra.sr_reporter.nowflt')
+    def test_flush(self, nowflt):
+        # Execute test : nothing due, nothing reported, then a summary due
+        nowflt.return_value = 1030.0
+        self.reporter.add(StandInMsg(201, 0.1))
+        self.reporter.flush()
+        published = len(self.publisher.published)
+        nowflt.return_value = 1090.0
+        self.reporter.flush()
+        self.reporter.flush()
+
+        # Evaluate results
+        self.assertEqual(0, published)
+        self.assertEqual(1, len(self.publisher.published))
+        self.assertEqual(1090.0, self.reporter.start)
+        self.assertEqual(3, self.publisher.flushed)
+
+    @patch('sarra.sr_reporter.nowflt')
+    def test_close(self, nowflt):
+        # Execute test : the last reports are published on close
+        nowflt.return_value = 1001.0
+        self.reporter.add(StandInMsg(201, 0.1))
+        self.reporter.close()
+
+        # Evaluate results
+        self.assertEqual(1, self.publisher.published[0][2]['codes']['201']['count'])
+        self.assertEqual(1, self.reporter.summaries)
+
+    @patch('sarra.sr_reporter.nowflt')
+    def test_publish__decoded(self, nowflt):
+        # Prepare test : a report consumer (sr_report -topic_prefix v03.report)
+        cfg = sr_config(config=None, args=None)
+        cfg.defaults()
+        cfg.general()
+        cfg.load_sums()
+        cfg.topic_prefix = 'v03.report'
+        nowflt.return_value = 1001.0
+        self.reporter.add(StandInMsg(201, 0.1))
+        self.reporter.add(StandInMsg(499, 2.0))
+        self.reporter.close()
+        exchange, topic, notice, headers = self.publisher.raw[0]
+        raw = raw_message(cfg.logger)
+        raw.isRetry = False
+        raw.delivery_info['exchange'] = exchange
+        raw.delivery_info['routing_key'] = topic
+        raw.properties['application_headers'] = headers
+        raw.body = notice
+
+        # Execute test
+        msg = sr_message(cfg)
+        msg.from_amqplib(raw)
+
+        # Evaluate results : a v03 report, code 0, the summary in its headers
+        self.assertTrue(msg.v03)
+        self.assertEqual(('v03', 'report'), (msg.version, msg.mtype))
+        self.assertEqual('report:/summary/localhost', msg.urlstr)
+        self.assertEqual(('2', '0', 'localhost', 'tsub'),
+                         (msg.report_elapse, msg.report_code, msg.report_host, msg.report_user))
+        self.assertEqual(2, sum(c['count'] for c in msg.headers['summary']['codes'].values()))
+
+
+def suite():
+    """ Create the test suite that include all sr_reporter test cases
+
+    :return: sr_reporter test suite
+    """
+    sr_reporter_suite = unittest.TestSuite()
+    sr_reporter_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrReporterCase))
+    return sr_reporter_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
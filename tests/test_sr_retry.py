@@ -0,0 +1,220 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_retry.py : test utility tool used for sr_retry
+
+  - the retry stores work in a temporary cache directory,
+  - messages are v02 raw messages, as sr_consumer hands them to sr_retry.
+"""
+import logging
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+from unittest.mock import patch
+
+from sarra.sr_retry import sr_retry, sr_retry_indexed, new_retry
+from sarra.sr_util import raw_message, nowflt, timeflt2str
+
+
+class StandInParent:
+    def __init__(self, retry_path):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.exchange = 'xpublic'
+        self.retry_path = retry_path
+        self.retry_ttl = 3600 * 1000
+        self.retry_backend = 'indexed'
+        self.retry_backoff = 30
+        self.retry_backoff_max = 3600
+
+
+class SrRetryIndexedCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.parent = StandInParent(os.path.join(self.workdir.name, 'sr_subscribe_test_01.retry'))
+        self.now = nowflt()
+        self.nowflt = patch('sarra.sr_retry.nowflt', lambda: self.now)
+        self.nowflt.start()
+        self.retry = sr_retry_indexed(self.parent)
+
+    def tearDown(self) -> None:
+        self.nowflt.stop()
+        self.retry.close()
+        self.workdir.cleanup()
+
+    def new_message(self, name, age=0, host='localhost'):
+        message = raw_message(self.parent.logger)
+        message.body = '%s http://%s/ data/%s' % (timeflt2str(nowflt() - age), host, name)
+        message.delivery_info['routing_key'] = 'v02.post.data'
+        message.properties['application_headers'] = {'sum': 'd,%032d' % len(name), 'parts': '1,10,1,0,0'}
+        message.isRetry = False
+        return message
+
+    def get_all(self):
+        bodies = []
+        message = self.retry.get()
+        while message is not None:
+            bodies.append(message.body.split()[-1])
+            message = self.retry.get()
+        return bodies
+
+    def test_new_retry(self):
+        # Execute test
+        self.parent.retry_backend = 'files'
+        retry = new_retry(self.parent)
+
+        # Evaluate results
+        self.assertIs(sr_retry, type(retry))
+        self.parent.retry_backend = 'indexed'
+        self.assertIs(sr_retry_indexed, type(new_retry(self.parent)))
+        del self.parent.retry_backend
+        self.assertIs(sr_retry, type(new_retry(self.parent)))
+
+    def test_open__synchronous(self):
+        # Execute test
+        db = self.retry.__open__()
+
+        # Evaluate results : WAL, synced at checkpoints (1 : NORMAL)
+        self.assertEqual('wal', db.execute('PRAGMA journal_mode').fetchone()[0])
+        self.assertEqual(1, db.execute('PRAGMA synchronous').fetchone()[0])
+
+    def test_get__due(self):
+        # Prepare test
+        for name in ['a', 'b', 'a']:
+            self.retry.add_msg_to_new_file(self.new_message(name))
+
+        # Execute test
+        before = self.get_all()
+        self.now += 30
+        first = self.get_all()
+        self.now += 59
+        not_due = self.get_all()
+        self.now += 1
+        second = self.get_all()
+
+        # Evaluate results
+        self.assertEqual([], before)
+        self.assertEqual(['data/a', 'data/b'], first)
+        self.assertEqual([], not_due)
+        self.assertEqual(['data/a', 'data/b'], second)
+        self.assertEqual([3, 3], [row[0] for row in self.retry.db.execute('SELECT attempts FROM retry')])
+
+    def test_add_msg_to_state_file__done(self):
+        # Prepare test
+        for name in ['a', 'b']:
+            self.retry.add_msg_to_new_file(self.new_message(name))
+        self.now += 30
+        message = self.retry.get()
+
+        # Execute test
+        self.assertTrue(message.isRetry)
+        self.retry.add_msg_to_state_file(message, done=True)
+        message = self.retry.get()
+        self.retry.add_msg_to_state_file(message)
+        self.now += 60
+
+        # Evaluate results
+        self.assertEqual(['data/b'], self.get_all())
+
+    def test_breaker(self):
+        # Prepare test : files on a dead host and on a good one
+        for i in range(6):
+            self.retry.add_msg_to_new_file(self.new_message('dead%d' % i, host='dead'))
+        self.retry.add_msg_to_new_file(self.new_message('good', host='good'))
+        self.now += 30
+
+        # Execute test
+        suspended = self.get_all()
+        self.now += 30
+        probe = self.retry.get()
+        probed = probe.body.split()[-1]
+        self.retry.add_msg_to_state_file(probe, done=True)
+        resumed = self.get_all()
+
+        # Evaluate results
+        self.assertEqual(['data/good'], suspended)
+        self.assertEqual('data/dead0', probed)
+        self.assertEqual(['data/dead%d' % i for i in range(1, 6)], resumed)
+        self.assertNotIn('dead', self.retry.hosts)
+
+    def test_on_heartbeat__expired(self):
+        # Prepare test
+        self.retry.add_msg_to_new_file(self.new_message('old', age=7200))
+        self.retry.add_msg_to_new_file(self.new_message('recent'))
+
+        # Execute test
+        self.retry.on_heartbeat(self.parent)
+
+        # Evaluate results
+        self.assertEqual(1, self.retry.db.execute('SELECT COUNT(*) FROM retry').fetchone()[0])
+        self.now += 30
+        self.assertEqual(['data/recent'], self.get_all())
+
+    def test_on_heartbeat__count(self):
+        # Prepare test
+        for name in ['a', 'b', 'a']:
+            self.retry.add_msg_to_new_file(self.new_message(name))
+        self.parent.retry_backend = 'files'
+        files = sr_retry(StandInParent(os.path.join(self.workdir.name, 'sr_subscribe_test_02.retry')))
+        for name in ['c', 'd', 'e']:
+            files.add_msg_to_new_file(self.new_message(name))
+
+        # Execute test
+        self.retry.on_heartbeat(self.parent)
+        files.on_heartbeat(self.parent)
+
+        # Evaluate results
+        for path, count in [(self.parent.retry_path + '.count', '2'), (files.count_path, '3')]:
+            with open(path) as fp:
+                self.assertEqual(count, fp.read())
+        files.cleanup()
+        self.assertFalse(os.path.exists(files.count_path))
+
+    def test_import_files(self):
+        # Prepare test : retry_backend files left messages behind
+        self.parent.retry_backend = 'files'
+        files = sr_retry(self.parent)
+        files.add_msg_to_new_file(self.new_message('a'))
+        files.add_msg_to_new_file(self.new_message('b'))
+        files.on_heartbeat(self.parent)
+        files.add_msg_to_state_file(self.new_message('a'), done=True)
+        files.add_msg_to_new_file(self.new_message('c'))
+        files.close()
+        with open(self.parent.retry_path + '.new', 'a') as fp:
+            fp.write('not json\n')
+
+        # Execute test
+        self.retry.on_start(self.parent)
+        self.retry.on_heartbeat(self.parent)
+
+        # Evaluate results
+        self.assertEqual(['data/b', 'data/c'], self.get_all())
+        for suffix in ['', '.new', '.state', '.heart']:
+            self.assertFalse(os.path.exists(self.parent.retry_path + suffix))
+
+    def test_cleanup(self):
+        # Prepare test
+        self.retry.add_msg_to_new_file(self.new_message('a'))
+
+        # Execute test
+        self.retry.cleanup()
+
+        # Evaluate results
+        self.assertEqual([], os.listdir(self.workdir.name))
+
+
+def suite():
+    """ Create the test suite that include all sr_retry test cases
+
+    :return: sr_retry test suite
+    """
+    sr_retry_suite = unittest.TestSuite()
+    sr_retry_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrRetryIndexedCase))
+    return sr_retry_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,132 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_snapshot.py : test utility tool used for sr_snapshot
+
+  - the snapshot of sr is written in a temporary directory, and read again as the next run of sr would.
+"""
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import TestCase
+
+from sarra.sr_snapshot import sr_snapshot, stat
+
+
+class SnapshotCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'sr_snapshot.json')
+        self.past = time.time() - 60
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def test_store(self):
+        # Prepare test
+        snapshot = sr_snapshot(self.path)
+
+        # Execute test
+        snapshot.store('configs', 'subscribe/a.conf', {'instances': 2}, self.past)
+        snapshot.save()
+
+        # Evaluate results
+        self.assertEqual({'instances': 2}, sr_snapshot(self.path).lookup('configs', 'subscribe/a.conf'))
+        self.assertIsNone(sr_snapshot(self.path).lookup('configs', 'subscribe/b.conf'))
+
+    def test_save__pruned(self):
+        # Prepare test
+        snapshot = sr_snapshot(self.path)
+        snapshot.store('configs', 'subscribe/a.conf', {'instances': 2}, self.past)
+        snapshot.store('configs', 'subscribe/b.conf', {'instances': 1}, self.past)
+        snapshot.save()
+
+        # Execute test : the next run, without b.conf
+        snapshot = sr_snapshot(self.path)
+        snapshot.lookup('configs', 'subscribe/a.conf')
+        snapshot.save()
+
+        # Evaluate results
+        snapshot = sr_snapshot(self.path)
+        self.assertIsNotNone(snapshot.lookup('configs', 'subscribe/a.conf'))
+        self.assertIsNone(snapshot.lookup('configs', 'subscribe/b.conf'))
+
+    def test_save__unchanged(self):
+        # Prepare test
+        snapshot = sr_snapshot(self.path)
+        snapshot.store('states', 'subscribe/a', {'pids': [[1, 1234]]}, self.past)
+        snapshot.save()
+        mtime = os.stat(self.path).st_mtime_ns
+
+        # Execute test
+        snapshot = sr_snapshot(self.path)
+        snapshot.lookup('states', 'subscribe/a')
+        snapshot.save()
+
+        # Evaluate results : not written again
+        self.assertEqual(mtime, os.stat(self.path).st_mtime_ns)
+        self.assertEqual([self.path], [os.path.join(self.workdir.name, f) for f in os.listdir(self.workdir.name)])
+
+    def test_store__settle(self):
+        # Prepare test
+        snapshot = sr_snapshot(self.path)
+        snapshot.store('states', 'subscribe/a', {'pids': []}, self.past)
+        snapshot.save()
+
+        # Execute test : read from a directory just changed
+        snapshot = sr_snapshot(self.path)
+        snapshot.lookup('states', 'subscribe/a')
+        snapshot.store('states', 'subscribe/a', {'pids': [[1, 1234]]}, time.time())
+        snapshot.save()
+
+        # Evaluate results : read again by the next run
+        self.assertIsNone(sr_snapshot(self.path).lookup('states', 'subscribe/a'))
+
+    def test_init__corrupted(self):
+        # Prepare test
+        with open(self.path, 'w') as f:
+            f.write('{ "version": 1, "sect')
+
+        # Execute test & Evaluate results
+        snapshot = sr_snapshot(self.path)
+        self.assertIsNone(snapshot.lookup('configs', 'subscribe/a.conf'))
+        snapshot.store('configs', 'subscribe/a.conf', {'instances': 2}, self.past)
+        snapshot.save()
+        self.assertEqual({'instances': 2}, sr_snapshot(self.path).lookup('configs', 'subscribe/a.conf'))
+
+    def test_init__version(self):
+        # Prepare test : the snapshot of another version of sr
+        with open(self.path, 'w') as f:
+            json.dump({'version': sr_snapshot.version + 1,
+                       'sections': {'configs': {'subscribe/a.conf': {'instances': 2}}}}, f)
+
+        # Execute test & Evaluate results
+        self.assertIsNone(sr_snapshot(self.path).lookup('configs', 'subscribe/a.conf'))
+
+    def test_stat(self):
+        # Prepare test
+        with open(os.path.join(self.workdir.name, 'a.conf'), 'w') as f:
+            f.write('instances 2\n')
+
+        # Execute test & Evaluate results
+        self.assertEqual(12, stat(os.path.join(self.workdir.name, 'a.conf'))[1])
+        self.assertIsNone(stat(os.path.join(self.workdir.name, 'b.conf')))
+
+
+def suite():
+    """ Create the test suite that include all sr_snapshot test cases
+
+    :return: sr_snapshot test suite
+    """
+    sr_snapshot_suite = unittest.TestSuite()
+    sr_snapshot_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SnapshotCase))
+    return sr_snapshot_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
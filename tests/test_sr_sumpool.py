@@ -0,0 +1,121 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_sumpool.py : test utility tool used for sr_sumpool
+
+  - checksums are computed on temporary files and compared with hashlib,
+  - the sumalgo is a stand-in following the sr_checksum API (set_path, update, get_value).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from sarra.sr_sumpool import sr_sumpool
+
+DATA = os.urandom(100000)
+
+
+class StandInSumalgo:
+    def set_path(self, path):
+        self.filehash = hashlib.md5()
+
+    def update(self, chunk):
+        self.filehash.update(chunk)
+
+    def get_value(self):
+        return self.filehash.hexdigest()
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.bufsize = 4096
+
+
+class SrSumpoolCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.sumalgo = StandInSumalgo()
+        self.pool = sr_sumpool(StandInParent(), 2)
+        self.pool.window = 2
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.workdir.cleanup()
+
+    def new_file(self, name, data=DATA):
+        path = os.path.join(self.workdir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_submit__parts(self):
+        # Prepare test
+        path = self.new_file('parts')
+
+        # Execute test
+        futures = [self.pool.submit(self.sumalgo, path, offset, 30000) for offset in range(0, 100000, 30000)]
+
+        # Evaluate results
+        self.assertEqual([hashlib.md5(DATA[offset:offset + 30000]).hexdigest() for offset in range(0, 100000, 30000)],
+                         [future.result() for future in futures])
+
+    def test_prefetch__result(self):
+        # Prepare test
+        paths = [self.new_file('file%d' % i, DATA[i:]) for i in range(4)]
+
+        # Execute test
+        for path in paths:
+            self.pool.prefetch(self.sumalgo, 'd', path, os.stat(path))
+        upcoming = len(self.pool.upcoming)
+        checksums = [self.pool.result('d', path) for path in paths]
+
+        # Evaluate results
+        self.assertEqual(2, upcoming)
+        self.assertEqual([hashlib.md5(DATA[i:]).hexdigest() for i in range(4)], checksums)
+        self.assertEqual(0, len(self.pool.prefetched))
+
+    def test_result__skipped_files_dropped(self):
+        # Prepare test
+        paths = [self.new_file('file%d' % i) for i in range(3)]
+        for path in paths:
+            self.pool.prefetch(self.sumalgo, 'd', path, os.stat(path))
+
+        # Execute test (file0 was not posted after all)
+        checksum = self.pool.result('d', paths[1])
+
+        # Evaluate results
+        self.assertEqual(hashlib.md5(DATA).hexdigest(), checksum)
+        self.assertEqual([(paths[2], 'd')], list(self.pool.prefetched.keys()))
+
+    def test_result__file_changed(self):
+        # Prepare test
+        path = self.new_file('changed')
+        self.pool.prefetch(self.sumalgo, 'd', path, os.stat(path))
+        self.new_file('changed', DATA + b'more')
+
+        # Execute test
+        checksum = self.pool.result('d', path)
+
+        # Evaluate results
+        self.assertIsNone(checksum)
+
+
+def suite():
+    """ Create the test suite that include all sr_sumpool test cases
+
+    :return: sr_sumpool test suite
+    """
+    sr_sumpool_suite = unittest.TestSuite()
+    sr_sumpool_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrSumpoolCase))
+    return sr_sumpool_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
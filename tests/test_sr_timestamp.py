@@ -0,0 +1,79 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_timestamp.py : test utility tool used for sr_timestamp, the timestamps of the messages
+
+  - the timestamps are compared with the ones of time.strftime/calendar.timegm (the conversions before).
+"""
+import calendar
+import random
+import time
+import unittest
+from unittest import TestCase
+
+from sarra.sr_timestamp import nowflt, nowstr, timeflt2str, timestr2flt, timestrs2flts, v3timeflt2str
+
+
+class SrTimestampCase(TestCase):
+    def test_timestr2flt(self):
+        # Execute test & Evaluate results
+        self.assertEqual(1590061522.5, timestr2flt('20200521114522.5'))
+        self.assertEqual(1590061522.5, timestr2flt('20200521T114522.5'))
+        self.assertEqual(1590061522.0, timestr2flt('20200521114522'))
+        self.assertEqual(951782400.125, timestr2flt('20000229000000.125'))
+
+    def test_timestr2flt__invalid(self):
+        # Execute test & Evaluate results
+        for s in ['2020052111', '2020052111452x.5', '20200521244522.5', '20200230114522', '20200521116022']:
+            self.assertRaises(ValueError, timestr2flt, s)
+
+    def test_timeflt2str(self):
+        # Execute test & Evaluate results : as strftime, up to 9 significant digits of fraction
+        self.assertEqual('20200521114522.5', timeflt2str(1590061522.5))
+        self.assertEqual('20200521T114522.5', v3timeflt2str(1590061522.5))
+        self.assertEqual('20200521114522', timeflt2str(1590061522))
+        self.assertEqual('19700101000012.00001', timeflt2str(12.00001))
+        self.assertEqual('19700101000012.999999999', timeflt2str(12.9999999999))
+
+    def test_round_trip(self):
+        # Prepare test
+        random.seed(5)
+        flts = [random.uniform(0, 4102444800) for i in range(2000)] + [1590061522 + i / 7 for i in range(2000)]
+
+        # Execute test
+        strs = [timeflt2str(f) for f in flts]
+
+        # Evaluate results
+        for f, s in zip(flts, strs):
+            self.assertEqual(time.strftime('%Y%m%d%H%M%S', time.gmtime(f)), s[:14])
+            self.assertEqual(calendar.timegm(time.gmtime(f)), int(timestr2flt(s)))
+            self.assertAlmostEqual(f, timestr2flt(s), delta=1e-5)
+        self.assertEqual([timestr2flt(s) for s in strs], timestrs2flts(strs))
+        self.assertEqual(timestrs2flts(strs[:10]), timestrs2flts([v3timeflt2str(f) for f in flts[:10]]))
+
+    def test_now(self):
+        # Execute test
+        before = time.time()
+        now = nowflt()
+        s = nowstr()
+
+        # Evaluate results
+        self.assertLessEqual(before, now)
+        self.assertLessEqual(now, timestr2flt(s) + 1e-6)
+
+
+def suite():
+    """ Create the test suite that include all sr_timestamp test cases
+
+    :return: sr_timestamp test suite
+    """
+    sr_timestamp_suite = unittest.TestSuite()
+    sr_timestamp_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrTimestampCase))
+    return sr_timestamp_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
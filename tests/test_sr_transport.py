@@ -0,0 +1,127 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_transport.py : test utility tool used for sr_transport (sr_util)
+
+  - protocol sessions are Mocks, the instance (parent) a stand-in with the settings used.
+"""
+import logging
+import unittest
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from sarra.sr_util import sr_transport
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.destination = None
+        self.transport_pool = 2
+        self.transport_idle = 300
+
+
+class SrTransportCase(TestCase):
+    def setUp(self) -> None:
+        self.parent = StandInParent()
+        self.transport = sr_transport()
+        self.transport.logger = self.parent.logger
+        self.transport.scheme = 'ftp'
+        self.transport.pclass = Mock(side_effect=lambda parent: Mock())
+
+    def connect(self, destination):
+        self.parent.destination = destination
+        return self.transport.connect(self.parent)
+
+    @patch('sarra.sr_util.nowflt')
+    def test_connect__reuse(self, nowflt):
+        # Prepare test
+        nowflt.return_value = 1000
+        first = self.connect('ftp://anonymous@host1')
+
+        # Execute test
+        second = self.connect('ftp://anonymous@host1/')
+
+        # Evaluate results
+        self.assertIs(first, second)
+        self.assertEqual(1, self.transport.pclass.call_count)
+        self.assertEqual({'hit': 1, 'miss': 1, 'evict': 0}, self.transport.stats[('ftp', 'host1', 'anonymous')])
+
+    @patch('sarra.sr_util.nowflt')
+    def test_connect__lru_evict(self, nowflt):
+        # Prepare test
+        nowflt.return_value = 1000
+        host1 = self.connect('ftp://user@host1')
+        host2 = self.connect('ftp://user@host2')
+        self.connect('ftp://user@host1')
+
+        # Execute test
+        self.connect('ftp://user@host3')
+
+        # Evaluate results
+        host2.close.assert_called_once_with()
+        host1.close.assert_not_called()
+        self.assertEqual([('ftp', 'host1', 'user'), ('ftp', 'host3', 'user')], list(self.transport.pool.keys()))
+        self.assertEqual(1, self.transport.stats[('ftp', 'host2', 'user')]['evict'])
+
+    @patch('sarra.sr_util.nowflt')
+    def test_connect__idle(self, nowflt):
+        # Prepare test
+        nowflt.return_value = 1000
+        host1 = self.connect('ftp://user@host1')
+        nowflt.return_value = 1400
+
+        # Execute test
+        again = self.connect('ftp://user@host1')
+
+        # Evaluate results
+        self.assertIsNot(host1, again)
+        host1.close.assert_called_once_with()
+        self.assertEqual(2, self.transport.stats[('ftp', 'host1', 'user')]['miss'])
+
+    @patch('sarra.sr_util.nowflt')
+    def test_connect__not_connected(self, nowflt):
+        # Prepare test
+        nowflt.return_value = 1000
+        host1 = self.connect('ftp://user@host1')
+        host1.check_is_connected.return_value = False
+
+        # Execute test
+        again = self.connect('ftp://user@host1')
+
+        # Evaluate results
+        self.assertIsNot(host1, again)
+        self.assertEqual([again], [proto for proto, last in self.transport.pool.values()])
+
+    @patch('sarra.sr_util.nowflt')
+    def test_close__only_current(self, nowflt):
+        # Prepare test
+        nowflt.return_value = 1000
+        host1 = self.connect('ftp://user@host1')
+        host2 = self.connect('ftp://user@host2')
+
+        # Execute test
+        self.transport.close(only_current=True)
+
+        # Evaluate results
+        host2.close.assert_called()
+        host1.close.assert_not_called()
+        self.assertEqual([('ftp', 'host1', 'user')], list(self.transport.pool.keys()))
+        self.assertIsNone(self.transport.proto)
+
+
+def suite():
+    """ Create the test suite that include all sr_transport test cases
+
+    :return: sr_transport test suite
+    """
+    sr_transport_suite = unittest.TestSuite()
+    sr_transport_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrTransportCase))
+    return sr_transport_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,110 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_util.py : test utility tool used for sr_util
+
+  - zero_copy works on temporary files, the checksums are compared with hashlib.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+from unittest.mock import patch
+
+from sarra.sr_util import zero_copy
+
+DATA = os.urandom(300000)
+
+
+class StandInSumalgo:
+    def set_path(self, path):
+        self.filehash = hashlib.md5()
+
+    def update(self, chunk):
+        self.filehash.update(chunk)
+
+    def get_value(self):
+        return self.filehash.hexdigest()
+
+
+class ZeroCopyCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.src_path = os.path.join(self.workdir.name, 'src')
+        self.dst_path = os.path.join(self.workdir.name, 'dst')
+        with open(self.src_path, 'wb') as f:
+            f.write(DATA)
+        with open(self.dst_path, 'wb') as f:
+            f.write(b'x' * 1000)
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def read_dst(self):
+        with open(self.dst_path, 'rb') as f:
+            return f.read()
+
+    def test_zero_copy__range(self):
+        # Prepare test
+        sumalgo = StandInSumalgo()
+        sumalgo.set_path(self.src_path)
+
+        # Execute test
+        with open(self.src_path, 'rb') as src, open(self.dst_path, 'r+b') as dst:
+            src.seek(1000)
+            dst.seek(500)
+            copied = zero_copy(src, dst, 200000, sumalgo, 65536)
+            positions = (src.tell(), dst.tell())
+
+        # Evaluate results
+        self.assertEqual(200000, copied)
+        self.assertEqual((201000, 200500), positions)
+        self.assertEqual(b'x' * 500 + DATA[1000:201000], self.read_dst())
+        self.assertEqual(hashlib.md5(DATA[1000:201000]).hexdigest(), sumalgo.get_value())
+
+    def test_zero_copy__to_end(self):
+        # Execute test
+        with open(self.src_path, 'rb') as src, open(self.dst_path, 'r+b') as dst:
+            copied = zero_copy(src, dst)
+            dst.truncate()
+
+        # Evaluate results
+        self.assertEqual(len(DATA), copied)
+        self.assertEqual(DATA, self.read_dst())
+
+    @patch('os.copy_file_range', side_effect=OSError(18, 'Invalid cross-device link'), create=True)
+    def test_zero_copy__sendfile(self, copy_file_range):
+        # Execute test
+        with open(self.src_path, 'rb') as src, open(self.dst_path, 'r+b') as dst:
+            copied = zero_copy(src, dst, 5000)
+
+        # Evaluate results
+        self.assertEqual(5000, copied)
+        self.assertEqual(DATA[:5000], self.read_dst()[:5000])
+
+    def test_zero_copy__not_a_file(self):
+        # Execute test
+        with open(self.dst_path, 'r+b') as dst:
+            copied = zero_copy(io.BytesIO(DATA), dst)
+
+        # Evaluate results
+        self.assertIsNone(copied)
+
+
+def suite():
+    """ Create the test suite that include all sr_util test cases
+
+    :return: sr_util test suite
+    """
+    sr_util_suite = unittest.TestSuite()
+    sr_util_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(ZeroCopyCase))
+    return sr_util_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,118 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_walker.py : test utility tool used for sr_walker, the tree walk of sr_post/sr_watch
+
+  - the tree walked is made in a temporary directory,
+  - without threads, the order is the one of the walk before (files of a directory, then its subdirectories).
+"""
+import logging
+import os
+import tempfile
+import unittest
+from unittest import TestCase
+
+from sarra.sr_walker import sr_walker
+
+
+class StandInParent:
+    def __init__(self, realpath_post=False):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.realpath_post = realpath_post
+
+
+class SrWalkerCase(TestCase):
+    def setUp(self) -> None:
+        self.workdir = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.workdir.name)
+        for d in ['a', 'a/aa', 'b', 'skip', 'skip/deeper']:
+            os.mkdir(self.root + '/' + d)
+        for f in ['top', 'a/f1', 'a/aa/f2', 'b/f3', 'skip/f4', 'skip/deeper/f5']:
+            with open(self.root + '/' + f, 'w') as fp:
+                fp.write(f)
+        os.symlink('../top', self.root + '/b/link')
+        os.symlink('nowhere', self.root + '/b/dangling')
+
+    def tearDown(self) -> None:
+        self.workdir.cleanup()
+
+    def walked(self, count, rejected=None, realpath_post=False):
+        walker = sr_walker(StandInParent(realpath_post), count, rejected)
+        result = []
+        for d, files in walker.walk(self.root):
+            for path, lstat, islink in files:
+                result.append((os.path.relpath(path, self.root), lstat.st_size, islink))
+        return walker, result
+
+    def test_walk(self):
+        # Execute test
+        walker, result = self.walked(0)
+
+        # Evaluate results : files of each directory before its subdirectories, links to nothing left out
+        names = [name for name, size, islink in result]
+        self.assertEqual(6 + 1, len(result))
+        self.assertIn(('b/link', 3, True), result)
+        self.assertEqual('top', names[0])
+        self.assertLess(names.index('a/f1'), names.index('a/aa/f2'))
+        self.assertEqual((6, 7, 0), (walker.dirs, walker.files, walker.pruned))
+
+    def test_walk__threads(self):
+        # Execute test
+        walker, result = self.walked(3)
+
+        # Evaluate results
+        self.assertEqual(sorted(self.walked(0)[1]), sorted(result))
+        self.assertEqual(6, walker.dirs)
+
+    def test_walk__rejected(self):
+        # Execute test
+        for count in [0, 2]:
+            walker, result = self.walked(count, lambda path: path.endswith('/skip'))
+
+            # Evaluate results
+            self.assertEqual(['a/aa/f2', 'a/f1', 'b/f3', 'b/link', 'top'], sorted(name for name, size, islink in result))
+            self.assertEqual(1, walker.pruned)
+
+    def test_walk__linked_dir(self):
+        # Prepare test
+        os.symlink('../a/aa', self.root + '/b/linked')
+
+        # Execute test & Evaluate results : files under the link, or where it points to with realpath_post
+        self.assertIn(('b/linked/f2', 7, False), self.walked(0)[1])
+        for count in [0, 2]:
+            names = [name for name, size, islink in self.walked(count, realpath_post=True)[1]]
+            self.assertEqual(2, names.count('a/aa/f2'))
+            self.assertNotIn('b/linked/f2', names)
+
+    def test_walk__given_up(self):
+        # Prepare test
+        for i in range(50):
+            os.mkdir('%s/b/%d' % (self.root, i))
+        walker = sr_walker(StandInParent(), 2)
+        walker.window = 1
+
+        # Execute test : the threads stop when the walk is not gone through
+        walk = walker.walk(self.root)
+        next(walk)
+        walk.close()
+
+        # Evaluate results
+        self.assertFalse(walker.running)
+        self.assertLess(walker.dirs, 56)
+
+
+def suite():
+    """ Create the test suite that include all sr_walker test cases
+
+    :return: sr_walker test suite
+    """
+    sr_walker_suite = unittest.TestSuite()
+    sr_walker_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrWalkerCase))
+    return sr_walker_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,206 @@
+""" This file is part of metpx-sarracenia.
+
+metpx-sarracenia
+Documentation: https://github.com/MetPX/sarracenia
+
+test_sr_workers.py : test utility tool used for sr_workers
+
+  - the instance is a stand-in exposing what sr_workers uses of sr_subscribe,
+  - the consumer is a Mock, so acks and retries can be checked in order.
+"""
+import logging
+import threading
+import time
+import unittest
+from unittest import TestCase
+from unittest.mock import Mock
+
+from sarra.sr_workers import sr_job, sr_workers
+
+
+class StandInMessage:
+    def __init__(self, notice):
+        self.notice = notice
+        self.headers = {}
+        self.sumalgo = None
+        self.parent = None
+
+
+class StandInRawMessage:
+    def __init__(self, body):
+        self.body = body
+        self.isRetry = False
+
+
+class StandInInstance:
+    """ just what sr_workers needs of an sr_subscribe instance """
+
+    def __init__(self, task):
+        self.logger = logging.getLogger(__class__.__name__)
+        self.consumer = Mock()
+        self.consumer.raw_msg = None
+        self.msg = None
+        self.retry_mode = True
+        self.sumalgos = {'d': Mock()}
+        self.lastflg = None
+        self.task = task
+        self.do_task_list = [self.doit_download]
+        self.http_link = Mock()
+
+    def doit_download(self, parent=None):
+        return self.task(self)
+
+    def __do_tasks__(self):
+        for plugin in self.do_task_list:
+            if not plugin(self): return False
+        return True
+
+    def process(self, pool, body):
+        # what sr_subscribe.run/process_message do with a message to download
+        self.consumer.raw_msg = StandInRawMessage(body)
+        self.msg = StandInMessage(body)
+        pool.receive()
+        pool.submit()
+
+
+class SrWorkersCase(TestCase):
+    def setUp(self) -> None:
+        self.pool = None
+        self.released = {}
+        self.done = []
+
+    def tearDown(self) -> None:
+        for event in self.released.values(): event.set()
+        if self.pool: self.pool.close()
+
+    def task(self, worker):
+        event = self.released.get(worker.msg.notice)
+        if event:
+            # lock released while waiting, as during a transfer
+            cwd = self.pool.release()
+            event.wait(5)
+            self.pool.acquire(cwd)
+        self.done.append(worker.msg.notice)
+        if worker.msg.notice == 'failed': worker.consumer.msg_to_retry()
+        else: worker.consumer.msg_worked()
+        return True
+
+    def wait_done(self, count):
+        limit = time.time() + 5
+        while len(self.done) < count and time.time() < limit:
+            self.pool.wait(0.1)
+
+    def test_new_worker(self):
+        # Prepare test
+        instance = StandInInstance(self.task)
+        self.pool = sr_workers(instance, 1)
+
+        # Execute test
+        worker = self.pool.new_worker()
+
+        # Evaluate results
+        self.assertIsNot(worker, instance)
+        self.assertFalse(hasattr(worker, 'http_link'))
+        self.assertIsNot(worker.sumalgos['d'], instance.sumalgos['d'])
+        self.assertIs(worker.do_task_list[0].__self__, worker)
+        self.assertTrue(instance.consumer.ack_deferred)
+
+    def test_settle__acks_in_order(self):
+        # Prepare test
+        instance = StandInInstance(self.task)
+        self.pool = sr_workers(instance, 2)
+        self.released['slow'] = threading.Event()
+
+        # Execute test
+        instance.process(self.pool, 'slow')
+        instance.process(self.pool, 'fast')
+        self.wait_done(1)
+        self.pool.settle()
+        acked_before = instance.consumer.ack.call_count
+        self.released['slow'].set()
+        self.wait_done(2)
+        self.pool.settle()
+
+        # Evaluate results
+        self.assertEqual(['fast', 'slow'], self.done)
+        self.assertEqual(0, acked_before)
+        self.assertEqual(['slow', 'fast'], [c[0][0].body for c in instance.consumer.ack.call_args_list])
+        self.assertEqual(0, len(self.pool.jobs))
+
+    def test_settle__retry(self):
+        # Prepare test
+        instance = StandInInstance(self.task)
+        self.pool = sr_workers(instance, 1)
+        retried = []
+        instance.consumer.msg_to_retry.side_effect = lambda: retried.append(instance.consumer.raw_msg.body)
+
+        # Execute test
+        instance.process(self.pool, 'failed')
+        instance.process(self.pool, 'worked')
+        self.wait_done(2)
+        self.pool.settle()
+
+        # Evaluate results
+        self.assertEqual(['failed'], retried)
+        self.assertEqual(1, instance.consumer.msg_worked.call_count)
+        self.assertEqual(2, instance.consumer.ack.call_count)
+        self.assertEqual('worked', instance.consumer.raw_msg.body)
+
+    def test_settle__not_submitted(self):
+        # Prepare test
+        instance = StandInInstance(self.task)
+        self.pool = sr_workers(instance, 1)
+        instance.consumer.raw_msg = StandInRawMessage('rejected')
+
+        # Execute test
+        self.pool.receive()
+        self.pool.settle()
+
+        # Evaluate results
+        instance.consumer.ack.assert_called_once_with(instance.consumer.raw_msg)
+
+    def test_receive__retry_copied(self):
+        # Prepare test
+        instance = StandInInstance(self.task)
+        self.pool = sr_workers(instance, 1)
+        retry_msg = StandInRawMessage('retried')
+        retry_msg.isRetry = True
+        retry_msg.delivery_info = {'routing_key': 'v02.post.retried'}
+        retry_msg.properties = {'application_headers': {}}
+        instance.consumer.raw_msg = retry_msg
+
+        # Execute test
+        self.pool.receive()
+        retry_msg.body = 'next retry'
+        retry_msg.delivery_info['routing_key'] = 'v02.post.next'
+
+        # Evaluate results
+        job = self.pool.jobs[-1]
+        self.assertEqual('retried', job.raw_msg.body)
+        self.assertEqual('v02.post.retried', job.raw_msg.delivery_info['routing_key'])
+
+    def test_job(self):
+        # Prepare test
+        job = sr_job(None)
+
+        # Execute test
+        job.msg_to_retry()
+
+        # Evaluate results
+        self.assertEqual('retry', job.outcome)
+        self.assertTrue(job.done)
+
+
+def suite():
+    """ Create the test suite that include all sr_workers test cases
+
+    :return: sr_workers test suite
+    """
+    sr_workers_suite = unittest.TestSuite()
+    sr_workers_suite.addTests(unittest.TestLoader().loadTestsFromTestCase(SrWorkersCase))
+    return sr_workers_suite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
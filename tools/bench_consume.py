@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_consume.py : compare sr_amqp.Consumer basic_get consumption (one ack per message)
+#                    with batch_consume (basic_consume push + one multiple ack per batch)
+#
+# No broker needed: a stand-in broker charges a configurable round trip time for every
+# synchronous exchange (basic_get, basic_ack) and pushes up to prefetch messages per round
+# trip in push mode, the way a broker fills a basic_consume channel.
+#
+# usage: bench_consume.py [messages] [rtt_ms] [prefetch]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, socket, sys, time
+
+from sarra.sr_amqp import Consumer, HostConnect
+
+
+class StandInMessage:
+    def __init__(self, tag):
+        self.delivery_tag = tag
+        self.body = 'msg %d' % tag
+
+
+class StandInBroker:
+    """ one queue, one channel, one connection: just enough of amqp for sr_amqp.Consumer """
+
+    def __init__(self, count, rtt):
+        self.count = count
+        self.rtt = rtt
+        self.next_tag = 1
+        self.unacked = 0
+        self.prefetch = 0
+        self.callback = None
+        self.round_trips = 0
+
+    def round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    # channel
+
+    def basic_qos(self, prefetch_size, prefetch_count, a_global):
+        self.prefetch = prefetch_count
+
+    def basic_get(self, queue):
+        self.round_trip()
+        if self.next_tag > self.count: return None
+        msg = StandInMessage(self.next_tag)
+        self.next_tag += 1
+        self.unacked += 1
+        return msg
+
+    def basic_ack(self, tag, multiple=False):
+        self.round_trip()
+        self.unacked = 0 if multiple else self.unacked - 1
+
+    def basic_consume(self, queue, no_ack, callback):
+        self.round_trip()
+        self.callback = callback
+        return 'stand-in'
+
+    # connection
+
+    def channel(self):
+        return self
+
+    def drain_events(self, timeout):
+        if self.next_tag > self.count or self.unacked >= self.prefetch:
+            raise socket.timeout()
+        # the broker streams what prefetch allows, one trip for the whole window
+        if self.unacked == 0: self.round_trip()
+        self.callback(StandInMessage(self.next_tag))
+        self.next_tag += 1
+        self.unacked += 1
+
+
+def build(count, rtt, prefetch):
+    broker = StandInBroker(count, rtt)
+    hc = HostConnect(logger=logging.getLogger('bench'))
+    hc.connection = broker
+    consumer = Consumer(hc)
+    consumer.add_prefetch(prefetch)
+    consumer.drain_time = 0
+    consumer.build()
+    return broker, consumer
+
+
+def bench_get(count, rtt, prefetch):
+    broker, consumer = build(count, rtt, prefetch)
+    start = time.time()
+    msg = consumer.consume('q')
+    while msg is not None:
+        consumer.ack(msg)
+        msg = consumer.consume('q')
+    return time.time() - start, broker.round_trips
+
+
+def bench_batch(count, rtt, prefetch):
+    broker, consumer = build(count, rtt, prefetch)
+    start = time.time()
+    batch = consumer.consume_batch('q', timeout=0)
+    while batch:
+        consumer.ack_batch(batch[-1])
+        batch = consumer.consume_batch('q', timeout=0)
+    return time.time() - start, broker.round_trips
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rtt = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0005
+    prefetch = int(sys.argv[3]) if len(sys.argv) > 3 else 25
+
+    print("%d messages, round trip %.2f ms, prefetch %d" % (count, rtt * 1000, prefetch))
+    for name, bench in [('basic_get', bench_get), ('batch_consume', bench_batch)]:
+        elapsed, trips = bench(count, rtt, prefetch)
+        print("%-14s %8.3f s %10.0f msg/s %8d round trips" % (name, elapsed, count / elapsed, trips))
+
+
+if __name__ == "__main__":
+    main()
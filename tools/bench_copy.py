@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_copy.py : compare sr_proto local file to local file copies going through
+#                 python buffers (read/write of bufsize chunks, alarm around each)
+#                 with the kernel copy (zero_copy : copy_file_range/sendfile),
+#                 with and without the onfly 'd' checksum.
+#
+# usage: bench_copy.py [size_mb] [bufsize_kb] [directory]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, os, sys, tempfile, time
+
+import sarra.sr_util
+from sarra.sr_util import sr_proto
+
+
+class StandInParent:
+    """ just what sr_proto needs of a component """
+
+    def __init__(self, bufsize):
+        self.logger = logging.getLogger('bench')
+        self.bufsize = bufsize
+        self.kbytes_ps = 0
+        self.timeout = 0
+        self.on_data_list = []
+
+
+class StandInSumalgo:
+    """ checksum_d """
+
+    def __init__(self):
+        import hashlib
+        self.md5 = hashlib.md5
+
+    def set_path(self, path):
+        self.filehash = self.md5()
+
+    def update(self, chunk):
+        self.filehash.update(chunk)
+
+    def get_value(self):
+        return self.filehash.hexdigest()
+
+
+def copy(src_path, dst_path, bufsize, sumalgo):
+    proto = sr_proto(StandInParent(bufsize))
+    if sumalgo: proto.set_sumalgo(sumalgo)
+    with open(src_path, 'rb') as src:
+        proto.read_writelocal(src_path, src, dst_path)
+    return proto.checksum
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    bufsize = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 1024 * 1024
+    directory = sys.argv[3] if len(sys.argv) > 3 else None
+
+    zero_copy = sarra.sr_util.zero_copy
+
+    with tempfile.TemporaryDirectory(dir=directory) as workdir:
+        src_path = os.path.join(workdir, 'src')
+        with open(src_path, 'wb') as f:
+            for i in range(size):
+                f.write(os.urandom(1024 * 1024))
+
+        print("%d MB file in %s, bufsize %d KB" % (size, workdir, bufsize // 1024))
+        for label, kernel, sumalgo in [('buffers', False, None), ('zero_copy', True, None),
+                                       ('buffers+d', False, StandInSumalgo()),
+                                       ('zero_copy+d', True, StandInSumalgo())]:
+            sarra.sr_util.zero_copy = zero_copy if kernel else lambda *args: None
+            dst_path = os.path.join(workdir, label)
+            start = time.time()
+            checksum = copy(src_path, dst_path, bufsize, sumalgo)
+            elapsed = time.time() - start
+            print("%-12s %8.3f s %10.0f MB/s %s" % (label, elapsed, size / elapsed, checksum or ''))
+            os.unlink(dst_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_decode.py : time per message of each step of sr_message decoding, v02 and v03:
+#                   decode_routing (what accept/reject needs), the accept/reject match,
+#                   decode_headers (the rest), then what a consumer pays per message when
+#                   a fraction of them is rejected : all decoded first (as before), or
+#                   only routing decoded before the match, or rejected on the topic first
+#                   (topic_prefilter).
+#
+# usage: bench_decode.py [count] [percent_rejected]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import base64, hashlib, json, logging, os, sys, time
+
+from sarra.sr_config import sr_config
+from sarra.sr_matcher import sr_topic_filter
+from sarra.sr_message import sr_message
+from sarra.sr_util import raw_message, nowstr
+
+
+def new_raw(logger, version, i, rejected):
+    relpath = '/data/%s/file_%08d.grib2' % ('obs' if rejected else 'model', i)
+    digest = hashlib.md5(relpath.encode()).digest()
+    raw = raw_message(logger)
+    raw.isRetry = False
+    raw.delivery_info['exchange'] = 'xpublic'
+    if version == 'v02':
+        raw.delivery_info['routing_key'] = 'v02.post' + os.path.dirname(relpath).replace('/', '.')
+        raw.properties['application_headers'] = {'sum': 'd,' + digest.hex(), 'parts': '1,123456,1,0,0',
+                                                 'source': 'bench', 'to_clusters': 'local'}
+        raw.body = '%s http://localhost %s' % (nowstr(), relpath)
+    else:
+        raw.delivery_info['routing_key'] = 'v03' + os.path.dirname(relpath).replace('/', '.')
+        raw.properties['application_headers'] = {}
+        raw.body = json.dumps({'pubTime': nowstr(), 'baseUrl': 'http://localhost', 'relPath': relpath,
+                               'integrity': {'method': 'md5', 'value': base64.b64encode(digest).decode()},
+                               'size': 123456, 'source': 'bench', 'to_clusters': 'local'})
+    return raw
+
+
+def timed(raws, step):
+    start = time.time()
+    for raw in raws:
+        step(raw)
+    return (time.time() - start) / len(raws) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rejected = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+
+    logging.disable(logging.INFO)
+    cfg = sr_config(config=None, args=None)
+    cfg.defaults()
+    cfg.general()
+    cfg.load_sums()
+    cfg.option(['accept', '.*/model/.*'])
+    msg = sr_message(cfg)
+
+    def routing(raw):
+        msg.decode_routing(raw)
+
+    def match(raw):
+        cfg.isMatchingPattern(msg.urlstr)
+
+    def whole(raw):
+        msg.decode_routing(raw)
+        msg.decode_headers()
+
+    def before(raw):
+        msg.from_amqplib(raw)
+        cfg.isMatchingPattern(msg.urlstr)
+
+    def after(raw):
+        msg.decode_routing(raw)
+        if cfg.isMatchingPattern(msg.urlstr): msg.decode_headers()
+
+    topic_filters = {}
+
+    def topic(raw):
+        if topic_filters[version].rejects(raw.delivery_info['routing_key']): return
+        after(raw)
+
+    print("%d messages, %d%% rejected, microseconds per message" % (count, rejected))
+    print("%-4s %9s %9s %9s %9s | %14s %14s %14s" % ('', 'routing', 'match', 'headers', 'total',
+                                                      'decode, match', 'match, decode', 'topic, match'))
+    for version in ['v02', 'v03']:
+        cfg.topic_prefix = 'v02.post' if version == 'v02' else 'v03'
+        topic_filters[version] = sr_topic_filter(cfg)
+        # each step works on fresh raw messages : decode_headers changes the headers it converts
+        fresh = lambda: [new_raw(cfg.logger, version, i, i % 100 < rejected) for i in range(count)]
+        t_routing = timed(fresh(), routing)
+        raws = fresh()
+        for raw in raws:
+            msg.decode_routing(raw)
+        t_match = timed(raws, match)
+        t_whole = timed(fresh(), whole)
+        t_before = timed(fresh(), before)
+        t_after = timed(fresh(), after)
+        t_topic = timed(fresh(), topic)
+        print("%-4s %9.1f %9.1f %9.1f %9.1f | %14.1f %14.1f %14.1f" % (version, t_routing, t_match,
+                                                                        t_whole - t_routing, t_whole,
+                                                                        t_before, t_after, t_topic))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_http.py : compare downloading files with sr_http opening a new connection
+#                 per file (how it worked with urllib.request.urlopen) and with its
+#                 persistent (keep-alive) connection.
+#
+# A local http server (like test/trivialserver.py, but speaking HTTP/1.1 so that
+# connections can be kept alive) serves files from a temporary directory and counts
+# the tcp connections it accepts.  On loopback, a connection costs next to nothing:
+# handshake_ms delays every new connection, as the handshake round trips (tcp, tls)
+# to a distant server would.
+#
+# usage: bench_http.py [files] [size_kb] [handshake_ms]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import functools, http.server, logging, os, socket, ssl, sys, tempfile, threading, time, urllib.parse, urllib.request
+
+from sarra.sr_http import sr_http
+
+
+class CountingHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    handshake = 0
+
+    def setup(self):
+        CountingHandler.connections += 1
+        time.sleep(CountingHandler.handshake)
+        http.server.SimpleHTTPRequestHandler.setup(self)
+        # headers and body are written separately : no Nagle delay between them
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInCredentials:
+    class Details:
+        def __init__(self, url):
+            self.url = urllib.parse.urlparse(url)
+
+    def get(self, url):
+        return True, self.Details(url)
+
+
+class StandInParent:
+    """ just what sr_http needs of a component """
+
+    def __init__(self, destination):
+        self.logger = logging.getLogger('bench')
+        self.bufsize = 1024 * 1024
+        self.kbytes_ps = 0
+        self.timeout = 30
+        self.tlsctx = ssl.create_default_context()
+        self.destination = destination
+        self.credentials = StandInCredentials()
+        self.on_data_list = []
+        self.on_html_page_list = []
+
+
+def serve(directory):
+    handler = functools.partial(CountingHandler, directory=directory)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return httpd
+
+
+def bench_reconnect(destination, names, workdir):
+    proto = sr_http(StandInParent(destination))
+    for name in names:
+        proto.connect()
+        proto.cd('')
+        proto.get(name, os.path.join(workdir, name))
+        proto.close()
+
+
+def bench_keepalive(destination, names, workdir):
+    proto = sr_http(StandInParent(destination))
+    proto.connect()
+    proto.cd('')
+    for name in names:
+        proto.get(name, os.path.join(workdir, name))
+    proto.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    CountingHandler.handshake = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.002
+
+    with tempfile.TemporaryDirectory() as served, tempfile.TemporaryDirectory() as workdir:
+        names = ['file_%05d' % i for i in range(count)]
+        data = os.urandom(size * 1024)
+        for name in names:
+            with open(os.path.join(served, name), 'wb') as f:
+                f.write(data)
+
+        httpd = serve(served)
+        destination = 'http://127.0.0.1:%d' % httpd.server_address[1]
+
+        print("%d files of %d KB from %s, handshake %.1f ms" % (count, size, destination, CountingHandler.handshake * 1000))
+        for label, bench in [('reconnect', bench_reconnect), ('keepalive', bench_keepalive)]:
+            CountingHandler.connections = 0
+            start = time.time()
+            bench(destination, names, workdir)
+            elapsed = time.time() - start
+            print("%-10s %8.3f s %10.0f files/s %8d connections" %
+                  (label, elapsed, count / elapsed, CountingHandler.connections))
+
+        httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_inflight.py : latency of sr_watch with inflight <seconds> (mtime), from the moment a file
+#                     is closed by its writer (another process) to its post, and the events
+#                     processed (each one a stat of the file) at the wakeups, every sleep (0.1 s):
+#
+#                       - observer, mtime :  inflight aging as before (every file pending stat'ed
+#                         at every wakeup),
+#                       - observer, mtime aging :  files too new not stat'ed again before they are
+#                         old enough (inflight_due),
+#                       - inotify, mtime aging :  watch_backend inotify,
+#                       - inotify, close_write :  watch_backend inotify, inflight_close_write.
+#
+# usage: bench_inflight.py [bursts] [files_per_burst] [inflight]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import collections, json, logging, os, subprocess, sys, tempfile, time
+
+from watchdog.observers import Observer
+
+from sarra.sr_inotify import sr_inotify
+from sarra.sr_post import sr_post, SimpleEventHandler
+
+WRITER = """
+import json, os, sys, time
+root, bursts, files = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+closed = {}
+for b in range(bursts):
+    for i in range(files):
+        path = '%s/b%d_f%d' % (root, b, i)
+        with open(path, 'wb') as fp:
+            for w in range(4):
+                fp.write(b'x' * 4096)
+                fp.flush()
+        closed[path] = time.time()
+    time.sleep(0.5)
+with open(root + '.closed', 'w') as fp:
+    json.dump(closed, fp)
+"""
+
+
+class StandInPost:
+    """ just what the wakeup of sr_watch needs, the posts timed """
+
+    on_add = sr_post.on_add
+    on_created = sr_post.on_created
+    on_deleted = sr_post.on_deleted
+    on_modified = sr_post.on_modified
+    on_moved = sr_post.on_moved
+    path_inflight = sr_post.path_inflight
+    wakeup = sr_post.wakeup
+
+    def __init__(self, inflight, close_write, aging):
+        self.logger = logging.getLogger('bench')
+        self.inflight = inflight
+        self.inflight_close_write = close_write
+        self.aging = aging
+        self.events = ['create', 'delete', 'link', 'modify']
+        self.create_modify = True
+        self.inl = collections.OrderedDict()
+        self.new_events = collections.OrderedDict()
+        self.left_events = collections.OrderedDict()
+        self.closed_paths = set()
+        self.inflight_due = {}
+        self.inotify = None
+        self.sum_pool = None
+        self.processed = 0
+        self.posted = {}
+
+    def __on_watch__(self):
+        return True
+
+    def heartbeat_check(self):
+        pass
+
+    def path_aging(self, event, src, now):
+        return self.aging and sr_post.path_aging(self, event, src, now)
+
+    def process_event(self, event, src, dst):
+        self.processed += 1
+        return sr_post.process_event(self, event, src, dst)
+
+    def post1file(self, path, lstat):
+        if lstat is not None and path not in self.posted:
+            self.posted[path] = time.time()
+        return True
+
+
+def main():
+    bursts = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    inflight = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    print("%d bursts of %d files, inflight %d, wakeup every 0.1 s" % (bursts, files, inflight))
+
+    for label, backend, close_write, aging in [('observer, mtime', 'observer', False, False),
+                                               ('observer, mtime aging', 'observer', False, True),
+                                               ('inotify, mtime aging', 'inotify', False, True),
+                                               ('inotify, close_write', 'inotify', True, True)]:
+        with tempfile.TemporaryDirectory() as workdir:
+            root = workdir + '/tree'
+            os.mkdir(root)
+
+            parent = StandInPost(inflight, close_write, aging)
+            if backend == 'observer':
+                observer = Observer()
+                observer.schedule(SimpleEventHandler(parent), root, recursive=True)
+                observer.start()
+            else:
+                parent.inotify = sr_inotify(parent)
+                parent.inotify.watch(root)
+                parent.inotify.start()
+
+            cpu = time.process_time()
+            writer = subprocess.Popen([sys.executable, '-c', WRITER, root, str(bursts), str(files)])
+
+            while writer.poll() is None or len(parent.posted) < bursts * files:
+                time.sleep(0.1)
+                parent.wakeup()
+                if writer.poll() is not None and time.time() - os.stat(root + '.closed').st_mtime > inflight + 5:
+                    break
+            cpu = time.process_time() - cpu
+
+            if backend == 'observer':
+                observer.stop()
+                observer.join()
+            else:
+                parent.inotify.close()
+
+            with open(root + '.closed') as fp:
+                closed = json.load(fp)
+            latencies = sorted(parent.posted[path] - t for path, t in closed.items() if path in parent.posted)
+            n = len(latencies)
+
+            print("%-22s : %5d posted  latency mean %5.2f s  median %5.2f s  max %5.2f s  %6d events processed  %5.2f s cpu" %
+                  (label, n, sum(latencies) / max(n, 1), latencies[n // 2] if n else 0, latencies[-1] if n else 0,
+                   parent.processed, cpu))
+
+
+if __name__ == "__main__":
+    main()
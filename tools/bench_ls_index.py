@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_ls_index.py : time of a poll of a directory of many files, after the listing
+#                     (ls, as lsdir returns it) : comparison to the previous listing and
+#                     saving it, with ls_backend files (differ_ls_file, write_ls_file of
+#                     sr_poll), indexed (sr_ls_index), and indexed with ls_high_water.
+#                     A few files are new or modified at each poll.  restart : the poll
+#                     of the last listing again, by a new process (indexed : merged with
+#                     the database, files : compared to the ls file).
+#
+# usage: bench_ls_index.py [files] [new_per_poll] [polls]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, os, sys, tempfile, time
+
+from sarra.sr_ls_index import sr_ls_index
+from sarra.sr_poll import sr_poll
+
+
+class StandInPoll:
+    """ just what the ls file methods of sr_poll need """
+
+    differ_ls_file = sr_poll.differ_ls_file
+    load_ls_file = sr_poll.load_ls_file
+    write_ls_file = sr_poll.write_ls_file
+
+    def __init__(self, high_water=False):
+        self.logger = logging.getLogger('bench')
+        self.ls_file_index = -1
+        self.ls_high_water = high_water
+
+
+def ls_line(name, size, t):
+    return '-rw-r--r-- 1 1000 1000 %d %s %s' % (size, time.strftime('%b %d %H:%M', time.gmtime(t)), name)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    new = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    polls = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    now = time.time()
+    # files of the last 30 days, the most recent ones last
+    ls = {}
+    for i in range(count):
+        name = 'file_%08d.grib2' % i
+        ls[name] = ls_line(name, 1000 + i, now - 30 * 86400 * (count - i) / count - 3600)
+
+    listings = [dict(ls)]
+    for p in range(1, polls + 1):
+        ls = dict(listings[-1])
+        for i in range(new):
+            name = 'new_%03d_%05d.grib2' % (p, i)
+            ls[name] = ls_line(name, i, now - 60 * (polls - p))
+        listings.append(ls)
+
+    print("%d files, %d new per poll, %d polls after the first" % (count, new, polls))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for label in ['files', 'indexed', 'high_water']:
+            parent = StandInPoll(label == 'high_water')
+            lspath = os.path.join(workdir, 'ls_%s' % label)
+            index = sr_ls_index(parent, os.path.join(workdir, 'ls_index_%s.sqlite' % label))
+
+            times = []
+            found = []
+            for ls in listings:
+                start = time.time()
+                if label == 'files':
+                    filelst, desclst = parent.differ_ls_file(ls, lspath)
+                    parent.write_ls_file(ls, lspath)
+                else:
+                    filelst, desclst = index.differ(ls, lspath)
+                times.append(time.time() - start)
+                found.append(len(filelst))
+
+            index.close()
+
+            parent = StandInPoll(label == 'high_water')
+            index = sr_ls_index(parent, os.path.join(workdir, 'ls_index_%s.sqlite' % label))
+            start = time.time()
+            if label == 'files':
+                filelst, desclst = parent.differ_ls_file(listings[-1], lspath)
+                parent.write_ls_file(listings[-1], lspath)
+            else:
+                filelst, desclst = index.differ(listings[-1], lspath)
+            restart = time.time() - start
+            index.close()
+
+            print("%-10s first %7.2f s   next %7.3f s per poll   restart %7.2f s   found %s" %
+                  (label, times[0], sum(times[1:]) / polls, restart, found + [len(filelst)]))
+
+
+if __name__ == "__main__":
+    main()
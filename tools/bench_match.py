@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_match.py : time per url of the accept/reject match, with hundreds of masks
+#                  (half literals .*/obs/STATION/.* , half regexps), trying each mask
+#                  in turn (as before) and with sr_matcher : urls all different (as
+#                  messages) and the same urls listed again (as sr_poll does).
+#
+# usage: bench_match.py [masks] [urls]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import random, sys, time
+
+from sarra.sr_config import sr_config
+from sarra.sr_matcher import sr_matcher
+
+
+def loop(masks, s):
+    for i, mask in enumerate(masks):
+        if mask[3].match(s):
+            return i
+    return None
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    nurls = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    cfg = sr_config(config=None, args=None)
+    cfg.defaults()
+    cfg.general()
+    for i in range(count // 2):
+        cfg.option(['accept', '.*/obs/STATION%04d/.*' % i])
+        cfg.option(['accept', '.*/model_%04d/[0-9]{2}/.*\\.grib2$' % i])
+    cfg.option(['reject', '.*'])
+    masks = cfg.masks
+
+    random.seed(0)
+    urls = []
+    for i in range(nurls):
+        n = random.randrange(count)
+        if i % 2: urls.append('http://localhost/data/obs/STATION%04d/file_%08d.txt' % (n, i))
+        else: urls.append('http://localhost/data/model_%04d/%02d/file_%08d.grib2' % (n, i % 100, i))
+
+    print("%d masks, %d urls" % (len(masks), len(urls)))
+
+    start = time.time()
+    results = [loop(masks, s) for s in urls]
+    elapsed = time.time() - start
+    print("%-16s %8.2f us/url" % ('mask loop', elapsed * 1e6 / len(urls)))
+
+    matcher = sr_matcher(masks)
+    matcher.lru_max = len(urls)
+    for label in ['sr_matcher', 'sr_matcher again']:
+        start = time.time()
+        found = [matcher.match(s) for s in urls]
+        elapsed = time.time() - start
+        print("%-16s %8.2f us/url   same masks: %s" % (label, elapsed * 1e6 / len(urls), found == results))
+
+
+if __name__ == "__main__":
+    main()
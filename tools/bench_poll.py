@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_poll.py : time of a poll (sr_poll post_new_urls, poll_directory, lsdir) of
+#                 directories, each with subdirectories, on a server taking some
+#                 time to list a directory, with poll_workers 0 and more.
+#                 The files posted must be the same, in the same order.
+#
+# usage: bench_poll.py [directories] [subdirectories] [latency] [workers...]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, os, re, sys, tempfile, time, urllib.parse
+
+from sarra.sr_matcher import sr_matcher
+from sarra.sr_poll import sr_poll
+
+
+class StandInDest:
+    """ a server : directories d<i> with subdirectories s<j>, files in each """
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.path = None
+
+    def connect(self):
+        time.sleep(self.parent.latency)
+
+    def cd(self, path):
+        self.path = path
+
+    def ls(self):
+        time.sleep(self.parent.latency)
+        entries = {}
+        if self.path.count(os.sep) == 1:
+            for j in range(self.parent.subdirs):
+                entries['s%d' % j] = 'drwxr-xr-x 2 0 0 4096 Oct 18 12:34 s%d' % j
+        for k in range(20):
+            name = 'file_%d.grib2' % k
+            entries[name] = '-rw-r--r-- 1 0 0 %d Oct 18 12:34 %s' % (k, name)
+        return entries
+
+    def close(self):
+        pass
+
+
+class StandInPoll:
+    """ just what post_new_urls of sr_poll needs """
+
+    cd = sr_poll.cd
+    post_new_urls = sr_poll.post_new_urls
+    poll_directory = sr_poll.poll_directory
+    lsdir = sr_poll.lsdir
+    differ_ls_file = sr_poll.differ_ls_file
+    load_ls_file = sr_poll.load_ls_file
+    write_ls_file = sr_poll.write_ls_file
+
+    def __init__(self, cache_dir, dirs, subdirs, latency, workers):
+        self.logger = logging.getLogger('bench')
+        self.user_cache_dir = cache_dir
+        self.destination = 'ftp://anonymous@localhost'
+        self.details = type('details', (), {'url': urllib.parse.urlparse(self.destination)})
+        self.latency = latency
+        self.subdirs = subdirs
+        self.poll_workers = workers
+        self.poll_pool = None
+        self.ls_backend = 'files'
+        self.ls_file_index = -1
+        self.ls_index = None
+        self.on_line_list = []
+        self.sleeping = False
+        self.posted = []
+
+        mask = ('.*', None, None, re.compile('.*'), True, False, 0, False, False)
+        self.pulls = {}
+        self.pullmatchers = {}
+        for i in range(dirs):
+            self.pulls['/d%d' % i] = [mask]
+            self.pullmatchers['/d%d' % i] = sr_matcher([mask])
+
+        self.dest = self.new_dest()
+
+    def new_dest(self):
+        return StandInDest(self)
+
+    def set_dir_pattern(self, path):
+        return path
+
+    def poll_list_post(self, destDir, desclst, filelst):
+        self.posted.extend(destDir + '/' + f for f in filelst)
+        return len(filelst)
+
+
+def main():
+    dirs = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    subdirs = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    workers = [int(w) for w in sys.argv[4:]] or [0, 2, 4, 8]
+
+    print("%d directories of %d subdirectories, %.3f s to list one" % (dirs, subdirs, latency))
+
+    reference = None
+    for count in workers:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            poll = StandInPoll(cache_dir, dirs, subdirs, latency, count)
+            start = time.time()
+            poll.post_new_urls()
+            elapsed = time.time() - start
+
+        if reference is None:
+            reference = poll.posted
+        same = 'same' if poll.posted == reference else 'DIFFERENT'
+        print("poll_workers %2d : %6.2f s   %d posted (%s order)" % (count, elapsed, len(poll.posted), same))
+
+
+if __name__ == "__main__":
+    main()
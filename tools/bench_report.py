@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_report.py : time to report back a flow of files (report_publisher of sr_subscribe),
+#                   against a broker that answers a commit or a confirm after a round trip :
+#                   one report committed at a time (before), report_batch (confirms by
+#                   windows, sr_amqp Publisher) and report_aggregate (sr_reporter summaries).
+#
+# usage: bench_report.py [reports] [round_trip_ms] [report_batch]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, sys, time
+
+from sarra.sr_amqp import Publisher
+from sarra.sr_reporter import sr_reporter
+
+
+class StandInChannel:
+    """ a broker channel : commits and confirms take a round trip """
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.events = {'basic_ack': set(), 'basic_nack': set()}
+        self.published = 0
+        self.round_trips = 0
+
+    def confirm_select(self):
+        pass
+
+    def tx_select(self):
+        pass
+
+    def basic_publish(self, msg, exchange, key):
+        self.published += 1
+
+    def tx_commit(self):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    def drain_events(self, timeout=None):
+        """ the broker confirms all the messages published so far """
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        for ack in self.events['basic_ack']:
+            ack(self.published, True)
+
+
+class StandInHostConnect:
+    def __init__(self, rtt):
+        self.logger = logging.getLogger('bench')
+        self.use_amqp = True
+        self.use_amqplib = False
+        self.use_pika = False
+        self.channel = StandInChannel(rtt)
+        self.connection = self.channel
+
+    def add_build(self, build):
+        pass
+
+    def new_channel(self):
+        return self.channel
+
+
+class StandInParent:
+    def __init__(self):
+        self.logger = logging.getLogger('bench')
+        self.report_exchange = 'xs_tsource'
+        self.report_aggregate = 60
+
+
+class StandInMsg:
+    code = 201
+    length = 1024
+    filesize = 1024
+    host = 'localhost'
+    user = 'tsub'
+    topic_prefix = 'v02.post'
+
+    def get_elapse(self):
+        return 0.01
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rtt = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.5 / 1000
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    notice = '20200521114522.5 sftp://localhost/ data/file_%d 201 localhost tsub 0.010000'
+    headers = {'message': 'Downloaded', 'sum': 'd,d41d8cd98f00b204e9800998ecf8427e', 'parts': '1,1024,1,0,0'}
+
+    print("%d reports, broker round trip %g ms" % (count, rtt * 1000))
+
+    for label, window, aggregate in [('one commit per report', 0, False),
+                                     ('report_batch %d' % batch, batch, False),
+                                     ('report_aggregate', 0, True)]:
+        hc = StandInHostConnect(rtt)
+        publisher = Publisher(hc)
+        publisher.set_confirm_window(window)
+        publisher.build()
+        reporter = sr_reporter(StandInParent(), publisher) if aggregate else None
+        msg = StandInMsg()
+
+        start = time.time()
+        for i in range(count):
+            if reporter:
+                reporter.add(msg)
+            else:
+                publisher.publish('xs_tsource', 'v02.report.data', notice % i, headers)
+        if reporter:
+            reporter.close()
+        else:
+            publisher.flush()
+        elapsed = time.time() - start
+
+        print("%-24s : %6d messages  %6d round trips  %7.3f s  %8.0f reports/s" %
+              (label, hc.channel.published, hc.channel.round_trips, elapsed, count / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_retry.py : time to add count messages to retry, for a heartbeat, and to get
+#                  them all back, with retry_backend files (sr_retry) and indexed
+#                  (sr_retry_indexed).  The retry list after a long outage.
+#
+# usage: bench_retry.py [count]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, os, sys, tempfile, time
+
+from sarra.sr_retry import sr_retry, sr_retry_indexed
+from sarra.sr_util import raw_message, nowflt, timeflt2str
+
+
+class StandInParent:
+    """ just what sr_retry needs of a component """
+
+    def __init__(self, retry_path):
+        self.logger = logging.getLogger('bench')
+        self.exchange = 'xpublic'
+        self.retry_path = retry_path
+        self.retry_ttl = 2 * 24 * 3600 * 1000
+        # retries due right away, as at the heartbeat of retry_backend files
+        self.retry_backoff = 0
+        self.retry_backoff_max = 0
+
+
+def new_message(logger, pubtime, i):
+    message = raw_message(logger)
+    message.body = '%s http://localhost/ data/file_%08d' % (pubtime, i)
+    message.delivery_info['routing_key'] = 'v02.post.data'
+    message.properties['application_headers'] = {'sum': 'd,%032x' % i, 'parts': '1,%d,1,0,0' % i}
+    message.isRetry = False
+    return message
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pubtime = timeflt2str(nowflt())
+
+    print("%d messages to retry" % count)
+
+    for label, store in [('files', sr_retry), ('indexed', sr_retry_indexed)]:
+        with tempfile.TemporaryDirectory() as workdir:
+            parent = StandInParent(os.path.join(workdir, 'bench.retry'))
+            retry = store(parent)
+            times = []
+
+            start = time.time()
+            for i in range(count):
+                retry.add_msg_to_new_file(new_message(parent.logger, pubtime, i))
+            times.append(time.time() - start)
+
+            start = time.time()
+            retry.on_heartbeat(parent)
+            times.append(time.time() - start)
+
+            # a tenth of the retries work, the others fail again
+
+            start = time.time()
+            n = 0
+            message = retry.get()
+            while message is not None:
+                retry.add_msg_to_state_file(message, done=(n % 10 == 0))
+                n += 1
+                if n == count: break
+                message = retry.get()
+            times.append(time.time() - start)
+
+            start = time.time()
+            retry.on_heartbeat(parent)
+            times.append(time.time() - start)
+
+            retry.close()
+            print("%-8s add %8.3f s  heartbeat %8.3f s  get %8.3f s (%d)  heartbeat %8.3f s" %
+                  (label, times[0], times[1], times[2], n, times[3]))
+
+
+if __name__ == "__main__":
+    main()
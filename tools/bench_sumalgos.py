@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_sumalgos.py : throughput of each checksum algorithm of sarra/sum that reads
+#                     the data, fed with bufsize chunks already in memory (no disk io),
+#                     as sr_post and the onfly checksums of the transfers do.
+#
+# usage: bench_sumalgos.py [size_mb] [bufsize_kb]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import os, sys, time
+
+import sarra.sr_config, sarra.sum
+from sarra.sr_checksum import sr_checksum
+
+
+class Loader:
+    """ loads sarra/sum/checksum_*.py the way sr_config.load_sums does (execfile) """
+
+    def load(self, path):
+        self.add_sumalgo = None
+        # as sr_config.execfile : module globals, locals of its own
+        exec(compile(open(path).read(), path, 'exec'), dict(vars(sarra.sr_config)), {'self': self})
+        return self.add_sumalgo
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    bufsize = int(sys.argv[2]) * 1024 if len(sys.argv) > 2 else 1024 * 1024
+
+    sumdir = os.path.dirname(sarra.sum.__file__)
+    data = os.urandom(bufsize)
+    count = size * 1024 * 1024 // bufsize
+
+    print("%d MB in chunks of %d KB" % (count * bufsize // (1024 * 1024), bufsize // 1024))
+
+    loader = Loader()
+    for name in sorted(os.listdir(sumdir)):
+        if not name.startswith('checksum_') or not name.endswith('.py'): continue
+
+        sumalgo = loader.load(os.path.join(sumdir, name))
+        if not sumalgo.available():
+            print("%-3s %-14s not available (python module missing)" % (sumalgo.registered_as(), name))
+            continue
+
+        # the name, or nothing at all, is checksummed
+        if type(sumalgo).update is sr_checksum.update: continue
+
+        start = time.time()
+        sumalgo.set_path('bench')
+        for i in range(count):
+            sumalgo.update(data)
+        sumalgo.get_value()
+        elapsed = time.time() - start
+        print("%-3s %-14s %8.3f s %10.0f MB/s" % (sumalgo.registered_as(), name, elapsed, size / elapsed))
+
+
+if __name__ == "__main__":
+    main()
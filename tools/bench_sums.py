@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_sums.py : compare computing the checksums of the parts of a file one after
+#                 the other, as sr_post does by default, and with the checksum_threads
+#                 pool (sr_sumpool).  The speedup is bounded by the number of cores.
+#
+# usage: bench_sums.py [size_mb] [parts] [threads] [sum]   (sum : d or s)
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, os, sys, tempfile, time
+
+import sarra.sr_config
+from sarra.sr_sumpool import sr_sumpool
+
+
+class StandInParent:
+    """ just what sr_sumpool needs of a component """
+
+    def __init__(self):
+        self.logger = logging.getLogger('bench')
+        self.bufsize = 1024 * 1024
+
+
+class Loader:
+    """ loads sarra/sum/checksum_<sumflg>.py the way sr_config does (execfile) """
+
+    def __init__(self, sumflg):
+        import sarra.sum
+        self.path = os.path.join(os.path.dirname(sarra.sum.__file__), 'checksum_%s.py' % sumflg)
+
+    def load(self):
+        # as sr_config.execfile : module globals, locals of its own
+        exec(compile(open(self.path).read(), self.path, 'exec'), dict(vars(sarra.sr_config)), {'self': self})
+        return self.add_sumalgo
+
+
+def serial(sumalgo, path, parts, bufsize):
+    sums = []
+    for offset, length in parts:
+        sumalgo.set_path(path)
+        with open(path, 'rb') as fp:
+            fp.seek(offset)
+            t = 0
+            while t < length:
+                buf = fp.read(min(bufsize, length - t))
+                if not buf: break
+                sumalgo.update(buf)
+                t += len(buf)
+        sums.append(sumalgo.get_value())
+    return sums
+
+
+def pooled(pool, sumalgo, path, parts):
+    futures = [pool.submit(sumalgo, path, offset, length) for offset, length in parts]
+    return [future.result() for future in futures]
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    sumflg = sys.argv[4] if len(sys.argv) > 4 else 'd'
+
+    sumalgo = Loader(sumflg).load()
+    parent = StandInParent()
+    pool = sr_sumpool(parent, threads)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'file')
+        with open(path, 'wb') as f:
+            for i in range(size):
+                f.write(os.urandom(1024 * 1024))
+
+        chunk = (size * 1024 * 1024 + count - 1) // count
+        parts = [(offset, chunk) for offset in range(0, size * 1024 * 1024, chunk)]
+
+        print("%d MB file in %d parts, sum=%s, %d checksum_threads" % (size, len(parts), sumflg, threads))
+        results = []
+        for label, bench in [('serial', lambda: serial(sumalgo, path, parts, parent.bufsize)),
+                             ('threads', lambda: pooled(pool, sumalgo, path, parts))]:
+            start = time.time()
+            results.append(bench())
+            elapsed = time.time() - start
+            print("%-8s %8.3f s %10.0f MB/s" % (label, elapsed, size / elapsed))
+
+        print("same checksums: %s" % (results[0] == results[1]))
+
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
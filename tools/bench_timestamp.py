@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_timestamp.py : time per call of the timestamp conversions, as they were in sr_util
+#                      (strftime, datetime, calendar.timegm) and in sr_timestamp :
+#                      nowflt, timestr2flt of pubtimes of a flow of messages (a few per second),
+#                      timeflt2str of file mtimes (scattered), timestrs2flts of a retry file.
+#
+# usage: bench_timestamp.py [count]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import calendar, datetime, random, sys, time
+
+from sarra import sr_timestamp
+
+
+# the conversions of sr_util before sr_timestamp
+
+def old_nowflt():
+    return old_timestr2flt(old_nowstr())
+
+
+def old_nowstr():
+    return old_timeflt2str(time.time())
+
+
+def old_timeflt2str(f):
+    nsec = "{:.9g}".format(f % 1)[1:]
+    return "{}{}".format(time.strftime("%Y%m%d%H%M%S", time.gmtime(f)), nsec)
+
+
+def old_timestr2flt(s):
+    if s[8] == "T":
+        s = s.replace('T', '')
+    dt_tuple = int(s[0:4]), int(s[4:6]), int(s[6:8]), int(s[8:10]), int(s[10:12]), int(s[12:14])
+    t = datetime.datetime(*dt_tuple, tzinfo=datetime.timezone.utc)
+    return calendar.timegm(t.timetuple()) + float('0' + s[14:])
+
+
+def timed(function, args, bulk=False):
+    start = time.perf_counter()
+    if bulk:
+        function(args)
+    else:
+        for a in args:
+            function(a)
+    return (time.perf_counter() - start) / len(args) * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    random.seed(1)
+    now = time.time()
+    pubtimes = [old_timeflt2str(now + i * 0.01) for i in range(count)]
+    mtimes = [now - random.uniform(0, 30 * 86400) for i in range(count)]
+    nones = [None] * count
+
+    print("%d calls, ns per call          before      after" % count)
+    for label, old, new, args, bulk in [
+        ('nowflt', lambda a: old_nowflt(), lambda a: sr_timestamp.nowflt(), nones, False),
+        ('nowstr', lambda a: old_nowstr(), lambda a: sr_timestamp.nowstr(), nones, False),
+        ('timestr2flt (pubtimes)', old_timestr2flt, sr_timestamp.timestr2flt, pubtimes, False),
+        ('timeflt2str (mtimes)', old_timeflt2str, sr_timestamp.timeflt2str, mtimes, False),
+        ('timestrs2flts (retry file)', lambda strs: [old_timestr2flt(s) for s in strs],
+         sr_timestamp.timestrs2flts, pubtimes, True)]:
+        print("%-28s : %8.0f   %8.0f" % (label, timed(old, args, bulk), timed(new, args, bulk)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_walk.py : time of the walk of a tree by sr_post (post_on_start, sr_post of a directory),
+#                 up to the files handed to post_file : the walk before (listdir, then isdir,
+#                 exists and stat of each file), walk of sr_post (sr_walker, os.scandir) with
+#                 walk_threads 0, 4 and 8, and with half of the tree rejected (reject .*/skip/.*, the
+#                 directories are not walked).
+#
+# usage: bench_walk.py [directories] [files_per_directory]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import logging, os, re, sys, tempfile, time
+
+from sarra.sr_post import sr_post
+
+
+class StandInPost:
+    """ just what the walk of sr_post needs, the files posted counted """
+
+    walk = sr_post.walk
+    walk_post = sr_post.walk_post
+    dir_rejected = sr_post.dir_rejected
+
+    def __init__(self, threads=0, masks=[]):
+        self.logger = logging.getLogger('bench')
+        self.walk_threads = threads
+        self.masks = masks
+        self.accept_unmatch = True
+        self.realpath_filter = False
+        self.realpath_post = False
+        self.post_base_dir = None
+        self.post_base_url = 'file:'
+        self.sum_pool = None
+        self.posted = 0
+
+    def post1file(self, path, lstat):
+        self.posted += 1
+
+    def post_file(self, path, lstat):
+        self.posted += 1
+
+    def old_walk(self, src):
+        """ the walk of sr_post before sr_walker """
+        files = []
+        subdirs = []
+        for x in os.listdir(src):
+            path = src + '/' + x
+            if os.path.isdir(path): subdirs.append(path)
+            else: files.append(path)
+
+        for path in files:
+            if os.path.exists(path):
+                self.post1file(path, os.stat(path))
+
+        for path in subdirs:
+            self.old_walk(path)
+
+
+def main():
+    dirs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    # reject half of the tree
+    pattern = '.*/skip/.*'
+    masks = [(pattern, None, None, re.compile(pattern), False, False, 0, None, False)]
+
+    with tempfile.TemporaryDirectory() as root:
+        for d in range(dirs):
+            path = '%s/%s/g%d/d%d' % (root, ['keep', 'skip'][d % 2], d % 20, d)
+            os.makedirs(path)
+            for f in range(per_dir):
+                open('%s/f%d' % (path, f), 'w').close()
+
+        print("%d directories of %d files" % (dirs, per_dir))
+
+        for label, threads, masks in [('listdir', 0, []), ('scandir', 0, []), ('4 threads', 4, []),
+                                      ('8 threads', 8, []), ('rejected', 0, masks)]:
+            parent = StandInPost(threads, masks)
+            start = time.time()
+            if label == 'listdir': parent.old_walk(root)
+            else: parent.walk(root)
+            print("%-10s : %7d files posted  %6.2f s" % (label, parent.posted, time.time() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#
+# This file is part of sarracenia.
+# The sarracenia suite is Free and is proudly provided by the Government of Canada
+# Copyright (C) Her Majesty The Queen in Right of Canada, Environment Canada, 2008-2015
+#
+# Sarracenia repository: https://github.com/MetPX/sarracenia
+# Documentation: https://github.com/MetPX/sarracenia
+#
+# bench_watch.py : events sr_watch gets (new_events) for a burst of files written
+#                  (by another process) in a tree, with watch_backend observer
+#                  (watchdog, SimpleEventHandler of sr_post) and inotify (sr_inotify) :
+#                  events handled, files seen, cpu time of the watcher.
+#
+# usage: bench_watch.py [files] [writes_per_file] [directories]
+#
+########################################################################
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; version 2 of the License.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+
+import collections, logging, os, subprocess, sys, tempfile, time
+
+from watchdog.observers import Observer
+
+from sarra.sr_inotify import sr_inotify
+from sarra.sr_post import sr_post, SimpleEventHandler
+
+WRITER = """
+import os, sys
+root, files, writes, dirs = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+for i in range(files):
+    fd = os.open('%s/d%d/f%d' % (root, i % dirs, i), os.O_WRONLY | os.O_CREAT, 0o644)
+    for w in range(writes):
+        os.write(fd, b'x' * 512)
+    os.close(fd)
+"""
+
+
+class StandInPost:
+    """ just what the event handlers of sr_post need """
+
+    on_add = sr_post.on_add
+    on_created = sr_post.on_created
+    on_deleted = sr_post.on_deleted
+    on_modified = sr_post.on_modified
+    on_moved = sr_post.on_moved
+
+    def __init__(self):
+        self.logger = logging.getLogger('bench')
+        self.new_events = collections.OrderedDict()
+        self.closed_paths = set()
+        self.handled = 0
+
+    def wakeup(self):
+        """ what wakeup of sr_post does with the events, without processing them """
+        events = self.new_events
+        self.new_events = collections.OrderedDict()
+        self.handled += len(events)
+        return {src for event, src, dst in events.values()}
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    dirs = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    print("%d files of %d writes in %d directories" % (files, writes, dirs))
+
+    for backend in ['observer', 'inotify']:
+        with tempfile.TemporaryDirectory() as root:
+            for d in range(dirs):
+                os.mkdir('%s/d%d' % (root, d))
+
+            parent = StandInPost()
+            if backend == 'observer':
+                observer = Observer()
+                observer.schedule(SimpleEventHandler(parent), root, recursive=True)
+                observer.start()
+            else:
+                watcher = sr_inotify(parent)
+                watcher.watch(root)
+                watcher.start()
+
+            cpu = time.process_time()
+            start = time.time()
+            writer = subprocess.Popen([sys.executable, '-c', WRITER, root, str(files), str(writes), str(dirs)])
+
+            # wakeups every 0.1 second until every file was seen, or nothing new for 5 seconds
+
+            seen = set()
+            last = time.time()
+            while len(seen) < files and time.time() - last < 5:
+                time.sleep(0.1)
+                if backend == 'inotify':
+                    watcher.collect()
+                new = parent.wakeup() - seen
+                if new:
+                    seen |= new
+                    last = time.time()
+            writer.wait()
+            elapsed = time.time() - start
+            cpu = time.process_time() - cpu
+
+            if backend == 'observer':
+                observer.stop()
+                observer.join()
+            else:
+                overflows = watcher.overflows
+                watcher.close()
+
+            print("%-8s : %6d events handled  %6d files seen  %6.2f s cpu  %6.2f s%s" %
+                  (backend, parent.handled, len(seen), cpu, elapsed,
+                   '  %d overflows' % overflows if backend == 'inotify' else ''))
+
+
+if __name__ == "__main__":
+    main()